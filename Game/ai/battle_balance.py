@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+battle_balance.py
+=================
+
+Cost-efficiency report for every unit type, from paired simulations.
+
+The ``cost`` of each unit in ``UNIT_DATABASE`` (and in text rosters such
+as ``Unit Costs.txt``) was set by feel.  ``measure_balance`` estimates what
+one more unit of each type is actually worth: for every baseline lineup,
+opponent and unit type it plays the lineup with one more of that unit
+("in") and, when the lineup already fields it, with one fewer ("out"),
+and records the change in win rate.  Divided by the unit's cost this is
+its win rate per point; a unit that buys more win rate per point than the
+average is underpriced.
+
+Common random numbers
+---------------------
+Both halves of each comparison fight the same battles: battle ``k`` of a
+matchup uses the same seed for the baseline and for every variant, and a
+``CommonRandomStreams`` RNG, so the units they share roll the same dice
+and a difference in outcome comes from the unit rather than from luck.
+The report sets the variance of these paired differences against the
+variance the same estimate would have from independent battles (the sum of
+the two win-rate variances); their ratio is how many times more battles
+naive sampling needs for the same precision.  A win is all or nothing, so
+the paired variance cannot drop below ``Δ(1 - Δ)`` for a change ``Δ`` in
+win rate: the gain is largest where one unit tips few battles, as in
+large lineups.
+
+Suggested costs
+---------------
+All comparisons together give the going rate of win rate per point,
+``ΣΔ / Σcost`` over the unit types.  A unit's suggested cost is its own
+``Δ`` at that rate, rounded to ``COST_STEP`` points, with the range its 95%
+interval allows; a unit whose range excludes its current cost is flagged.
+That interval comes from the spread of ``Δ`` between comparisons, not from
+the paired battles alone: one more unit is worth much more to some
+lineups than to others, and the few baselines sampled, rather than the
+battles fought against each, are what limits the estimate.
+
+Usage
+-----
+Baselines come from a JSON file of lineups (as for ``battle_tournament``)
+or are sampled from every maximal lineup within a budget::
+
+    python battle_balance.py --budget 300 --max-units 5 --baselines 8 --battles 400
+    python battle_balance.py --lineups lineups.json --units "Jedi,Stormtrooper" --out balance.md
+
+``battle_story_ai.py balance ...`` is the same command.  Extra rosters
+loaded through ``GALAXY_CLASH_UNITS`` are measured like built-in units.
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from battle_story_ai import (
+    UNIT_DATABASE,
+    CommonRandomStreams,
+    Team,
+    create_units_from_names,
+    parse_unit_spec,
+    simulate_battle,
+)
+from battle_tournament import Entrant, generate_entrants, load_entrants, pair_seed
+
+# Suggested costs are rounded to this many points
+COST_STEP = 5
+
+
+###############################################################################
+# Paired battles
+###############################################################################
+
+def add_unit(specs: Sequence[str], name: str) -> List[str]:
+    """``specs`` with one more ``name``: its last squad grows by one, else one is appended.
+
+    Growing the squad keeps the extra model in the same volley as its
+    squadmates, and appending keeps existing units on their streams.
+    """
+    specs = list(specs)
+    for index in range(len(specs) - 1, -1, -1):
+        count, unit = parse_unit_spec(specs[index])
+        if unit == name and count > 1:
+            specs[index] = f"{count + 1}x {name}"
+            return specs
+    return specs + [name]
+
+
+def remove_unit(specs: Sequence[str], name: str) -> Optional[List[str]]:
+    """``specs`` with its last ``name`` removed (a squad shrinks by one), or None."""
+    specs = list(specs)
+    for index in range(len(specs) - 1, -1, -1):
+        count, unit = parse_unit_spec(specs[index])
+        if unit != name:
+            continue
+        if count > 2:
+            specs[index] = f"{count - 1}x {name}"
+        elif count == 2:
+            specs[index] = name
+        else:
+            del specs[index]
+        return specs
+    return None
+
+
+def _play_variants(
+    lineup: List[str], opponent: List[str], variants: List[List[str]], seed: int, battles: int
+) -> List[bytes]:
+    """Process-pool entry point: the lineup's result in each battle, per roster.
+
+    ``lineup`` and every variant fight the same ``battles`` battles against
+    ``opponent``: battle ``k`` is seeded with ``seed + k`` and the lineup
+    takes the first team slot for the first half.  Returns one byte per
+    battle (1 for a win) for ``lineup`` and then for each variant.
+    """
+    rival = Team(name="Opponent", units=create_units_from_names(opponent))
+    half = battles // 2
+    outcomes = []
+    for specs in [lineup] + variants:
+        team = Team(name="Lineup", units=create_units_from_names(specs))
+        wins = bytearray(battles)
+        for k in range(battles):
+            first, second = (team, rival) if k < half else (rival, team)
+            rng = CommonRandomStreams((seed + k) % 2**64, first, second)
+            winner = simulate_battle(first, second, rng).winner
+            wins[k] = winner == (0 if k < half else 1)
+        outcomes.append(bytes(wins))
+    return outcomes
+
+
+###############################################################################
+# Balance measurement
+###############################################################################
+
+@dataclass
+class UnitBalance:
+    """What one more unit of a type is worth, over every comparison."""
+
+    name: str
+    cost: int
+    comparisons: int = 0
+    delta: float = 0.0  # mean change in win rate from one more unit
+    paired_variance: float = 0.0  # variance of ``delta`` from the paired battles
+    naive_variance: float = 0.0  # variance ``delta`` would have from independent battles
+    spread_variance: float = 0.0  # variance of ``delta`` from its spread between comparisons
+    deltas: List[float] = field(default_factory=list, repr=False)  # one per comparison
+    suggested_cost: Optional[int] = None
+    suggested_range: Optional[Tuple[int, int]] = None
+
+    @property
+    def per_point(self) -> float:
+        return self.delta / self.cost
+
+    @property
+    def margin(self) -> float:
+        """Half-width of the 95% interval on ``delta``."""
+        return 1.96 * max(self.spread_variance, self.paired_variance) ** 0.5
+
+    @property
+    def variance_reduction(self) -> float:
+        """How many times more independent battles the same precision would need."""
+        return self.naive_variance / self.paired_variance if self.paired_variance else float("inf")
+
+    @property
+    def mispriced(self) -> bool:
+        return self.suggested_range is not None and not (
+            self.suggested_range[0] <= self.cost <= self.suggested_range[1]
+        )
+
+
+@dataclass
+class BalanceReport:
+    """Per-unit cost efficiency from ``measure_balance``."""
+
+    units: List[UnitBalance]
+    baselines: int
+    matchups: int
+    battles: int  # per comparison
+    elapsed: float
+    value_per_point: Optional[float] = None  # win rate one point buys on average
+
+    @property
+    def variance_reduction(self) -> float:
+        """Overall ratio of naive to paired variance."""
+        paired = sum(u.paired_variance for u in self.units)
+        return sum(u.naive_variance for u in self.units) / paired if paired else float("inf")
+
+
+def _tally(unit: UnitBalance, gained: bytes, lost: bytes) -> None:
+    """Add one comparison: ``gained`` fielded the extra unit, ``lost`` did not."""
+    battles = len(gained)
+    diffs = [a - b for a, b in zip(gained, lost)]
+    delta = sum(diffs) / battles
+    # Running mean over comparisons; the variances are summed and scaled at the end
+    unit.comparisons += 1
+    unit.deltas.append(delta)
+    unit.delta += (delta - unit.delta) / unit.comparisons
+    unit.paired_variance += statistics.variance(diffs) / battles
+    unit.naive_variance += (statistics.variance(gained) + statistics.variance(lost)) / battles
+
+
+def _finish_tally(unit: UnitBalance) -> None:
+    """Turn the summed per-comparison variances into variances of ``delta``."""
+    if unit.comparisons:
+        # Variances of the mean over ``comparisons`` independent estimates
+        unit.paired_variance /= unit.comparisons**2
+        unit.naive_variance /= unit.comparisons**2
+    if unit.comparisons > 1:
+        # Baselines differ in how much the unit adds; that spread is the error that matters
+        unit.spread_variance = statistics.variance(unit.deltas) / unit.comparisons
+
+
+def suggest_costs(report: BalanceReport, step: int = COST_STEP) -> None:
+    """Fill in each unit's suggested cost at the report's going rate per point."""
+    measured = [u for u in report.units if u.comparisons]
+    spent = sum(u.cost for u in measured)
+    rate = sum(u.delta for u in measured) / spent if spent else 0.0
+    if rate <= 0:
+        return
+    report.value_per_point = rate
+
+    def price(delta: float) -> int:
+        return max(step, int(round(delta / rate / step)) * step)
+
+    for unit in measured:
+        unit.suggested_cost = price(unit.delta)
+        unit.suggested_range = (price(unit.delta - unit.margin), price(unit.delta + unit.margin))
+
+
+def measure_balance(
+    entrants: Sequence[Entrant],
+    units: Optional[Sequence[str]] = None,
+    battles: int = 400,
+    opponents: int = 2,
+    workers: Optional[int] = None,
+    seed: int = 0,
+    progress=None,
+) -> BalanceReport:
+    """Measure the marginal win rate of each unit type against its cost.
+
+    Every entrant plays ``opponents`` of the other entrants (chosen by
+    ``seed``), and in each matchup adds and removes one unit of each type
+    in ``units`` (default: the whole database) over ``battles`` paired
+    battles.  ``progress`` is called with ``(finished, total)`` matchups.
+    """
+    if len(entrants) < 2:
+        raise ValueError("Balance measurements need at least two lineups.")
+    if battles < 4:
+        raise ValueError("Each comparison needs at least four battles.")
+    names = list(units) if units is not None else list(UNIT_DATABASE)
+    for name in names:
+        if name not in UNIT_DATABASE:
+            raise ValueError(f"Unknown unit '{name}'. Please add it to UNIT_DATABASE.")
+    started = time.monotonic()
+    workers = workers or os.cpu_count() or 1
+    rng = random.Random(seed)
+    matchups = []
+    for i in range(len(entrants)):
+        rivals = [j for j in range(len(entrants)) if j != i]
+        matchups.extend((i, j) for j in sorted(rng.sample(rivals, min(opponents, len(rivals)))))
+    balance = {name: UnitBalance(name, UNIT_DATABASE[name].cost) for name in names}
+
+    def task(i: int, j: int) -> Tuple[Tuple, List[Tuple[str, bool]]]:
+        lineup = entrants[i].units
+        variants, labels = [], []
+        for name in names:
+            variants.append(add_unit(lineup, name))
+            labels.append((name, True))
+            fewer = remove_unit(lineup, name)
+            if fewer:
+                variants.append(fewer)
+                labels.append((name, False))
+        return (lineup, entrants[j].units, variants, pair_seed(seed, i, j, 0), battles), labels
+
+    def record(outcomes: List[bytes], labels: List[Tuple[str, bool]], finished: int) -> None:
+        base = outcomes[0]
+        for (name, added), variant in zip(labels, outcomes[1:]):
+            if added:
+                _tally(balance[name], variant, base)
+            else:
+                _tally(balance[name], base, variant)
+        if progress is not None:
+            progress(finished, len(matchups))
+
+    if workers <= 1:
+        for finished, (i, j) in enumerate(matchups, 1):
+            args, labels = task(i, j)
+            record(_play_variants(*args), labels, finished)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = {}
+            queue = list(reversed(matchups))
+            finished = 0
+            while queue or pending:
+                while queue and len(pending) < workers * 2:
+                    args, labels = task(*queue.pop())
+                    pending[pool.submit(_play_variants, *args)] = labels
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finished += 1
+                    record(future.result(), pending.pop(future), finished)
+
+    for unit in balance.values():
+        _finish_tally(unit)
+    report = BalanceReport(
+        units=sorted(balance.values(), key=lambda u: -u.per_point),
+        baselines=len(entrants),
+        matchups=len(matchups),
+        battles=battles,
+        elapsed=time.monotonic() - started,
+    )
+    suggest_costs(report)
+    return report
+
+
+def format_balance_report(report: BalanceReport) -> str:
+    """Render a ``BalanceReport`` as a Markdown table and summary."""
+    lines = [
+        "# Unit cost efficiency",
+        f"{report.baselines} baseline lineups, {report.matchups} matchups, "
+        f"{report.battles} paired battles per comparison ({report.elapsed:.1f}s)",
+        "",
+        "| Unit | Cost | Comparisons | Win rate per unit | Per 100 pts | Suggested cost | Variance reduction |",
+        "|---|---:|---:|---:|---:|---:|---:|",
+    ]
+    for unit in report.units:
+        if not unit.comparisons:
+            continue
+        error = unit.margin
+        if unit.suggested_cost is None:
+            suggested = "–"
+        else:
+            low, high = unit.suggested_range
+            suggested = f"{unit.suggested_cost} ({low}–{high}){' ⚠' if unit.mispriced else ''}"
+        lines.append(
+            f"| {unit.name} | {unit.cost} | {unit.comparisons} | {unit.delta * 100:+.1f} ± {error * 100:.1f} pts "
+            f"| {unit.per_point * 1e4:+.1f} pts | {suggested} | {unit.variance_reduction:.1f}× |"
+        )
+    lines.append("")
+    if report.value_per_point is not None:
+        lines.append(
+            f"Going rate: {report.value_per_point * 1e4:.1f} win-rate points per 100 points of cost. "
+            "⚠ marks a unit whose 95% range excludes its current cost."
+        )
+    lines.append(
+        f"Common random numbers: the paired estimates have {report.variance_reduction:.1f}× less variance than "
+        f"independent battles would, i.e. naive sampling needs {report.variance_reduction:.1f}× the battles "
+        "for the same precision."
+    )
+    return "\n".join(lines)
+
+
+###############################################################################
+# Command-line interface
+###############################################################################
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="battle_balance.py",
+        description="Estimate each unit type's win rate per point and suggest costs.",
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--lineups", metavar="PATH", help="JSON list of baseline lineups")
+    source.add_argument("--budget", type=int, help="sample baselines from every maximal lineup within this budget")
+    parser.add_argument("--max-units", type=int, help="largest generated lineup")
+    parser.add_argument("--baselines", type=int, default=8, help="generated lineups to sample")
+    parser.add_argument("--units", help="comma-separated unit names to measure (defaults to all)")
+    parser.add_argument("--opponents", type=int, default=2, help="opponents each baseline faces")
+    parser.add_argument("--battles", type=int, default=400, help="paired battles per comparison")
+    parser.add_argument("--workers", type=int, help="worker processes (defaults to all CPUs)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", metavar="PATH", help="write the Markdown report here instead of stdout")
+    args = parser.parse_args(argv[1:])
+    try:
+        units = [name.strip() for name in args.units.split(",")] if args.units else None
+        if args.lineups:
+            entrants = load_entrants(args.lineups)
+        else:
+            entrants = generate_entrants(args.budget, max_units=args.max_units)
+            if len(entrants) > args.baselines:
+                entrants = random.Random(args.seed).sample(entrants, args.baselines)
+
+        def progress(finished: int, total: int) -> None:
+            print(f"  {finished}/{total} matchups", file=sys.stderr)
+
+        report = measure_balance(
+            entrants,
+            units=units,
+            battles=args.battles,
+            opponents=args.opponents,
+            workers=args.workers,
+            seed=args.seed,
+            progress=progress,
+        )
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+    text = format_balance_report(report)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,725 @@
+#!/usr/bin/env python3
+"""
+battle_exact.py
+===============
+
+Exact win probabilities for small Galaxy Clash battles.
+
+Monte Carlo needs thousands of battles to pin a win rate down to within a
+point, yet a battle between a handful of units only ever passes through a
+modest number of distinct states.  This module walks those states instead
+of sampling battles, treating the battle as a Markov chain whose state is
+
+* every roster entry's standing models, the wounds on its front model and
+  whether it is still waiting to act this round;
+* each team's morale and the accuracy modifier in the round context.
+
+Every random draw of the scalar engine becomes a branch weighted by its
+exact probability.  That covers the next unit to act (initiative is an
+exponential race, so each waiting unit goes next with probability
+proportional to its ``speed``), the target, the hit roll against
+``hit_chance`` and the number of hits in a squad's volley.  It also covers
+the fallen unit that ``revive`` or ``resurrection`` picks.  Damage comes
+from ``attack_damage``.  Morale shifts and ability effects follow
+``compute_round_events`` and ``apply_leader_abilities``, so the
+distribution is that of ``simulate_battle``.
+
+Entries of the same unit type and count are interchangeable.  Each team's
+entries are therefore kept sorted, and identical states reached along
+different paths are merged, with their probabilities added.  Health and
+morale are not bucketed: damage depends on the exact morale, so each state
+holds the values the scalar engine would.  Once a side is wiped out only
+models standing still matter, and the rest of the state is dropped.
+
+The number of states grows quickly with the size of the armies.
+``solve_battle`` gives up with ``StateBudgetExceeded`` once it has visited
+``max_states`` states or run for ``max_seconds``.  ``simulate_many(...,
+engine="exact")`` then falls back to sampling.  It gives the solver about
+as long as the sampling would take, timed on a few pilot battles (see
+``sampling_seconds``), so an oversized battle costs at most about twice
+as much as sampling it straight away.
+
+Usage
+-----
+``battle_story_ai.py config.json --odds N --engine exact`` prints the exact
+odds, or the odds from ``N`` simulated battles when the battle is over
+budget.  Running this file checks the exact solution against the simulator::
+
+    python battle_exact.py battle.json --battles 20000
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import statistics
+import sys
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from battle_story_ai import (
+    ABILITY_REGISTRY,
+    BATTLE_ROUNDS,
+    DARK_PRESENCE_MORALE,
+    MAX_BATTLE_ROUNDS,
+    ON_ATTACK,
+    ON_DEATH,
+    ON_KILL,
+    RESURRECTION_HEALTH_DIVISOR,
+    ROUND_START,
+    TACTICAL_INSIGHT_MORALE,
+    AttackModifier,
+    BattleGrid,
+    BattleSnapshot,
+    OddsResult,
+    Squad,
+    Team,
+    UnitType,
+    attack_damage,
+    fights_to_completion,
+    hit_chance,
+    load_battle_config,
+    simulate_battle,
+)
+
+# States the solver may visit before handing the battle back to sampling
+# (a few hundred milliseconds' worth)
+DEFAULT_STATE_BUDGET = 20_000
+
+# Battles timed to estimate how long sampling a matchup takes
+PILOT_BATTLES = 20
+
+# The solver checks the clock every this many states
+_CLOCK_EVERY = 256
+
+# Abilities whose effects the solver knows, by trigger.  Attack abilities
+# are the declarative ``AttackModifier`` entries of ``ABILITY_REGISTRY``.
+SUPPORTED_ABILITIES = {
+    ROUND_START: (
+        "fear_aura",
+        "morale_break",
+        "tactical_boost",
+        "revive",
+        "inspires_rebels",
+        "protective_aura",
+        "furious_charge",
+    ),
+    ON_KILL: ("dark_presence",),
+    ON_DEATH: ("tactical_insight", "resurrection"),
+}
+
+# A state is (entries of team one, entries of team two, morale one, morale
+# two, accuracy modifier); an entry is (kind, models standing, wounds on the
+# front model, waiting to act).
+State = Tuple
+Entry = Tuple[int, int, int, int]
+Branches = List[Tuple[State, float]]
+
+_SIZE = itemgetter(1)
+_WAITING = itemgetter(3)
+
+
+class StateBudgetExceeded(RuntimeError):
+    """The battle has more states than the solver was allowed to visit."""
+
+
+###############################################################################
+# Battle layout
+###############################################################################
+
+@dataclass(frozen=True)
+class _Kind:
+    """Everything the solver needs about one kind of roster entry."""
+
+    template: UnitType
+    count: int
+    squad: bool
+    round_start: Tuple[str, ...]
+    on_attack: Tuple[AttackModifier, ...]
+    on_kill: Tuple[str, ...]
+    on_death: Tuple[str, ...]
+
+
+class ExactLayout:
+    """Static description of a matchup: the kinds of entry on each side.
+
+    Entries with the same unit type and count share a kind.  ``casters``
+    lists, per side, the kind of every entry with a round-start ability in
+    roster order, which is the order ``apply_leader_abilities`` fires them.
+    A layout also caches target draws and attack rolls, which many states
+    share.
+    """
+
+    def __init__(self, team1: Team, team2: Team) -> None:
+        self.kinds: Tuple[List[_Kind], List[_Kind]] = ([], [])
+        self.slots: Tuple[List[int], List[int]] = ([], [])
+        self.casters: Tuple[List[int], List[int]] = ([], [])
+        for side, team in enumerate((team1, team2)):
+            index: Dict[Tuple[str, int, bool], int] = {}
+            for unit in team.units:
+                key = (unit.template.name, unit.count, isinstance(unit, Squad))
+                if key not in index:
+                    index[key] = len(self.kinds[side])
+                    self.kinds[side].append(self._kind(unit.template, unit.count, key[2]))
+                kind = index[key]
+                self.slots[side].append(kind)
+                if self.kinds[side][kind].round_start:
+                    self.casters[side].append(kind)
+        # Only a side that can resurrect needs to remember its fallen units'
+        # place in the initiative order
+        self.resurrects = tuple(
+            any("resurrection" in kind.on_death for kind in kinds) for kinds in self.kinds
+        )
+        self.targets: Dict[Tuple[Entry, ...], List[Tuple[Entry, float]]] = {}
+        self.attacks: Dict[Tuple, Tuple[float, float, int]] = {}
+
+    @staticmethod
+    def _kind(template: UnitType, count: int, squad: bool) -> _Kind:
+        effects: Dict[str, List] = {ROUND_START: [], ON_ATTACK: [], ON_KILL: [], ON_DEATH: []}
+        names = ([template.leader_ability] if template.leader_ability else []) + list(template.abilities)
+        for name in names:
+            for trigger, handler in ABILITY_REGISTRY.get(name, {}).items():
+                if trigger == ON_ATTACK:
+                    if not isinstance(handler, AttackModifier):
+                        raise ValueError(f"Ability '{name}' is not supported by the exact solver.")
+                    effects[ON_ATTACK].append(handler)
+                elif name in SUPPORTED_ABILITIES[trigger]:
+                    effects[trigger].append(name)
+                else:
+                    raise ValueError(f"Ability '{name}' is not supported by the exact solver.")
+        return _Kind(
+            template=template,
+            count=count,
+            squad=squad,
+            round_start=tuple(effects[ROUND_START]),
+            on_attack=tuple(effects[ON_ATTACK]),
+            on_kill=tuple(effects[ON_KILL]),
+            on_death=tuple(effects[ON_DEATH]),
+        )
+
+    def state(self, team1: Team, team2: Team, context: Dict[str, float]) -> State:
+        """The canonical state of two teams between rounds."""
+        sides = []
+        for side, team in enumerate((team1, team2)):
+            entries = []
+            for kind, unit in zip(self.slots[side], team.units):
+                if not unit.is_alive:
+                    entries.append((kind, 0, 0, 0))
+                elif isinstance(unit, Squad):
+                    entries.append((kind, unit.size, unit.wounds, 0))
+                else:
+                    entries.append((kind, 1, unit.template.health - unit.current_health, 0))
+            sides.append(tuple(sorted(entries)))
+        return _settle((sides[0], sides[1], team1.morale, team2.morale, context.get("accuracy_modifier", 1.0)))
+
+    def fielded(self, side: int) -> Dict[str, int]:
+        """Models fielded per unit type on ``side``."""
+        counts: Dict[str, int] = {}
+        for kind in self.slots[side]:
+            template = self.kinds[side][kind].template
+            counts[template.name] = counts.get(template.name, 0) + self.kinds[side][kind].count
+        return counts
+
+
+###############################################################################
+# Transitions
+###############################################################################
+
+def _with_morale(state: State, side: int, delta: float) -> State:
+    """Mirror of ``Team.apply_morale_change``."""
+    morale = max(0.1, min(2.0, state[2 + side] + delta))
+    return state[: 2 + side] + (morale,) + state[3 + side :]
+
+
+def _with_entry(state: State, side: int, old: Entry, new: Entry) -> State:
+    entries = list(state[side])
+    entries[entries.index(old)] = new
+    entries.sort()
+    return (tuple(entries), state[1]) + state[2:] if side == 0 else (state[0], tuple(entries)) + state[2:]
+
+
+def _standing(entries: Tuple[Entry, ...]) -> bool:
+    return any(map(_SIZE, entries))
+
+
+def _settle(state: State) -> State:
+    """Once a side is wiped out only the models standing decide the outcome."""
+    if _standing(state[0]) and _standing(state[1]):
+        return state
+    sides = tuple(tuple(sorted((kind, size, 0, 0) for kind, size, _, _ in state[side])) for side in (0, 1))
+    return sides + (1.0, 1.0, 1.0)
+
+
+def _tally(entries) -> Dict[Entry, int]:
+    copies: Dict[Entry, int] = {}
+    for entry in entries:
+        copies[entry] = copies.get(entry, 0) + 1
+    return copies
+
+
+def _choices(entries: Tuple[Entry, ...], weight: Callable[[Entry], int], exclude: Optional[Entry] = None) -> List[Tuple[Entry, float]]:
+    """Distinct entries with their chance of being picked with the given weights.
+
+    ``exclude`` takes one copy of that entry out of the draw.
+    """
+    counts = _tally(entries)
+    if exclude is not None:
+        counts[exclude] -= 1
+    weights = [(entry, weight(entry) * copies) for entry, copies in counts.items() if copies]
+    total = sum(w for _, w in weights)
+    return [(entry, w / total) for entry, w in weights if w > 0]
+
+
+def _targets(layout: ExactLayout, entries: Tuple[Entry, ...]) -> List[Tuple[Entry, float]]:
+    """Mirror of ``Team.random_alive``: models are equally likely to be picked."""
+    choices = layout.targets.get(entries)
+    if choices is None:
+        choices = layout.targets[entries] = _choices(entries, _SIZE)
+    return choices
+
+
+def _revive(layout: ExactLayout, state: State, side: int, divisor: int, exclude: Optional[Entry] = None) -> Branches:
+    """Mirror of ``Team.random_fallen`` followed by ``Team.revive``."""
+    kinds = layout.kinds[side]
+    choices = _choices(state[side], lambda entry: kinds[entry[0]].count - entry[1], exclude)
+    if not choices:
+        return [(state, 1.0)]
+    branches = []
+    for entry, p in choices:
+        kind, size, wounds, waiting = entry
+        health = kinds[kind].template.health
+        restored = max(1, health // divisor)
+        if size:
+            wounds = max(wounds, health - restored)
+        else:
+            wounds = health - restored
+        branches.append((_with_entry(state, side, entry, (kind, size + 1, wounds, waiting)), p))
+    return branches
+
+
+def _then(branches: Branches, step: Callable[[State], Branches]) -> Branches:
+    return [(after, p * q) for state, p in branches for after, q in step(state)]
+
+
+def _round_start(layout: ExactLayout, state: State, round_number: int) -> Branches:
+    """Mirror of ``apply_leader_abilities`` for both teams, then line up the round."""
+    branches: Branches = [(state, 1.0)]
+    for side in (0, 1):
+        branches = _then(branches, lambda s, side=side: _side_round_start(layout, s, side, round_number))
+    begun = []
+    for state, p in branches:
+        if _standing(state[0]) and _standing(state[1]):
+            state = tuple(
+                tuple((kind, size, wounds, 1 if size else 0) for kind, size, wounds, _ in state[side]) for side in (0, 1)
+            ) + state[2:]
+        begun.append((state, p))
+    return begun
+
+
+def _side_round_start(layout: ExactLayout, state: State, side: int, round_number: int) -> Branches:
+    # Only units standing when the pass starts act, as in apply_leader_abilities
+    ready = Counter(entry[0] for entry in state[side] if entry[1])
+    branches: Branches = [(state, 1.0)]
+    for kind in layout.casters[side]:
+        if not ready[kind]:
+            continue
+        ready[kind] -= 1
+        for name in layout.kinds[side][kind].round_start:
+            if name == "revive" and round_number >= 2:
+                branches = _then(branches, lambda s: _revive(layout, s, side, 2))
+            elif round_number != 1:
+                continue
+            elif name == "fear_aura":
+                branches = [(s[:4] + (s[4] * 0.85,), p) for s, p in branches]
+            elif name == "tactical_boost":
+                branches = [(s[:4] + (s[4] * 1.15,), p) for s, p in branches]
+            elif name == "morale_break":
+                branches = [(_with_morale(s, 1 - side, -0.2), p) for s, p in branches]
+            elif name == "inspires_rebels":
+                branches = [(_with_morale(s, side, 0.2), p) for s, p in branches]
+            # protective_aura and furious_charge only narrate at round start
+    return branches
+
+
+def _act(layout: ExactLayout, state: State, round_number: int) -> Branches:
+    """Let the next waiting unit act: mirror of one turn of ``compute_round_events``."""
+    waiting = []
+    total = 0.0
+    for side in (0, 1):
+        kinds = layout.kinds[side]
+        for entry, copies in _tally(filter(_WAITING, state[side])).items():
+            speed = kinds[entry[0]].template.speed * copies
+            waiting.append((side, entry, speed))
+            total += speed
+    branches: Branches = []
+    for side, entry, speed in waiting:
+        p = speed / total
+        kind, size, wounds, _ = entry
+        after = _with_entry(state, side, entry, (kind, size, wounds, 0))
+        if not size:
+            # Fell before its turn
+            branches.append((after, p))
+            continue
+        for result, q in _attack(layout, after, side, kind, size, round_number):
+            branches.append((_settle(result), p * q))
+    return branches
+
+
+def _attack(layout: ExactLayout, state: State, side: int, kind_index: int, size: int, round_number: int) -> Branches:
+    kind = layout.kinds[side][kind_index]
+    template = kind.template
+    enemy = 1 - side
+    standing = None
+    if template.synergies:
+        standing = frozenset(layout.kinds[side][entry[0]].template.name for entry in state[side] if entry[1])
+    key = (side, kind_index, state[2 + side], state[4], round_number, standing)
+    rolled = layout.attacks.get(key)
+    if rolled is None:
+        context: Dict[str, float] = {"attacker_morale": state[2 + side], "accuracy_modifier": state[4]}
+        morale = state[2 + side]
+        if standing is not None:
+            # Mirror of apply_synergies; only the morale bonus changes the rules
+            for required, modifiers in template.synergies.items():
+                if required not in standing:
+                    continue
+                for name, multiplier in modifiers.items():
+                    if name == "morale_bonus":
+                        morale = max(0.1, min(2.0, morale + multiplier))
+        for modifier in kind.on_attack:
+            modifier(None, context, round_number)
+        rolled = layout.attacks[key] = (morale, hit_chance(template, context), attack_damage(template, context))
+    morale, chance, damage = rolled
+    if morale != state[2 + side]:
+        state = state[: 2 + side] + (morale,) + state[3 + side :]
+    if kind.squad:
+        return _volley(layout, state, side, kind, size, chance, damage)
+
+    branches: Branches = [(_with_morale(state, side, 0.02), 1.0 - chance)]
+    for target, q in _targets(layout, state[enemy]):
+        for result, r, killed in _strike(layout, state, side, kind, target, damage):
+            if not killed:
+                # Slight morale boost for wounding an enemy
+                result = _with_morale(result, side, 0.02)
+            branches.append((result, chance * q * r))
+    return branches
+
+
+def _strike(layout: ExactLayout, state: State, side: int, kind: _Kind, target: Entry, damage: int) -> List[Tuple[State, float, bool]]:
+    """One hit on ``target``: its damage, and on a kill the morale and kill abilities."""
+    enemy = 1 - side
+    victim_kind = layout.kinds[enemy][target[0]]
+    health = victim_kind.template.health
+    index, size, wounds, waiting = target
+    wounds += damage
+    if wounds < health:
+        return [(_with_entry(state, enemy, target, (index, size, wounds, waiting)), 1.0, False)]
+    # A fallen unit that cannot be raised would only be skipped when its turn comes
+    victim = (index, size - 1, 0, waiting if size > 1 or layout.resurrects[enemy] else 0)
+    state = _with_entry(state, enemy, target, victim)
+    state = _with_morale(state, enemy, -0.3 if victim_kind.template.role == "Leader" else -0.05)
+    if "dark_presence" in kind.on_kill:
+        state = _with_morale(state, enemy, DARK_PRESENCE_MORALE)
+    branches: Branches = [(state, 1.0)]
+    for name in victim_kind.on_death:
+        if name == "tactical_insight":
+            branches = [(_with_morale(s, enemy, TACTICAL_INSIGHT_MORALE), p) for s, p in branches]
+        elif name == "resurrection":
+            branches = _then(branches, lambda s: _revive(layout, s, enemy, RESURRECTION_HEALTH_DIVISOR, victim))
+    return [(s, p, True) for s, p in branches]
+
+
+def _binomial_pmf(trials: int, p: float) -> List[float]:
+    """Distribution of ``binomial(rng, trials, p)``, including its normal approximation."""
+    if trials < 50 or hasattr(random.Random, "binomialvariate"):
+        return [math.comb(trials, k) * p**k * (1 - p) ** (trials - k) for k in range(trials + 1)]
+    normal = statistics.NormalDist(trials * p, math.sqrt(trials * p * (1 - p)))
+    below = [normal.cdf(k + 0.5) for k in range(trials)]
+    return [below[0]] + [below[k] - below[k - 1] for k in range(1, trials)] + [1.0 - below[-1]]
+
+
+def _volley(layout: ExactLayout, state: State, side: int, kind: _Kind, shots: int, chance: float, damage: int) -> Branches:
+    """Mirror of ``resolve_volley``: the hits are resolved one after another."""
+    enemy = 1 - side
+    pmf = _binomial_pmf(shots, chance)
+    tail = [0.0] * (shots + 2)
+    for k in range(shots, -1, -1):
+        tail[k] = tail[k + 1] + pmf[k]
+    # (state, kills) after j hits, reached with the chance of at least j hits
+    layer: Dict[Tuple[State, int], float] = {(state, 0): 1.0}
+    done: Dict[Tuple[State, int], float] = defaultdict(float)
+    for j in range(shots + 1):
+        if not layer:
+            break
+        go_on = tail[j + 1] / tail[j] if tail[j] > 0 else 0.0
+        following: Dict[Tuple[State, int], float] = defaultdict(float)
+        for (current, kills), p in layer.items():
+            if not _standing(current[enemy]):
+                done[current, kills] += p
+                continue
+            done[current, kills] += p * (1.0 - go_on)
+            if not go_on:
+                continue
+            for target, q in _targets(layout, current[enemy]):
+                for result, r, killed in _strike(layout, current, side, kind, target, damage):
+                    following[result, kills + killed] += p * go_on * q * r
+        layer = following
+    return [(_with_morale(s, side, 0.02 * (shots - kills)), p) for (s, kills), p in done.items() if p > 0]
+
+
+###############################################################################
+# Solver
+###############################################################################
+
+@dataclass
+class ExactSolution:
+    """The exact outcome distribution of one matchup.
+
+    ``outcomes`` maps ``(winner, survivors, casualties, rounds)`` to its
+    probability, with the fields of ``BattleOutcome`` and each side's
+    casualties as sorted ``(unit type, models lost)`` pairs.  ``states``
+    is the number of states the solver visited.
+    """
+
+    team_names: Tuple[str, str]
+    fielded: Tuple[Dict[str, int], Dict[str, int]]
+    outcomes: Dict[Tuple, float]
+    states: int
+
+    @property
+    def win_rates(self) -> Tuple[float, float]:
+        first = sum(p for (winner, _, _, _), p in self.outcomes.items() if winner == 0)
+        return first, 1.0 - first
+
+    def odds(self) -> OddsResult:
+        """The solution in the form ``simulate_many`` reports its estimates."""
+        survivors = [0.0, 0.0]
+        dead: Tuple[Dict[str, float], Dict[str, float]] = ({}, {})
+        for (_, standing, casualties, _), p in self.outcomes.items():
+            for side in (0, 1):
+                survivors[side] += p * standing[side]
+                for name, lost in casualties[side]:
+                    dead[side][name] = dead[side].get(name, 0.0) + p * lost
+        win_rates = self.win_rates
+        return OddsResult(
+            team_names=self.team_names,
+            battles=0,
+            wins=(0, 0),
+            win_rates=win_rates,
+            confidence=1.0,
+            confidence_intervals=((win_rates[0], win_rates[0]), (win_rates[1], win_rates[1])),
+            mean_survivors=(survivors[0], survivors[1]),
+            casualty_rates=tuple(
+                {name: dead[side].get(name, 0.0) / num for name, num in self.fielded[side].items()}
+                for side in (0, 1)
+            ),
+            states=self.states,
+        )
+
+
+def _outcome(layout: ExactLayout, state: State, rounds: int) -> Tuple:
+    """The ``ExactSolution.outcomes`` key of a finished battle (see ``winner_index``)."""
+    standing = []
+    health = []
+    casualties = []
+    for side in (0, 1):
+        kinds = layout.kinds[side]
+        standing.append(sum(size for _, size, _, _ in state[side]))
+        health.append(sum(size * kinds[kind].template.health - wounds for kind, size, wounds, _ in state[side] if size))
+        lost: Dict[str, int] = {}
+        for kind, size, _, _ in state[side]:
+            if size < kinds[kind].count:
+                name = kinds[kind].template.name
+                lost[name] = lost.get(name, 0) + kinds[kind].count - size
+        casualties.append(tuple(sorted(lost.items())))
+    if standing[0] != standing[1]:
+        winner = 0 if standing[0] > standing[1] else 1
+    else:
+        winner = 0 if health[0] >= health[1] else 1
+    return winner, (standing[0], standing[1]), (casualties[0], casualties[1]), rounds
+
+
+def solve_battle(
+    team1: Team,
+    team2: Team,
+    battlefield: Optional[Dict[str, str]] = None,
+    start: Optional[BattleSnapshot] = None,
+    max_states: int = DEFAULT_STATE_BUDGET,
+    max_seconds: Optional[float] = None,
+) -> ExactSolution:
+    """Work out the exact outcome distribution of a battle between two teams.
+
+    The battle is played breadth first: every state reachable after each
+    action is kept once with its total probability.  Raises
+    ``StateBudgetExceeded`` after visiting ``max_states`` states or after
+    running for ``max_seconds``, and ``ValueError`` for positioning or
+    abilities the solver does not model.
+    ``start`` and ``"fight_to_completion"`` in the battlefield work as in
+    ``simulate_battle``.  The teams are left in the starting state.
+    """
+    if BattleGrid.for_battlefield(battlefield) is not None:
+        raise ValueError("The exact solver does not model battlefield positioning.")
+    to_completion = fights_to_completion(battlefield)
+    layout = ExactLayout(team1, team2)
+    if start is None:
+        team1.reset()
+        team2.reset()
+        context: Dict[str, float] = {}
+        first = 1
+    else:
+        context = start.restore(team1, team2)
+        first = start.round_number + 1
+    last = MAX_BATTLE_ROUNDS if to_completion else BATTLE_ROUNDS
+
+    layer: Dict[State, float] = {layout.state(team1, team2, context): 1.0}
+    outcomes: Dict[Tuple, float] = defaultdict(float)
+    visited = 0
+    deadline = None if max_seconds is None else time.perf_counter() + max_seconds
+    played = first - 1
+    for round_number in range(first, last + 1):
+        started: Dict[State, float] = defaultdict(float)
+        for state, p in layer.items():
+            if to_completion and not (_standing(state[0]) and _standing(state[1])):
+                outcomes[_outcome(layout, state, round_number - 1)] += p
+                continue
+            for after, q in _round_start(layout, state, round_number):
+                started[after] += p * q
+        layer = started
+        if not layer:
+            break
+        played = round_number
+        ended: Dict[State, float] = defaultdict(float)
+        while layer:
+            visited += len(layer)
+            if visited > max_states:
+                raise StateBudgetExceeded(f"The battle has more than {max_states} states.")
+            following: Dict[State, float] = defaultdict(float)
+            for done, (state, p) in enumerate(layer.items()):
+                if deadline is not None and not done % _CLOCK_EVERY and time.perf_counter() > deadline:
+                    raise StateBudgetExceeded(f"The battle took longer than {max_seconds:.2f}s to solve.")
+                if not (any(map(_WAITING, state[0])) or any(map(_WAITING, state[1]))):
+                    ended[state] += p
+                    continue
+                for after, q in _act(layout, state, round_number):
+                    following[after] += p * q
+            layer = following
+        layer = ended
+    for state, p in layer.items():
+        outcomes[_outcome(layout, state, played)] += p
+    return ExactSolution(
+        team_names=(team1.name, team2.name),
+        fielded=(layout.fielded(0), layout.fielded(1)),
+        outcomes=dict(outcomes),
+        states=visited,
+    )
+
+
+def sampling_seconds(
+    team1: Team,
+    team2: Team,
+    battlefield: Optional[Dict[str, str]] = None,
+    battles: int = 1000,
+    workers: int = 1,
+    start: Optional[BattleSnapshot] = None,
+    tolerance: Optional[float] = None,
+) -> float:
+    """Estimate how long ``simulate_many`` would take to sample the matchup.
+
+    Times ``PILOT_BATTLES`` battles and scales them to ``battles`` spread
+    over ``workers`` processes.  A ``tolerance`` caps the battles at about
+    as many as the run would need to stop early.
+    """
+    if tolerance:
+        battles = min(battles, math.ceil(0.25 * (1.96 / tolerance) ** 2))
+    grid = BattleGrid.for_battlefield(battlefield)
+    to_completion = fights_to_completion(battlefield)
+    rng = random.Random(0)
+    began = time.perf_counter()
+    for _ in range(PILOT_BATTLES):
+        simulate_battle(team1, team2, rng, grid, start, to_completion)
+    return (time.perf_counter() - began) / PILOT_BATTLES * battles / max(1, workers)
+
+
+###############################################################################
+# Agreement with the simulator
+###############################################################################
+
+def sampling_check(
+    team1: Team,
+    team2: Team,
+    battlefield: Optional[Dict[str, str]] = None,
+    battles: int = 20000,
+    seed: Optional[int] = 0,
+    z_limit: float = 4.0,
+    max_states: int = DEFAULT_STATE_BUDGET,
+) -> Dict[str, float]:
+    """Compare the exact solution with ``battles`` simulated battles.
+
+    Computes the z statistic of the simulated team one win rate and of each
+    side's mean number of survivors against their exact values and
+    variances.  The result includes ``passed``, which is False as soon as
+    any statistic exceeds ``z_limit`` in absolute value.
+    """
+    solution = solve_battle(team1, team2, battlefield, max_states=max_states)
+    grid = BattleGrid.for_battlefield(battlefield)
+    to_completion = fights_to_completion(battlefield)
+    rng = random.Random(seed)
+    sampled: Dict[str, List[int]] = {"win_rate": [], "survivors_team1": [], "survivors_team2": []}
+    for _ in range(battles):
+        outcome = simulate_battle(team1, team2, rng, grid, to_completion=to_completion)
+        sampled["win_rate"].append(1 - outcome.winner)
+        sampled["survivors_team1"].append(outcome.survivors[0])
+        sampled["survivors_team2"].append(outcome.survivors[1])
+
+    exact: Dict[str, Tuple[float, float]] = {}
+    for key, value in (
+        ("win_rate", lambda winner, standing: 1 - winner),
+        ("survivors_team1", lambda winner, standing: standing[0]),
+        ("survivors_team2", lambda winner, standing: standing[1]),
+    ):
+        mean = sum(p * value(o[0], o[1]) for o, p in solution.outcomes.items())
+        square = sum(p * value(o[0], o[1]) ** 2 for o, p in solution.outcomes.items())
+        exact[key] = (mean, max(0.0, square - mean * mean))
+
+    results: Dict[str, float] = {"states": solution.states}
+    for key, values in sampled.items():
+        mean, variance = exact[key]
+        observed = statistics.fmean(values)
+        se = math.sqrt(variance / battles)
+        results[f"{key}_exact"] = mean
+        results[f"{key}_simulated"] = observed
+        if se == 0:
+            results[f"{key}_z"] = 0.0 if abs(observed - mean) < 1e-9 else math.inf
+        else:
+            results[f"{key}_z"] = (observed - mean) / se
+    results["passed"] = all(abs(results[f"{key}_z"]) <= z_limit for key in sampled)
+    return results
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="battle_exact.py",
+        description="Check the exact battle solver against simulated battles.",
+    )
+    parser.add_argument("config", help="battle configuration JSON file, or '-' for stdin")
+    parser.add_argument("--battles", type=int, default=20000, help="simulated battles to compare with")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--state-budget", type=int, default=DEFAULT_STATE_BUDGET, help="states the solver may visit")
+    args = parser.parse_args(argv[1:])
+    try:
+        team1, team2, battlefield, _budget = load_battle_config(args.config)
+        results = sampling_check(team1, team2, battlefield, args.battles, args.seed, max_states=args.state_budget)
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+    for key, value in results.items():
+        print(f"{key}: {value}")
+    return 0 if results["passed"] else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+battle_optimizer.py
+===================
+
+Search ``UNIT_DATABASE`` for the lineup that best counters a given roster.
+
+Players regularly ask "what is the best 500 point team against this
+army?".  Answering that by hand means running ``battle_story_ai.py`` over
+and over; this module automates the search in two phases:
+
+1. **Branch and bound over cost.**  ``enumerate_lineups`` walks unit
+   counts from the most expensive unit type downwards, dropping every
+   branch whose cost exceeds the budget.  ``seed_lineups`` keeps the
+   ``beam`` lineups with the highest cheap ``lineup_strength`` estimate and
+   prunes any branch whose optimistic bound (current strength plus the
+   remaining budget spent at the best strength-per-cost still available)
+   cannot beat them.
+2. **Local search on simulated win rate.**  Each seed is scored by
+   simulated battles against the opponent, with the candidate playing both
+   team slots to cancel the tie-breaker bias.  The best lineups are then
+   perturbed (swap one unit for another and top up the freed budget) and
+   the neighbours evaluated, until no neighbour improves on the current
+   best lineups or the wall-clock limit is reached.
+
+Evaluations run on a process pool, all candidates share the same battle
+seed (common random numbers, so differences in win rate come from the
+lineups rather than from the dice) and scores are cached by composition,
+so two search paths reaching the same multiset of units pay once.
+
+Usage
+-----
+The opponent is one team of an ordinary battle configuration::
+
+    python battle_optimizer.py battle.json --against 1 --budget 500 --top 5
+
+Only the standard library is needed.
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import heapq
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from battle_story_ai import (
+    UNIT_DATABASE,
+    Team,
+    UnitType,
+    _simulate_chunk,
+    load_battle_config,
+    parse_unit_spec,
+)
+
+# A lineup is a canonical composition: sorted (unit name, count) pairs
+Lineup = Tuple[Tuple[str, int], ...]
+
+
+###############################################################################
+# Lineups
+###############################################################################
+
+def make_lineup(counts: Dict[str, int]) -> Lineup:
+    """Canonical, hashable form of a unit-count mapping."""
+    return tuple(sorted((name, num) for name, num in counts.items() if num > 0))
+
+
+def lineup_from_specs(specs: Sequence[str]) -> Lineup:
+    """Turn roster entries such as ``"3x Stormtrooper"`` into a lineup."""
+    counts: Dict[str, int] = {}
+    for spec in specs:
+        num, name = parse_unit_spec(spec)
+        if name not in UNIT_DATABASE:
+            raise ValueError(f"Unknown unit '{name}'. Please add it to UNIT_DATABASE.")
+        counts[name] = counts.get(name, 0) + num
+    return make_lineup(counts)
+
+
+def lineup_specs(lineup: Lineup) -> List[str]:
+    """Roster entries for a lineup, one entry per unit as players write them."""
+    return [name for name, num in lineup for _ in range(num)]
+
+
+def lineup_cost(lineup: Lineup) -> int:
+    return sum(UNIT_DATABASE[name].cost * num for name, num in lineup)
+
+
+def unit_strength(template: UnitType) -> float:
+    """Cheap combat value used to rank lineups before any simulation.
+
+    Under Lanchester's square law a force's strength grows with the sum of
+    sqrt(health × damage) over its units, which makes the estimate additive
+    and therefore usable as a branch-and-bound objective.  Leaders get a
+    flat bonus for their round-by-round abilities.
+    """
+    value = math.sqrt(template.health * template.damage)
+    return value * 1.2 if template.leader_ability else value
+
+
+def lineup_strength(lineup: Lineup) -> float:
+    return sum(unit_strength(UNIT_DATABASE[name]) * num for name, num in lineup)
+
+
+def _candidate_types(units: Optional[Sequence[str]]) -> List[UnitType]:
+    names = list(units) if units is not None else list(UNIT_DATABASE)
+    for name in names:
+        if name not in UNIT_DATABASE:
+            raise ValueError(f"Unknown unit '{name}'. Please add it to UNIT_DATABASE.")
+    # Most expensive first so the cost bound prunes as early as possible
+    return sorted((UNIT_DATABASE[name] for name in names), key=lambda t: (-t.cost, t.name))
+
+
+def enumerate_lineups(
+    budget: int, units: Optional[Sequence[str]] = None, max_units: Optional[int] = None
+) -> Iterator[Lineup]:
+    """Yield every maximal lineup that fits ``budget``.
+
+    A lineup is maximal when no further unit of the allowed types is
+    affordable (or ``max_units`` is reached); spending less than that never
+    helps in a battle decided by surviving units.
+    """
+    types = _candidate_types(units)
+    if not types:
+        return
+    cheapest = min(t.cost for t in types)
+    counts: Dict[str, int] = {}
+
+    def walk(index: int, remaining: int, size: int) -> Iterator[Lineup]:
+        full = max_units is not None and size >= max_units
+        if index == len(types) or full:
+            if full or remaining < cheapest:
+                yield make_lineup(counts)
+            return
+        template = types[index]
+        most = remaining // template.cost
+        if max_units is not None:
+            most = min(most, max_units - size)
+        for num in range(most, -1, -1):
+            counts[template.name] = num
+            yield from walk(index + 1, remaining - num * template.cost, size + num)
+        counts[template.name] = 0
+
+    yield from walk(0, budget, 0)
+
+
+def seed_lineups(
+    budget: int, beam: int = 8, units: Optional[Sequence[str]] = None, max_units: Optional[int] = None
+) -> List[Lineup]:
+    """Branch and bound for the ``beam`` maximal lineups with the best strength."""
+    types = _candidate_types(units)
+    if not types:
+        return []
+    cheapest = min(t.cost for t in types)
+    # Best strength per point among types[i:], for the optimistic bound
+    best_ratio = [0.0] * (len(types) + 1)
+    for i in range(len(types) - 1, -1, -1):
+        best_ratio[i] = max(best_ratio[i + 1], unit_strength(types[i]) / types[i].cost)
+    best: List[Tuple[float, Lineup]] = []  # min-heap of the current beam
+    counts: Dict[str, int] = {}
+
+    def walk(index: int, remaining: int, size: int, strength: float) -> None:
+        if len(best) == beam and strength + remaining * best_ratio[index] <= best[0][0]:
+            return
+        full = max_units is not None and size >= max_units
+        if index == len(types) or full:
+            if full or remaining < cheapest:
+                entry = (strength, make_lineup(counts))
+                if len(best) < beam:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+            return
+        template = types[index]
+        value = unit_strength(template)
+        most = remaining // template.cost
+        if max_units is not None:
+            most = min(most, max_units - size)
+        for num in range(most, -1, -1):
+            counts[template.name] = num
+            walk(index + 1, remaining - num * template.cost, size + num, strength + num * value)
+        counts[template.name] = 0
+
+    walk(0, budget, 0, 0.0)
+    return [lineup for _strength, lineup in sorted(best, reverse=True)]
+
+
+def neighbours(
+    lineup: Lineup, budget: int, units: Optional[Sequence[str]] = None, max_units: Optional[int] = None
+) -> List[Lineup]:
+    """Lineups one swap away: replace a unit, then top up the freed budget.
+
+    The top-up greedily adds the affordable unit with the best strength per
+    point, so every neighbour is maximal again.
+    """
+    types = _candidate_types(units)
+    by_value = sorted(types, key=lambda t: (-unit_strength(t) / t.cost, t.name))
+    found = set()
+    base = dict(lineup)
+    for removed in list(base):
+        for added in types:
+            if added.name == removed:
+                continue
+            counts = dict(base)
+            counts[removed] -= 1
+            counts[added.name] = counts.get(added.name, 0) + 1
+            cost = lineup_cost(make_lineup(counts))
+            size = sum(counts.values())
+            if cost > budget:
+                continue
+            for template in by_value:
+                while cost + template.cost <= budget and (max_units is None or size < max_units):
+                    counts[template.name] = counts.get(template.name, 0) + 1
+                    cost += template.cost
+                    size += 1
+            found.add(make_lineup(counts))
+    found.discard(lineup)
+    return sorted(found)
+
+
+###############################################################################
+# Search
+###############################################################################
+
+@dataclass
+class LineupScore:
+    """Simulated record of one lineup against the opponent."""
+
+    lineup: Lineup
+    wins: int = 0
+    battles: int = 0
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.battles if self.battles else 0.0
+
+    @property
+    def cost(self) -> int:
+        return lineup_cost(self.lineup)
+
+    @property
+    def units(self) -> List[str]:
+        return lineup_specs(self.lineup)
+
+
+@dataclass
+class OptimizerResult:
+    """Best lineups found by ``optimize_lineup``."""
+
+    opponent: str
+    budget: int
+    top: List[LineupScore]
+    evaluated: int
+    elapsed: float
+    timed_out: bool = False
+    cache: Dict[Lineup, LineupScore] = field(default_factory=dict, repr=False)
+
+
+def optimize_lineup(
+    opponent: Team,
+    budget: int,
+    top_k: int = 5,
+    battles: int = 200,
+    time_limit: Optional[float] = 60.0,
+    workers: Optional[int] = None,
+    seed: Optional[int] = 0,
+    beam: int = 8,
+    units: Optional[Sequence[str]] = None,
+    max_units: Optional[int] = None,
+    cache: Optional[Dict[Lineup, LineupScore]] = None,
+) -> OptimizerResult:
+    """Find the ``top_k`` lineups within ``budget`` that best beat ``opponent``.
+
+    Every candidate plays ``battles`` battles, half in each team slot, all
+    from the same ``seed``.  The search stops when local search converges or
+    once ``time_limit`` seconds have passed, returning the best lineups
+    scored so far.  ``cache`` maps compositions to scores and may be passed
+    in again to resume or extend an earlier search against the same
+    opponent.
+    """
+    if budget <= 0:
+        raise ValueError("The budget must be positive.")
+    if battles < 2:
+        raise ValueError("Each lineup needs at least two battles.")
+    started = time.monotonic()
+    deadline = None if time_limit is None else started + time_limit
+    workers = workers or os.cpu_count() or 1
+    scores: Dict[Lineup, LineupScore] = cache if cache is not None else {}
+    opponent_specs = [u.spec for u in opponent.units]
+    half = battles // 2
+    chunk_seed = random.Random(seed).getrandbits(64)
+    timed_out = False
+
+    def jobs(lineup: Lineup) -> List[Tuple]:
+        mine = ("Candidate", lineup_specs(lineup))
+        theirs = (opponent.name, opponent_specs)
+        # Play both team slots; the result is credited to the candidate
+        return [((mine, theirs), half, 0), ((theirs, mine), battles - half, 1)]
+
+    def credit(lineup: Lineup, part: Dict, side: int) -> None:
+        score = scores.setdefault(lineup, LineupScore(lineup))
+        score.wins += part["wins"][side]
+        score.battles += part["battles"]
+
+    def evaluate(batch: List[Lineup]) -> None:
+        nonlocal timed_out
+        batch = [lineup for lineup in batch if lineup not in scores]
+        if pool is None:
+            for lineup in batch:
+                if deadline is not None and time.monotonic() >= deadline:
+                    timed_out = True
+                    return
+                for specs, count, side in jobs(lineup):
+                    credit(lineup, _simulate_chunk(specs, count, chunk_seed), side)
+            return
+        pending = {}
+        partial: Dict[Lineup, List[Tuple[Dict, int]]] = {}
+        queue = list(reversed(batch))
+        while queue or pending:
+            while queue and len(pending) < workers * 2:
+                lineup = queue.pop()
+                for specs, count, side in jobs(lineup):
+                    future = pool.submit(_simulate_chunk, specs, count, chunk_seed)
+                    pending[future] = (lineup, side)
+            timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                lineup, side = pending.pop(future)
+                parts = partial.setdefault(lineup, [])
+                parts.append((future.result(), side))
+                # Only publish a lineup once both slots are in
+                if len(parts) == 2:
+                    for part, part_side in parts:
+                        credit(lineup, part, part_side)
+            if deadline is not None and time.monotonic() >= deadline:
+                timed_out = True
+                for future in pending:
+                    future.cancel()
+                return
+
+    def ranking() -> List[LineupScore]:
+        budgeted = [s for s in scores.values() if s.battles and s.cost <= budget]
+        return sorted(budgeted, key=lambda s: (-s.win_rate, s.cost, s.lineup))
+
+    def search(explored: set) -> None:
+        # Expand the current leaders until none of them has unseen neighbours
+        while not timed_out:
+            leaders = [s.lineup for s in ranking()[: max(top_k, 1)]]
+            frontier: List[Lineup] = []
+            for lineup in leaders:
+                if lineup in explored:
+                    continue
+                explored.add(lineup)
+                frontier.extend(n for n in neighbours(lineup, budget, units, max_units) if n not in scores)
+            if not frontier:
+                return
+            evaluate(list(dict.fromkeys(frontier)))
+
+    # One pool for the whole search; waves of neighbours reuse its workers
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        evaluate(seed_lineups(budget, beam, units, max_units))
+        search(explored=set())
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    ranked = ranking()
+    return OptimizerResult(
+        opponent=opponent.name,
+        budget=budget,
+        top=ranked[:top_k],
+        evaluated=len(ranked),
+        elapsed=time.monotonic() - started,
+        timed_out=timed_out,
+        cache=scores,
+    )
+
+
+def format_optimizer_report(result: OptimizerResult) -> str:
+    """Render an ``OptimizerResult`` as a short Markdown summary."""
+    lines = [f"# Best {result.budget}-point lineups against {result.opponent}"]
+    note = " (time limit reached)" if result.timed_out else ""
+    lines.append(f"Lineups evaluated: {result.evaluated} in {result.elapsed:.1f}s{note}")
+    for rank, score in enumerate(result.top, 1):
+        roster = ", ".join(f"{num}x {name}" if num > 1 else name for name, num in score.lineup)
+        lines.append(
+            f"{rank}. {roster} — cost {score.cost}, "
+            f"{score.win_rate * 100:.1f}% win rate over {score.battles} battles"
+        )
+    return "\n".join(lines)
+
+
+###############################################################################
+# Command-line interface
+###############################################################################
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="battle_optimizer.py",
+        description="Search for the lineup that best counters one team of a battle configuration.",
+    )
+    parser.add_argument("config", help="battle configuration JSON file, or '-' for stdin")
+    parser.add_argument(
+        "--against", type=int, choices=(1, 2), default=1, help="which team of the configuration to counter"
+    )
+    parser.add_argument("--budget", type=int, help="points to spend (defaults to the configuration's budget)")
+    parser.add_argument("--top", type=int, default=5, help="number of lineups to report")
+    parser.add_argument("--battles", type=int, default=200, help="simulated battles per lineup")
+    parser.add_argument("--time-limit", type=float, default=60.0, help="wall-clock budget in seconds")
+    parser.add_argument("--workers", type=int, help="worker processes (defaults to all CPUs)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--beam", type=int, default=8, help="lineups seeded by branch and bound")
+    parser.add_argument("--max-units", type=int, help="largest lineup to consider")
+    parser.add_argument("--units", help="comma-separated unit names to choose from")
+    args = parser.parse_args(argv[1:])
+    try:
+        team1, team2, _battlefield, budget = load_battle_config(args.config)
+        budget = args.budget if args.budget is not None else budget
+        if budget is None:
+            raise ValueError("No budget given; pass --budget or set one in the configuration.")
+        units = [name.strip() for name in args.units.split(",")] if args.units else None
+        result = optimize_lineup(
+            team1 if args.against == 1 else team2,
+            budget,
+            top_k=args.top,
+            battles=args.battles,
+            time_limit=args.time_limit,
+            workers=args.workers,
+            seed=args.seed,
+            beam=args.beam,
+            units=units,
+            max_units=args.max_units,
+        )
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+    print(format_optimizer_report(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
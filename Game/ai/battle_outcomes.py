@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+"""
+battle_outcomes.py
+==================
+
+Columnar on-disk store for simulated battle outcomes, and queries over it.
+
+Large sweeps produce far more battles than fit in memory as Python objects
+or text.  ``OutcomeWriter`` appends one fixed-width record per battle to a
+binary file: both lineups (as 64-bit hashes), the winner, the rounds
+fought, models and health left and final morale for each side, and the
+models left of every unit type on each side.  ``OutcomeStore`` maps the
+file and reads every column as a typed ``memoryview`` straight over the
+mapping, so a multi-gigabyte store is aggregated a block at a time
+without being loaded or copied.  The standard library is enough; NumPy,
+when installed, only speeds up counting.
+
+Layout
+------
+The file starts with ``OUTCOME_MAGIC``, a little-endian ``uint32`` length
+and a JSON header naming the columns, their ``array`` type codes and the
+rows per block.  Data follows at the next 64-byte boundary as a sequence of
+equally sized blocks.  Each block is a ``uint64`` row count followed by
+every column as a ``block_rows`` long array (padded to 8 bytes, native
+byte order), so a column of a block is one contiguous slice.  A block is only written once it
+is full or the writer closes; a crash can at worst leave a torn last block,
+which readers ignore and the next writer truncates.  Unit specs of every
+lineup hash live next to the store in ``PATH.lineups`` (JSON lines), which
+is how casualties are worked out from the survivor columns.
+
+Usage
+-----
+Outcomes are recorded by ``simulate_many(..., record=writer)``, i.e.::
+
+    python battle_story_ai.py battle.json --odds 100000 --record sweep.gco
+    python battle_tournament.py --budget 200 --record sweep.gco --out matrix.csv
+
+and queried with this file (or ``battle_story_ai.py outcomes``)::
+
+    python battle_outcomes.py sweep.gco --group-by lineup
+    python battle_outcomes.py sweep.gco --group-by matchup --casualties --json
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+OUTCOME_MAGIC = b"GCOUTCM1"
+OUTCOME_VERSION = 1
+OUTCOME_BLOCK_ROWS = 4096
+OUTCOME_DATA_ALIGN = 64
+
+# Per-battle columns and their array type codes; every unit type then adds
+# a "left_<side>:<name>" column of models standing at the end.
+BATTLE_COLUMNS = (
+    ("lineup_0", "Q"),
+    ("lineup_1", "Q"),
+    ("winner", "B"),
+    ("rounds", "B"),
+    ("survivors_0", "I"),
+    ("survivors_1", "I"),
+    ("health_0", "I"),
+    ("health_1", "I"),
+    ("morale_0", "f"),
+    ("morale_1", "f"),
+)
+GROUP_BYS = ("none", "lineup", "matchup")
+
+
+def _align(size: int, to: int = 8) -> int:
+    return -(-size // to) * to
+
+
+def lineup_hash(specs: Sequence[str]) -> int:
+    """Stable 64-bit identity of a lineup, independent of unit order."""
+    canonical = json.dumps(sorted(specs), ensure_ascii=False).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(canonical, digest_size=8).digest(), "little")
+
+
+def type_column(side: int, name: str) -> str:
+    return f"left_{side}:{name}"
+
+
+def outcome_columns(unit_types: Sequence[str]) -> List[Tuple[str, str]]:
+    return list(BATTLE_COLUMNS) + [
+        (type_column(side, name), "I") for side in (0, 1) for name in unit_types
+    ]
+
+
+###############################################################################
+# Recording
+###############################################################################
+
+class OutcomeColumns:
+    """Outcomes of one batch of battles between two fixed lineups, as columns.
+
+    This is what a simulation worker fills in and hands back to the process
+    writing the store: plain arrays pickle compactly and ``OutcomeWriter.extend``
+    appends them without touching individual rows.
+    """
+
+    def __init__(self, team_specs: Sequence[Tuple[str, Sequence[str]]], unit_types: Sequence[str]) -> None:
+        self.columns: Dict[str, array] = {name: array(code) for name, code in outcome_columns(unit_types)}
+        self.lineups = tuple(lineup_hash(specs) for _, specs in team_specs)
+        columns = self.columns
+        # Bound appends per side, resolved once rather than per battle
+        self._sides = [
+            (
+                columns[f"lineup_{side}"].append,
+                columns[f"survivors_{side}"].append,
+                columns[f"health_{side}"].append,
+                columns[f"morale_{side}"].append,
+                [(name, columns[type_column(side, name)].append) for name in unit_types],
+            )
+            for side in (0, 1)
+        ]
+
+    def add(self, teams, winner: int, rounds: int) -> None:
+        """Record the final state of ``teams`` after one battle."""
+        self.columns["winner"].append(winner)
+        self.columns["rounds"].append(rounds)
+        for side, team in enumerate(teams):
+            lineup, survivors, health, morale, types = self._sides[side]
+            lineup(self.lineups[side])
+            survivors(team.alive_count)
+            morale(team.morale)
+            left: Dict[str, int] = {}
+            total = 0
+            for unit in team.alive_units:
+                total += unit.current_health
+                name = unit.template.name
+                left[name] = left.get(name, 0) + unit.size
+            health(total)
+            for name, append in types:
+                append(left.get(name, 0))
+
+
+class OutcomeWriter:
+    """Append battle outcomes to a columnar store, creating it if needed.
+
+    A new store gets one survivor column per side for each of
+    ``unit_types``; an existing one keeps the columns it was created with,
+    and recording a lineup with a unit type it has no column for is an
+    error.  Use it as a context manager so the last partial block is
+    written out.
+    """
+
+    def __init__(
+        self, path: str, unit_types: Optional[Sequence[str]] = None, block_rows: int = OUTCOME_BLOCK_ROWS
+    ) -> None:
+        self.path = path
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            with OutcomeStore(path) as store:
+                self.unit_types = list(store.unit_types)
+                self.block_rows = store.block_rows
+                end = store.data_offset + store.blocks * store.block_size
+            self._file = open(path, "r+b")
+            self._file.truncate(end)  # drop a block torn by an interrupted run
+            self._file.seek(end)
+        else:
+            if unit_types is None:
+                raise ValueError("A new outcome store needs its unit types.")
+            if block_rows <= 0:
+                raise ValueError("Blocks must hold at least one row.")
+            self.unit_types = list(unit_types)
+            self.block_rows = block_rows
+            header = json.dumps(
+                {
+                    "version": OUTCOME_VERSION,
+                    "block_rows": block_rows,
+                    "unit_types": self.unit_types,
+                    "columns": outcome_columns(self.unit_types),
+                }
+            ).encode("utf-8")
+            prefix = OUTCOME_MAGIC + struct.pack("<I", len(header)) + header
+            self._file = open(path, "wb")
+            self._file.write(prefix + bytes(_align(len(prefix), OUTCOME_DATA_ALIGN) - len(prefix)))
+        self.columns = outcome_columns(self.unit_types)
+        self._pending: Dict[str, array] = {name: array(code) for name, code in self.columns}
+        self._lineups_path = path + ".lineups"
+        self._known_lineups = set(read_lineups(self._lineups_path))
+
+    def __enter__(self) -> "OutcomeWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def register(self, team_specs: Sequence[Tuple[str, Sequence[str]]]) -> None:
+        """Check the lineups fit the store's columns and note their unit specs."""
+        from battle_story_ai import parse_unit_spec
+
+        for _, specs in team_specs:
+            for spec in specs:
+                name = parse_unit_spec(spec)[1]
+                if name not in self.unit_types:
+                    raise ValueError(f"The outcome store {self.path} has no column for '{name}'.")
+            key = lineup_hash(specs)
+            if key not in self._known_lineups:
+                self._known_lineups.add(key)
+                with open(self._lineups_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"hash": f"{key:016x}", "units": list(specs)}, ensure_ascii=False) + "\n")
+
+    def extend(self, columns: Dict[str, array]) -> None:
+        """Append the rows of an ``OutcomeColumns.columns`` batch."""
+        for name, _ in self.columns:
+            self._pending[name].extend(columns[name])
+        while len(self._pending["winner"]) >= self.block_rows:
+            self._write_block(self.block_rows)
+
+    def _write_block(self, rows: int) -> None:
+        parts = [struct.pack("<Q", rows)]
+        for name, _ in self.columns:
+            pending = self._pending[name]
+            parts.append(pending[:rows].tobytes())
+            used = rows * pending.itemsize
+            parts.append(bytes(_align(self.block_rows * pending.itemsize) - used))
+            del pending[:rows]
+        self._file.write(b"".join(parts))
+
+    def flush(self) -> None:
+        """Write any buffered rows out as a (possibly partial) block."""
+        if self._pending["winner"]:
+            self._write_block(len(self._pending["winner"]))
+        self._file.flush()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+
+def read_lineups(path: str) -> Dict[int, List[str]]:
+    """Unit specs of every lineup hash recorded next to a store."""
+    lineups: Dict[int, List[str]] = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    lineups[int(record["hash"], 16)] = record["units"]
+    return lineups
+
+
+###############################################################################
+# Reading
+###############################################################################
+
+def _is_constant(view: memoryview) -> bool:
+    """Whether every element of a typed view is the same, compared bytewise."""
+    raw = view.cast("B")
+    try:
+        return raw == bytes(raw[: view.itemsize]) * len(view)
+    finally:
+        raw.release()
+
+
+def _count_values(view: memoryview) -> Iterable[Tuple[float, int]]:
+    """(value, count) pairs of a typed view, with NumPy when it is installed."""
+    if np is None:
+        return Counter(view).items()
+    data = np.frombuffer(view, dtype=view.format)
+    values, counts = np.unique(data, return_counts=True)
+    del data  # the view can only be released once nothing borrows it
+    return zip(values.tolist(), counts.tolist())
+
+
+class OutcomeStore:
+    """Read-only, memory-mapped view of an outcome store.
+
+    ``iter_blocks`` yields each block's columns as ``memoryview`` objects
+    cast to their type, backed directly by the mapping; the aggregate
+    queries below are built on it and only hold per-group tallies.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            prefix = f.read(len(OUTCOME_MAGIC) + 4)
+            if len(prefix) < len(OUTCOME_MAGIC) + 4 or prefix[: len(OUTCOME_MAGIC)] != OUTCOME_MAGIC:
+                raise ValueError(f"{path} is not a Galaxy Clash outcome store.")
+            (length,) = struct.unpack("<I", prefix[len(OUTCOME_MAGIC) :])
+            header = json.loads(f.read(length).decode("utf-8"))
+            if header.get("version") != OUTCOME_VERSION:
+                raise ValueError(f"Unsupported outcome store version {header.get('version')}.")
+            size = os.fstat(f.fileno()).st_size
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.block_rows: int = header["block_rows"]
+        self.unit_types: List[str] = header["unit_types"]
+        self.columns: List[Tuple[str, str]] = [tuple(column) for column in header["columns"]]
+        self.data_offset = _align(len(OUTCOME_MAGIC) + 4 + length, OUTCOME_DATA_ALIGN)
+        self._offsets: Dict[str, Tuple[int, str]] = {}
+        offset = 8
+        for name, code in self.columns:
+            self._offsets[name] = (offset, code)
+            offset += _align(self.block_rows * array(code).itemsize)
+        self.block_size = offset
+        self.blocks = max(0, size - self.data_offset) // self.block_size
+        self.lineups = read_lineups(path + ".lineups")
+
+    def __enter__(self) -> "OutcomeStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def block_length(self, block: int) -> int:
+        start = self.data_offset + block * self.block_size
+        return struct.unpack_from("<Q", self._mmap, start)[0]
+
+    def __len__(self) -> int:
+        return sum(self.block_length(block) for block in range(self.blocks))
+
+    @contextmanager
+    def _views(self, block: int, names: Sequence[str]) -> Iterator[List[memoryview]]:
+        start = self.data_offset + block * self.block_size
+        rows = self.block_length(block)
+        whole = memoryview(self._mmap)
+        views = []
+        try:
+            for name in names:
+                offset, code = self._offsets[name]
+                raw = whole[start + offset : start + offset + rows * array(code).itemsize]
+                views.append(raw)
+                views.append(raw.cast(code))
+            yield views[1::2]
+        finally:
+            # Views must be released before the mapping can be closed
+            for view in reversed(views):
+                view.release()
+            whole.release()
+
+    def iter_blocks(self, names: Sequence[str]) -> Iterator[List[memoryview]]:
+        """Yield the named columns of every block as zero-copy typed views.
+
+        The views are only valid until the next block is requested.
+        """
+        for name in names:
+            if name not in self._offsets:
+                raise KeyError(f"No column '{name}' in {self.path}.")
+        for block in range(self.blocks):
+            with self._views(block, names) as views:
+                yield views
+
+    def histogram(self, keys: Sequence[str], value: Optional[str] = None) -> Counter:
+        """Count rows by the tuple of ``keys`` columns (plus ``value``)."""
+        tally: Counter = Counter()
+        names = list(keys) + ([value] if value else [])
+        for views in self.iter_blocks(names):
+            if not len(views[0]):
+                continue
+            key_views = views[: len(keys)]
+            if value and all(_is_constant(view) for view in key_views):
+                # Recorded runs fill whole blocks with one matchup, so the
+                # values can be counted alone without building row tuples.
+                constant = tuple(view[0] for view in key_views)
+                for found, count in _count_values(views[-1]):
+                    tally[constant + (found,)] += count
+            else:
+                tally.update(zip(*views))
+        return tally
+
+
+###############################################################################
+# Queries
+###############################################################################
+
+def _group_keys(group_by: str, side: int, lineups: Tuple[int, int]):
+    if group_by == "lineup":
+        return lineups[side]
+    if group_by == "matchup":
+        return lineups if side == 0 else None
+    return "all" if side == 0 else None
+
+
+def _summary(histogram: Counter) -> Dict[str, float]:
+    """Mean, quartiles and maximum of a value -> count histogram."""
+    total = sum(histogram.values())
+    ordered = sorted(histogram.items())
+    quantiles = {}
+    seen = 0
+    wanted = [("p25", 0.25), ("p50", 0.5), ("p75", 0.75)]
+    for value, count in ordered:
+        seen += count
+        while wanted and seen >= wanted[0][1] * total:
+            quantiles[wanted.pop(0)[0]] = value
+    mean = sum(value * count for value, count in ordered) / total
+    return {"mean": round(mean, 3), **quantiles, "max": ordered[-1][0]}
+
+
+def query_outcomes(store: OutcomeStore, group_by: str = "lineup", casualties: bool = False) -> List[Dict]:
+    """Aggregate a store into one summary per group.
+
+    ``group_by`` is ``"lineup"`` (each lineup over both sides it played),
+    ``"matchup"`` (each ordered pair of lineups) or ``"none"``.  Every group
+    reports battles, wins and win rate from its own point of view (side one
+    for matchups and ``"none"``), the mean rounds, and the mean models,
+    health and morale it had left.  ``casualties=True`` adds, per unit
+    type, the mean, quartiles and maximum of models lost in a battle.
+    """
+    if group_by not in GROUP_BYS:
+        raise ValueError(f"Unknown grouping '{group_by}'.")
+    groups: Dict = {}
+
+    def group(key) -> Dict:
+        if key not in groups:
+            groups[key] = {"battles": 0, "wins": 0, "rounds": 0, "left": [0, 0.0, 0.0], "lost": {}}
+        return groups[key]
+
+    records = store.histogram(["lineup_0", "lineup_1", "winner", "rounds"])
+    for (first, second, winner, rounds), count in records.items():
+        for side in (0, 1):
+            key = _group_keys(group_by, side, (first, second))
+            if key is None:
+                continue
+            entry = group(key)
+            entry["battles"] += count
+            entry["wins"] += count if winner == side else 0
+            entry["rounds"] += rounds * count
+
+    def sides():
+        return (0, 1) if group_by == "lineup" else (0,)
+
+    for side in sides():
+        for index, column in enumerate(("survivors", "health", "morale")):
+            tally = store.histogram(["lineup_0", "lineup_1"], f"{column}_{side}")
+            for (first, second, value), count in tally.items():
+                entry = group(_group_keys(group_by, side, (first, second)))
+                entry["left"][index] += value * count
+
+    if casualties:
+        fielded_cache: Dict[int, Counter] = {}
+
+        def fielded(key: int) -> Counter:
+            if key not in fielded_cache:
+                from battle_story_ai import parse_unit_spec
+
+                counts: Counter = Counter()
+                for spec in store.lineups.get(key, ()):
+                    num, name = parse_unit_spec(spec)
+                    counts[name] += num
+                fielded_cache[key] = counts
+            return fielded_cache[key]
+
+        # Only columns some recorded lineup fields can hold losses
+        fielded_types = set()
+        for key in store.lineups:
+            fielded_types.update(fielded(key))
+        for side in sides():
+            for name in fielded_types.intersection(store.unit_types):
+                tally = store.histogram(["lineup_0", "lineup_1"], type_column(side, name))
+                for (first, second, left), count in tally.items():
+                    own = (first, second)[side]
+                    if name not in fielded(own):
+                        continue
+                    entry = group(_group_keys(group_by, side, (first, second)))
+                    lost = entry["lost"].setdefault(name, Counter())
+                    lost[fielded(own)[name] - left] += count
+
+    def label(key) -> Dict:
+        if group_by == "lineup":
+            return {"lineup": f"{key:016x}", "units": store.lineups.get(key)}
+        if group_by == "matchup":
+            return {
+                "lineups": [f"{part:016x}" for part in key],
+                "units": [store.lineups.get(part) for part in key],
+            }
+        return {}
+
+    summaries = []
+    for key, entry in groups.items():
+        battles = entry["battles"]
+        summary = {
+            **label(key),
+            "battles": battles,
+            "wins": entry["wins"],
+            "win_rate": round(entry["wins"] / battles, 4),
+            "mean_rounds": round(entry["rounds"] / battles, 3),
+            "mean_survivors": round(entry["left"][0] / battles, 3),
+            "mean_health": round(entry["left"][1] / battles, 3),
+            "mean_morale": round(entry["left"][2] / battles, 3),
+        }
+        if casualties:
+            summary["casualties"] = {name: _summary(lost) for name, lost in sorted(entry["lost"].items())}
+        summaries.append(summary)
+    summaries.sort(key=lambda summary: (-summary["win_rate"], -summary["battles"]))
+    return summaries
+
+
+def _units_label(units: Optional[List[str]]) -> str:
+    return ", ".join(units) if units else "?"
+
+
+def format_outcome_query(summaries: List[Dict], group_by: str) -> str:
+    """Plain-text table of ``query_outcomes`` results."""
+    lines = []
+    for summary in summaries:
+        if group_by == "lineup":
+            name = f"{summary['lineup']}  {_units_label(summary['units'])}"
+        elif group_by == "matchup":
+            name = " vs ".join(_units_label(units) for units in summary["units"])
+        else:
+            name = "all battles"
+        lines.append(
+            f"{summary['win_rate'] * 100:6.1f}%  {summary['battles']:>10}  {name}\n"
+            f"{'':>20}rounds {summary['mean_rounds']:.2f}, left: {summary['mean_survivors']:.2f} models, "
+            f"{summary['mean_health']:.1f} health, morale {summary['mean_morale']:.2f}"
+        )
+        for unit, stats in summary.get("casualties", {}).items():
+            lines.append(
+                f"{'':>20}{unit} lost: mean {stats['mean']:.2f}, median {stats['p50']}, "
+                f"quartiles {stats['p25']}-{stats['p75']}, max {stats['max']}"
+            )
+    header = f"{'win':>7}  {'battles':>10}  {group_by if group_by != 'none' else ''}"
+    return "\n".join([header.rstrip()] + lines)
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="battle_outcomes.py",
+        description="Aggregate a recorded outcome store without loading it into memory.",
+    )
+    parser.add_argument("store", help="outcome store written with --record")
+    parser.add_argument("--group-by", choices=GROUP_BYS, default="lineup")
+    parser.add_argument("--casualties", action="store_true", help="add per-unit-type loss distributions")
+    parser.add_argument("--json", action="store_true", help="print the summaries as JSON")
+    args = parser.parse_args(argv[1:])
+    try:
+        with OutcomeStore(args.store) as store:
+            summaries = query_outcomes(store, args.group_by, args.casualties)
+            rows = sum(summary["battles"] for summary in summaries)
+            if args.group_by == "lineup":
+                rows //= 2
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+    if args.json:
+        print(json.dumps(summaries, indent=2, ensure_ascii=False))
+    else:
+        print(f"{rows} battles in {args.store}")
+        print(format_outcome_query(summaries, args.group_by))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -15,9 +15,11 @@ narrative.  The narrative follows a structured template:
 1. A title line naming the battle.
 2. A descriptive introduction establishing the setting and atmosphere.
 3. A listing of each team, including their units and total cost.
-4. A pre‑battle analysis discussing strengths, weaknesses and possible
-   strategies for each side.
-5. Three sequential combat rounds.  Each round starts with positioning
+4. A pre-battle analysis discussing strengths, weaknesses and possible
+   strategies for each side, closed by each side's estimated odds
+   (unless positioning or a fight to completion changes the rules).
+5. Three sequential combat rounds (or, fought to completion, as many as it
+   takes for one side to fall).  Each round starts with positioning
    manoeuvres, applies synergies and special abilities, resolves attacks
    and morale shifts, then summarises the action in a series of bullet
    points along with casualties.
@@ -60,36 +62,83 @@ Where ``battle.json`` might look like::
         }
     }
 
-If no battlefield is provided the script will randomly choose one from
-predefined settings.  You can of course modify or extend the unit
-database at the bottom of this file to include new characters, stats
-and abilities.
+A unit entry may also be a formation such as ``"200x Stormtrooper"`` (see
+``Squad``).  If no battlefield is provided the script will randomly choose
+one from predefined settings; ``"positioning": true`` and
+``"fight_to_completion": true`` change the rules (see ``BattleGrid`` and
+``iter_battle_rounds``).  You can of course modify or extend the unit
+database in this file, or load more units with ``--roster``, and add
+abilities with ``register_ability``.
 
-This implementation is intentionally self‑contained.  It uses only the
-Python standard library so that it can run in restricted environments
-without extra dependencies.  Feel free to adapt and expand it to suit
-your gaming system or narrative preferences.
+``--help`` lists the other modes: ``--odds`` for win probabilities
+(``simulate_many``), ``--serve``, ``--http`` and ``--batch`` for serving
+reports (``worker_responses``, ``CinematicServer``, ``run_batch``) and
+``--log``/``--replay`` for event logs (``BattleLog``).  Larger tools live
+in their own modules next to this one:
+
+* ``battle_vectorized.py`` -- the optional NumPy engine (``--engine numpy``);
+* ``battle_exact.py``      -- exact odds for small battles (``--engine exact``);
+* ``battle_outcomes.py``   -- columnar outcome stores (``--record``, ``outcomes``);
+* ``battle_optimizer.py``  -- the best lineup against a roster and budget;
+* ``battle_tournament.py`` -- round robins between lineups (``tournament``);
+* ``battle_balance.py``    -- unit cost efficiency (``balance``);
+* ``benchmarks/`` and ``tests/`` -- performance and regression checks.
+
+The storyteller itself needs nothing beyond the Python standard library,
+so it runs in restricted environments; NumPy is only needed for the
+vectorized engine.  Feel free to adapt and expand it to suit your gaming
+system or narrative preferences.
 
 """
 
 from __future__ import annotations
 
+import argparse
+import asyncio
+import hashlib
+import heapq
+import html
 import json
+import marshal
 import math
 import os
 import random
+import re
+import statistics
 import sys
+import time
+import tracemalloc
+import zlib
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import Mapping
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager, nullcontext
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+if __name__ == "__main__":
+    # Sibling modules (e.g. battle_vectorized) import this file by name; make
+    # them share the running script instead of loading a second copy.
+    sys.modules.setdefault("battle_story_ai", sys.modules[__name__])
 
 
 ###############################################################################
 # Data structures
 ###############################################################################
 
+# Speed of a unit type that does not set one
+DEFAULT_SPEED = 10
+
+
 @dataclass
 class UnitType:
-    """Represents a type of unit with stats, cost and special rules."""
+    """Represents a type of unit with stats, cost and special rules.
+
+    ``speed`` sets how early in a round the unit tends to act (see
+    ``compute_round_events``); ``DEFAULT_SPEED`` is an ordinary trooper.
+    """
 
     name: str
     tier: int
@@ -101,9 +150,10 @@ class UnitType:
     abilities: List[str] = field(default_factory=list)
     synergies: Dict[str, Dict[str, float]] = field(default_factory=dict)
     leader_ability: Optional[str] = None
+    speed: float = DEFAULT_SPEED
 
 
-@dataclass
+@dataclass(eq=False)
 class Unit:
     """Represents a specific instance of a unit on the battlefield."""
 
@@ -111,10 +161,29 @@ class Unit:
     current_health: int = field(init=False)
     is_alive: bool = field(default=True)
     status_effects: List[str] = field(default_factory=list)
+    # Back-reference set by the owning Team, plus this unit's position in
+    # the team's alive or killed index (whichever it currently sits in).
+    team: Optional["Team"] = field(default=None, init=False, repr=False)
+    _index_pos: int = field(default=-1, init=False, repr=False)
 
     def __post_init__(self) -> None:
         self.current_health = self.template.health
 
+    @property
+    def count(self) -> int:
+        """Number of models fielded (always one for a single unit)."""
+        return 1
+
+    @property
+    def size(self) -> int:
+        """Number of models still standing."""
+        return 1 if self.is_alive else 0
+
+    @property
+    def spec(self) -> str:
+        """Roster entry that recreates this unit via ``create_units_from_names``."""
+        return self.template.name
+
     def take_damage(self, amount: int) -> bool:
         """Apply damage to the unit.  Returns True if the unit dies."""
         if not self.is_alive:
@@ -122,6 +191,8 @@ class Unit:
         self.current_health -= amount
         if self.current_health <= 0:
             self.is_alive = False
+            if self.team is not None:
+                self.team._model_lost(self)
             return True
         return False
 
@@ -129,36 +200,357 @@ class Unit:
         self.current_health = self.template.health
         self.is_alive = True
 
+    def revive_model(self, health: int) -> None:
+        self.is_alive = True
+        self.current_health = health
+
+    def _state(self) -> Tuple[int, int, int]:
+        return self.current_health, 1 if self.is_alive else 0, 1 if self.is_alive else 0
+
+    def _set_state(self, health: int, size: int, alive: int) -> None:
+        self.current_health = health
+        self.is_alive = bool(alive)
+
+
+@dataclass(eq=False)
+class Squad:
+    """A stack of identical models that fights as one roster entry.
+
+    Formations such as "200 Imperial Army Troopers" would otherwise need
+    hundreds of ``Unit`` objects.  A squad only stores how many models were
+    fielded, how many still stand and the damage sitting on its front model
+    (``wounds``).  Damage always lands on that front model, so a hit either
+    wounds it or kills exactly one model, as it would against a single unit.
+    Because of that pooling, incoming fire is focused rather than spread
+    over the formation, so a squad loses models faster than the same number
+    of individual units would.  The whole squad attacks as one volley; see
+    ``resolve_volley``.
+    """
+
+    template: UnitType
+    count: int
+    size: int = field(init=False)
+    wounds: int = field(default=0, init=False)
+    is_alive: bool = field(default=True, init=False)
+    team: Optional["Team"] = field(default=None, init=False, repr=False)
+    _index_pos: int = field(default=-1, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.count < 1:
+            raise ValueError("A squad needs at least one model.")
+        self.size = self.count
+
+    @property
+    def current_health(self) -> int:
+        """Total health left across every standing model."""
+        return self.size * self.template.health - self.wounds
+
+    @property
+    def spec(self) -> str:
+        return f"{self.count}x {self.template.name}"
+
+    def take_damage(self, amount: int) -> bool:
+        """Apply one hit to the front model.  Returns True if a model dies."""
+        if not self.is_alive:
+            return False
+        self.wounds += amount
+        if self.wounds < self.template.health:
+            return False
+        # Like a single unit, one hit kills at most one model
+        self.wounds = 0
+        self.size -= 1
+        if not self.size:
+            self.is_alive = False
+        if self.team is not None:
+            self.team._model_lost(self)
+        return True
+
+    def heal_full(self) -> None:
+        self.size = self.count
+        self.wounds = 0
+        self.is_alive = True
+
+    def revive_model(self, health: int) -> None:
+        """Return one fallen model to the stack with the given health."""
+        if not self.is_alive:
+            self.wounds = self.template.health - health
+        else:
+            # The revived model becomes the front model if it is the weaker one
+            self.wounds = max(self.wounds, self.template.health - health)
+        self.size += 1
+        self.is_alive = True
+
+    def _state(self) -> Tuple[int, int, int]:
+        return self.wounds, self.size, 1 if self.is_alive else 0
+
+    def _set_state(self, wounds: int, size: int, alive: int) -> None:
+        self.wounds = wounds
+        self.size = size
+        self.is_alive = bool(alive)
+
 
 @dataclass
 class Team:
-    """Represents a team of units participating in the battle."""
+    """Represents a team of units participating in the battle.
+
+    Living and fallen units are tracked in two swap-remove arrays, so counting,
+    picking a random living unit, killing and reviving are all O(1) no matter
+    how large the roster is.  ``killed_units`` is part of that index: update
+    it through ``Unit.take_damage`` and ``revive`` rather than directly.
+
+    A live count of units per type answers ``has_unit`` without scanning the
+    roster, and the synergy modifiers each unit type gets from its allies
+    are compiled on first use and only recompiled when a type is wiped out
+    or comes back.
+
+    ``units`` may mix single units and ``Squad`` stacks.  Counts such as
+    ``alive_count`` are in models, and random picks are weighted by models
+    so a 200-strong squad draws fire like 200 individual troopers would.
+    """
 
     name: str
     units: List[Unit]
     morale: float = 1.0  # baseline morale (1.0 = neutral)
     killed_units: List[Unit] = field(default_factory=list)
+    _alive: List[Unit] = field(default_factory=list, init=False, repr=False)
+    _alive_models: int = field(default=0, init=False, repr=False)
+    _squads: List[Squad] = field(default_factory=list, init=False, repr=False)
+    _alive_by_type: Dict[str, int] = field(default_factory=dict, init=False, repr=False)
+    _synergy_cache: Dict[str, Tuple[Tuple[str, float], ...]] = field(
+        default_factory=dict, init=False, repr=False
+    )
+    _abilities: Optional["AbilityHooks"] = field(default=None, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        for u in self.units:
+            u.team = self
+        self._squads = [u for u in self.units if isinstance(u, Squad)]
+        self._rebuild_index()
+
+    def _rebuild_index(self) -> None:
+        self._alive = [u for u in self.units if u.is_alive]
+        for pos, u in enumerate(self._alive):
+            u._index_pos = pos
+        for pos, u in enumerate(self.killed_units):
+            u._index_pos = pos
+        self._alive_models = sum(u.size for u in self._alive)
+        self._alive_by_type = {}
+        for u in self._alive:
+            self._alive_by_type[u.template.name] = self._alive_by_type.get(u.template.name, 0) + 1
+        self._synergy_cache.clear()
+
+    @staticmethod
+    def _swap_remove(items: List[Unit], unit: Unit) -> None:
+        last = items.pop()
+        if last is not unit:
+            items[unit._index_pos] = last
+            last._index_pos = unit._index_pos
+
+    def _model_lost(self, unit: Unit) -> None:
+        """Book one model death; move the entry to the killed list once empty."""
+        self._alive_models -= 1
+        if unit.is_alive:
+            return
+        self._swap_remove(self._alive, unit)
+        unit._index_pos = len(self.killed_units)
+        self.killed_units.append(unit)
+        name = unit.template.name
+        self._alive_by_type[name] -= 1
+        if not self._alive_by_type[name]:
+            # A unit type just disappeared; synergies depending on it lapse
+            self._synergy_cache.clear()
 
     @property
     def alive_units(self) -> List[Unit]:
-        return [u for u in self.units if u.is_alive]
+        """Snapshot of the living roster entries (in no particular order)."""
+        return list(self._alive)
+
+    @property
+    def alive_count(self) -> int:
+        """Number of living models."""
+        return self._alive_models
 
     @property
     def total_cost(self) -> int:
-        return sum(u.template.cost for u in self.units)
+        return sum(u.template.cost * u.count for u in self.units)
+
+    def random_alive(self, rng=random) -> Unit:
+        """Pick a living model uniformly at random and return its entry."""
+        if not self._squads:
+            return rng.choice(self._alive)
+        pick = rng.randrange(self._alive_models)
+        for unit in self._alive:
+            pick -= unit.size
+            if pick < 0:
+                return unit
+        return self._alive[-1]
+
+    def random_fallen(self, rng=random, exclude: Optional[Unit] = None) -> Optional[Unit]:
+        """Pick a fallen model uniformly at random, or None if nobody fell.
+
+        Models of ``exclude`` (e.g. a caster that just fell) are never picked.
+        """
+        if not self._squads:
+            killed = self.killed_units
+            if exclude is None or exclude.team is not self or exclude.is_alive:
+                return rng.choice(killed) if killed else None
+            if len(killed) < 2:
+                return None
+            # Draw among all but the last slot, letting the last stand in for ``exclude``
+            pick = killed[rng.randrange(len(killed) - 1)]
+            return killed[-1] if pick is exclude else pick
+        candidates = [(u, u.count) for u in self.killed_units if u is not exclude]
+        candidates += [
+            (s, s.count - s.size) for s in self._squads if s.is_alive and s.size < s.count and s is not exclude
+        ]
+        total = sum(weight for _, weight in candidates)
+        if not total:
+            return None
+        pick = rng.randrange(total)
+        for unit, weight in candidates:
+            pick -= weight
+            if pick < 0:
+                return unit
+        return candidates[-1][0]
+
+    def revive(self, unit: Unit, health: int) -> None:
+        """Bring one fallen model of ``unit`` back with the given health."""
+        was_alive = unit.is_alive
+        unit.revive_model(health)
+        self._alive_models += 1
+        if was_alive:
+            return
+        self._swap_remove(self.killed_units, unit)
+        unit._index_pos = len(self._alive)
+        self._alive.append(unit)
+        name = unit.template.name
+        self._alive_by_type[name] = self._alive_by_type.get(name, 0) + 1
+        if self._alive_by_type[name] == 1:
+            self._synergy_cache.clear()
 
     def has_unit(self, unit_name: str) -> bool:
-        return any(u.template.name == unit_name and u.is_alive for u in self.units)
+        return self._alive_by_type.get(unit_name, 0) > 0
+
+    @property
+    def abilities(self) -> "AbilityHooks":
+        """The roster's abilities compiled into per-trigger dispatch tables."""
+        if self._abilities is None:
+            self._abilities = compile_abilities(self.units)
+        return self._abilities
+
+    def active_synergies(self, template: UnitType) -> Tuple[Tuple[str, float], ...]:
+        """Synergy modifiers a unit of ``template`` currently gets from this team."""
+        compiled = self._synergy_cache.get(template.name)
+        if compiled is None:
+            compiled = tuple(
+                (key, multiplier)
+                for required, modifiers in template.synergies.items()
+                if self._alive_by_type.get(required, 0) > 0
+                for key, multiplier in modifiers.items()
+            )
+            self._synergy_cache[template.name] = compiled
+        return compiled
 
     def reset(self) -> None:
         for u in self.units:
             u.heal_full()
         self.killed_units.clear()
+        self._rebuild_index()
         self.morale = 1.0
 
-    def apply_morale_change(self, delta: float) -> None:
-        """Modify morale but keep within reasonable bounds [0.1, 2.0]."""
+    def snapshot_state(self) -> Tuple[array, array, array, float]:
+        """Compact copy of the battle state: see ``BattleSnapshot``."""
+        entries = array("i")
+        for u in self.units:
+            entries.extend(u._state())
+        slots = {id(u): slot for slot, u in enumerate(self.units)}
+        alive = array("i", [slots[id(u)] for u in self._alive])
+        killed = array("i", [slots[id(u)] for u in self.killed_units])
+        return entries, alive, killed, self.morale
+
+    def restore_state(self, state: Tuple[array, array, array, float]) -> None:
+        """Put the roster back into a state taken by ``snapshot_state``.
+
+        The alive and killed indexes are restored in their recorded order,
+        since random picks depend on it.
+        """
+        entries, alive, killed, morale = state
+        units = self.units
+        for slot, u in enumerate(units):
+            u._set_state(entries[3 * slot], entries[3 * slot + 1], entries[3 * slot + 2])
+        self._alive = [units[slot] for slot in alive]
+        self.killed_units[:] = [units[slot] for slot in killed]
+        for pos, u in enumerate(self._alive):
+            u._index_pos = pos
+        for pos, u in enumerate(self.killed_units):
+            u._index_pos = pos
+        self._alive_models = sum(u.size for u in self._alive)
+        self._alive_by_type = {}
+        for u in self._alive:
+            self._alive_by_type[u.template.name] = self._alive_by_type.get(u.template.name, 0) + 1
+        self._synergy_cache.clear()
+        self.morale = morale
+
+    def apply_morale_change(self, delta: float) -> float:
+        """Modify morale but keep within reasonable bounds [0.1, 2.0].
+
+        Returns the change actually applied after clamping.
+        """
+        before = self.morale
         self.morale = max(0.1, min(2.0, self.morale + delta))
+        return self.morale - before
+
+
+# Field order of the plain tuples a UnitType is stored as in roster caches
+UNIT_RECORD_FIELDS = (
+    "name", "tier", "cost", "health", "damage", "description",
+    "role", "abilities", "synergies", "leader_ability", "speed",
+)
+
+
+class UnitDatabase(Mapping):
+    """Name → ``UnitType`` mapping that materialises entries on first use.
+
+    Units loaded from a roster file are kept as plain field tuples (see
+    ``UNIT_RECORD_FIELDS``) and only turned into ``UnitType`` objects when a
+    battle looks them up, so a roster with thousands of units costs little
+    more than a dictionary of tuples until it is used.  ``version`` goes
+    up whenever units are added or replaced, so results derived from the
+    units can be cached against it.
+    """
+
+    def __init__(self, units: Optional[Dict[str, UnitType]] = None) -> None:
+        # Values are UnitType objects, or field tuples not yet materialised
+        self._entries: Dict[str, object] = dict(units or {})
+        self.version = 0
+
+    def __getitem__(self, name: str) -> UnitType:
+        entry = self._entries[name]
+        if isinstance(entry, tuple):
+            entry = UnitType(**dict(zip(UNIT_RECORD_FIELDS, entry)))
+            entry.abilities = list(entry.abilities)
+            self._entries[name] = entry
+        return entry
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add_records(self, records: Dict[str, tuple], replace: bool = True) -> int:
+        """Add unmaterialised units; returns how many names were added or replaced."""
+        added = 0
+        for name, record in records.items():
+            if replace or name not in self._entries:
+                self._entries[name] = record
+                added += 1
+        if added:
+            self.version += 1
+        return added
 
 
 ###############################################################################
@@ -168,8 +560,9 @@ class Team:
 # The following dictionary defines a handful of units inspired by the Star
 # Wars universe.  Each entry includes base stats, cost tiers and (when
 # relevant) simple descriptions of abilities or synergies.  You can modify
-# or extend this dictionary to include your own characters.
-UNIT_DATABASE: Dict[str, UnitType] = {
+# or extend this dictionary to include your own characters, or load a roster
+# file on top of it (see "Unit roster files" below).
+BUILTIN_UNITS: Dict[str, UnitType] = {
     "Darth Vader": UnitType(
         name="Darth Vader",
         tier=1,
@@ -181,6 +574,7 @@ UNIT_DATABASE: Dict[str, UnitType] = {
         abilities=["dark_presence", "force_strike"],
         synergies={"Stormtrooper": {"enemy_accuracy_multiplier": 0.8}},
         leader_ability="fear_aura",
+        speed=12,
     ),
     "Emperor Palpatine": UnitType(
         name="Emperor Palpatine",
@@ -259,6 +653,7 @@ UNIT_DATABASE: Dict[str, UnitType] = {
         role="Leader",
         abilities=["force_push"],
         leader_ability="protective_aura",
+        speed=13,
     ),
     "Wookiee Warrior": UnitType(
         name="Wookiee Warrior",
@@ -270,9 +665,216 @@ UNIT_DATABASE: Dict[str, UnitType] = {
         role="Trooper",
         abilities=["furious_charge"],
         synergies={},
+        speed=8,
     ),
 }
 
+UNIT_DATABASE = UnitDatabase(BUILTIN_UNITS)
+
+LEADER_ABILITIES = (
+    "fear_aura",
+    "morale_break",
+    "tactical_boost",
+    "revive",
+    "inspires_rebels",
+    "protective_aura",
+)
+SYNERGY_MODIFIERS = ("enemy_accuracy_multiplier", "morale_bonus")
+
+
+###############################################################################
+# Unit roster files
+###############################################################################
+
+# Extra rosters to load at import time, separated by os.pathsep.  Using the
+# environment means process-pool and ``--serve`` workers see them as well.
+ROSTER_ENV = "GALAXY_CLASH_UNITS"
+ROSTER_CACHE_VERSION = 2
+
+# Text rosters such as "Unit Costs.txt" only give a dollar tier per unit.
+# Stats are derived from it: a $5 unit costs 100 points, has 100 health
+# and deals 25 damage; $4 and up lead their side.
+POINTS_PER_DOLLAR = 20
+ROSTER_TIER_HEADER = re.compile(r"^\$(\d+(?:\.\d+)?)\s+(?:Tier|Characters)\s*:?\s*$", re.IGNORECASE)
+ROSTER_ENTRY = re.compile(r"^(?:-\s*)?(.+?)(?:\s*\((.*)\))?\s*$")
+
+
+def validate_unit_record(entry: Dict, where: str) -> tuple:
+    """Check one JSON roster entry and return it as a field tuple."""
+    if not isinstance(entry, dict):
+        raise ValueError(f"{where}: a unit must be a JSON object.")
+    unknown = set(entry) - set(UNIT_RECORD_FIELDS)
+    if unknown:
+        raise ValueError(f"{where}: unknown field(s) {', '.join(sorted(unknown))}.")
+    name = entry.get("name")
+    if not isinstance(name, str) or not name.strip():
+        raise ValueError(f"{where}: every unit needs a name.")
+    where = f"{where} ({name})"
+    for key in ("tier", "cost", "health", "damage"):
+        value = entry.get(key)
+        if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+            raise ValueError(f"{where}: '{key}' must be a positive integer.")
+    role = entry.get("role", "Trooper")
+    if role not in ("Leader", "Trooper"):
+        raise ValueError(f"{where}: role must be 'Leader' or 'Trooper'.")
+    abilities = entry.get("abilities", [])
+    if not isinstance(abilities, list) or not all(isinstance(a, str) for a in abilities):
+        raise ValueError(f"{where}: abilities must be a list of names.")
+    synergies = entry.get("synergies", {})
+    if not isinstance(synergies, dict):
+        raise ValueError(f"{where}: synergies must map unit names to modifiers.")
+    for modifiers in synergies.values():
+        if not isinstance(modifiers, dict) or not all(
+            key in SYNERGY_MODIFIERS and isinstance(value, (int, float)) for key, value in modifiers.items()
+        ):
+            raise ValueError(f"{where}: synergy modifiers must be among {', '.join(SYNERGY_MODIFIERS)}.")
+    leader_ability = entry.get("leader_ability")
+    if leader_ability is not None and leader_ability not in LEADER_ABILITIES:
+        raise ValueError(f"{where}: unknown leader ability '{leader_ability}'.")
+    description = entry.get("description", "")
+    if not isinstance(description, str):
+        raise ValueError(f"{where}: description must be text.")
+    speed = entry.get("speed", DEFAULT_SPEED)
+    if not isinstance(speed, (int, float)) or isinstance(speed, bool) or not 0 < speed < math.inf:
+        raise ValueError(f"{where}: 'speed' must be a positive number.")
+    return (
+        name.strip(), entry["tier"], entry["cost"], entry["health"], entry["damage"],
+        description, role, tuple(abilities), synergies, leader_ability, speed,
+    )
+
+
+def parse_json_roster(text: str, source: str) -> Dict[str, tuple]:
+    """Parse a JSON roster: a list of units, or ``{"units": [...]}``."""
+    data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get("units")
+    if not isinstance(data, list):
+        raise ValueError(f"{source}: expected a list of units.")
+    records: Dict[str, tuple] = {}
+    for index, entry in enumerate(data):
+        record = validate_unit_record(entry, f"{source}: unit {index + 1}")
+        if record[0] in records:
+            raise ValueError(f"{source}: unit '{record[0]}' is defined twice.")
+        records[record[0]] = record
+    return records
+
+
+def parse_text_roster(text: str, source: str) -> Dict[str, tuple]:
+    """Parse a tiered text roster in the style of ``Unit Costs.txt``.
+
+    Lines such as ``$5 Tier:`` start a tier and every following non-empty
+    line (with or without a leading ``-``) names one unit, optionally with
+    notes in parentheses that become its description.  Entries such as
+    ``10 Storm Troopers`` are a formation bought as one unit.  A name listed
+    twice keeps its first (most expensive) tier.
+    """
+    records: Dict[str, tuple] = {}
+    price: Optional[float] = None
+    for line_no, raw in enumerate(text.splitlines(), 1):
+        line = raw.strip()
+        if not line:
+            continue
+        header = ROSTER_TIER_HEADER.match(line)
+        if header:
+            price = float(header.group(1))
+            continue
+        if price is None:
+            continue  # title lines before the first tier
+        name, notes = ROSTER_ENTRY.match(line).groups()
+        if name in records:
+            continue
+        cost = max(1, round(price * POINTS_PER_DOLLAR))
+        records[name] = (
+            name,
+            1 if price >= 5 else 2 if price >= 3 else 3,
+            cost,
+            cost,
+            max(1, round(cost / 4)),
+            notes or f"${price:g} tier unit",
+            "Leader" if price >= 4 else "Trooper",
+            (),
+            {},
+            None,
+            DEFAULT_SPEED,
+        )
+    if not records:
+        raise ValueError(f"{source}: no units found (expected lines like '$5 Tier:' followed by names).")
+    return records
+
+
+def roster_cache_path(path: str) -> str:
+    """Where the compiled form of a roster file is kept."""
+    directory, filename = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, "__pycache__", f"{filename}.units-{ROSTER_CACHE_VERSION}.marshal")
+
+
+def load_unit_roster(path: str, use_cache: bool = True) -> Tuple[Dict[str, tuple], bool]:
+    """Read a roster file and return (unit records, whether they replace built-ins).
+
+    JSON rosters carry full stats and replace built-in units of the same
+    name; text rosters only add units.  The parsed records are compiled to
+    a marshal file next to the roster, keyed by its modification time,
+    size and SHA-256, so later starts skip parsing and validation entirely.
+    A touched but unchanged file is recognised by its hash.
+    """
+    stat = os.stat(path)
+    cache_path = roster_cache_path(path)
+    cached = None
+    if use_cache:
+        try:
+            with open(cache_path, "rb") as f:
+                # One read then loads(): marshal.load() on a file is far slower
+                cached = marshal.loads(f.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            cached = None
+        if cached and cached[1:3] == (stat.st_mtime_ns, stat.st_size):
+            return cached[4], cached[5]
+    with open(path, "rb") as f:
+        raw = f.read()
+    digest = hashlib.sha256(raw).hexdigest()
+    if cached and cached[3] == digest:
+        records, replace = cached[4], cached[5]
+    else:
+        text = raw.decode("utf-8-sig")
+        if path.lower().endswith(".json"):
+            records, replace = parse_json_roster(text, path), True
+        else:
+            records, replace = parse_text_roster(text, path), False
+    if use_cache:
+        payload = (ROSTER_CACHE_VERSION, stat.st_mtime_ns, stat.st_size, digest, records, replace)
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(marshal.dumps(payload))
+            os.replace(tmp, cache_path)
+        except OSError:
+            pass  # read-only checkouts simply parse every time
+    return records, replace
+
+
+def load_unit_database(path: str, use_cache: bool = True) -> int:
+    """Load a roster file into ``UNIT_DATABASE``; returns the units added."""
+    records, replace = load_unit_roster(path, use_cache)
+    return UNIT_DATABASE.add_records(records, replace)
+
+
+def load_environment_rosters() -> None:
+    """Load the rosters listed in ``GALAXY_CLASH_UNITS`` into ``UNIT_DATABASE``.
+
+    This runs on import so pool workers and tools see the same units as
+    the command that started them.  A roster that cannot be loaded is
+    reported on standard error and skipped rather than breaking the import.
+    """
+    for path in filter(None, os.environ.get(ROSTER_ENV, "").split(os.pathsep)):
+        try:
+            load_unit_database(path)
+        except Exception as e:
+            print(f"Error: cannot load roster {path}: {e}", file=sys.stderr)
+
+
+load_environment_rosters()
+
 
 ###############################################################################
 # Battlefield presets
@@ -308,18 +910,433 @@ PRESET_BATTLEFIELDS: List[Dict[str, str]] = [
 ]
 
 
+###############################################################################
+# Battlefield positioning
+###############################################################################
+
+@dataclass(frozen=True)
+class TerrainProfile:
+    """How a kind of terrain shapes the positioning grid."""
+
+    frontage: int  # columns of a deployment rank
+    weapon_range: int  # attack reach, in cells (Chebyshev distance)
+    move: int  # cells a unit can cover in one action
+
+
+# Terrain keywords -> profile; the first matching entry wins.  Dense cover
+# narrows the front and shortens sight lines, open ground does the opposite.
+TERRAIN_PROFILES: Tuple[Tuple[Tuple[str, ...], TerrainProfile], ...] = (
+    (("jungle", "forest", "alley", "urban", "ruin", "building"), TerrainProfile(frontage=6, weapon_range=1, move=1)),
+    (("open", "desert", "plain", "snowfield", "tundra"), TerrainProfile(frontage=16, weapon_range=4, move=2)),
+    (("lava", "rock", "slope", "cavern", "canyon"), TerrainProfile(frontage=10, weapon_range=2, move=1)),
+)
+DEFAULT_TERRAIN = TerrainProfile(frontage=10, weapon_range=3, move=2)
+
+
+def terrain_profile(terrain: str) -> TerrainProfile:
+    """Pick the ``TerrainProfile`` matching a battlefield's terrain text."""
+    text = terrain.lower()
+    for keywords, profile in TERRAIN_PROFILES:
+        if any(keyword in text for keyword in keywords):
+            return profile
+    return DEFAULT_TERRAIN
+
+
+class BattleGrid:
+    """Unit positions on a terrain-derived grid, with a spatial hash per side.
+
+    Enabled by ``"positioning": true`` in the battlefield.  Each side deploys
+    in ranks of ``frontage`` units (leaders in the rear) facing the other
+    across a gap of ``weapon_range + move`` cells, so the front ranks close
+    in with one advance.  On its action a unit attacks the nearest enemy
+    within ``weapon_range``; failing that it steers towards the nearest enemy
+    it can see (within ``weapon_range + move``) and attacks once in reach, or
+    else marches straight at the enemy line.
+
+    Positions are hashed into per-side cell buckets, so the nearest-enemy
+    query scans rings of cells outwards from the unit and stops at the first
+    occupied ring.  Each side also keeps the band of rows it has ever
+    occupied: rings closer than that band are skipped, rows outside it are
+    never probed, and a unit out of sight of the whole band is rejected in
+    O(1).  Squads occupy a single cell.
+    The fallen keep their cell (so a revived unit stands where it fell) and
+    are skipped by the scan.
+    """
+
+    def __init__(self, profile: TerrainProfile) -> None:
+        self.profile = profile
+        self.width = profile.frontage
+        self.depth = 0
+        self.positions: Dict[Unit, Tuple[int, int]] = {}
+        self._sides: Dict[Unit, int] = {}
+        self._cells: Tuple[Dict[int, List[Unit]], Dict[int, List[Unit]]] = ({}, {})
+        # Lowest and highest row each side has ever occupied
+        self._bands = [[0, 0], [0, 0]]
+        # Rows a marching unit of each side advances by
+        self._march = (profile.move, -profile.move)
+
+    @classmethod
+    def for_battlefield(cls, battlefield: Optional[Dict[str, str]]) -> Optional["BattleGrid"]:
+        """A grid for ``battlefield``, or None unless it asks for positioning."""
+        if not battlefield or not battlefield.get("positioning"):
+            return None
+        return cls(terrain_profile(battlefield.get("terrain", "")))
+
+    def deploy(self, team1: Team, team2: Team) -> None:
+        """Place both (freshly reset) teams in their starting ranks."""
+        width = self.width
+        ranks = [-(-len(team.units) // width) for team in (team1, team2)]
+        front1 = ranks[0] - 1
+        front2 = front1 + self.profile.weapon_range + self.profile.move
+        self.depth = front2 + ranks[1]
+        self.positions = {}
+        self._sides = {}
+        self._cells = ({}, {})
+        self._bands = [[front1 - ranks[0] + 1, front1], [front2, front2 + ranks[1] - 1]]
+        for side, (team, front, step) in enumerate(((team1, front1, -1), (team2, front2, 1))):
+            cells = self._cells[side]
+            ordered = sorted(team.units, key=lambda u: u.template.role == "Leader")
+            for start in range(0, len(ordered), width):
+                rank = ordered[start:start + width]
+                y = front + step * (start // width)
+                offset = (width - len(rank)) // 2
+                for column, unit in enumerate(rank):
+                    x = offset + column
+                    self.positions[unit] = (x, y)
+                    self._sides[unit] = side
+                    cells.setdefault(y * width + x, []).append(unit)
+
+    def snapshot_state(self, team1: Team, team2: Team) -> Tuple:
+        """Depth, bands and every cell's occupants as roster slots, in order."""
+        slots = [{id(u): slot for slot, u in enumerate(team.units)} for team in (team1, team2)]
+        cells = tuple(
+            tuple((key, tuple(slots[side][id(u)] for u in bucket)) for key, bucket in self._cells[side].items() if bucket)
+            for side in (0, 1)
+        )
+        return self.depth, tuple(map(tuple, self._bands)), cells
+
+    def restore_state(self, state: Tuple, team1: Team, team2: Team) -> None:
+        """Put the grid back into a state taken by ``snapshot_state``."""
+        self.depth, bands, cells = state
+        self._bands = [list(band) for band in bands]
+        self.positions = {}
+        self._sides = {}
+        self._cells = ({}, {})
+        width = self.width
+        for side, team in enumerate((team1, team2)):
+            for key, occupants in cells[side]:
+                bucket = [team.units[slot] for slot in occupants]
+                self._cells[side][key] = bucket
+                for unit in bucket:
+                    self.positions[unit] = (key % width, key // width)
+                    self._sides[unit] = side
+
+    def nearest_enemy(self, unit: Unit, radius: int) -> Tuple[Optional[Unit], int]:
+        """The closest living enemy within ``radius`` cells and its distance."""
+        x, y = self.positions[unit]
+        return self._nearest(1 - self._sides[unit], x, y, radius)
+
+    def _nearest(self, enemy: int, x: int, y: int, radius: int) -> Tuple[Optional[Unit], int]:
+        low, high = self._bands[enemy]
+        # No enemy has ever stood closer than this many rows away
+        first = low - y if y < low else (y - high if y > high else 0)
+        if first > radius:
+            return None, -1
+        cells = self._cells[enemy]
+        width = self.width
+        for r in range(first, radius + 1):
+            x0, x1 = max(x - r, 0), min(x + r, width - 1)
+            for row in ((y - r, y + r) if r else (y,)):
+                if low <= row <= high:
+                    base = row * width
+                    for column in range(x0, x1 + 1):
+                        for other in cells.get(base + column, ()):
+                            if other.is_alive:
+                                return other, r
+            if not r:
+                continue
+            for row in range(max(y - r + 1, low), min(y + r - 1, high) + 1):
+                base = row * width
+                for column in (x - r, x + r):
+                    if 0 <= column < width:
+                        for other in cells.get(base + column, ()):
+                            if other.is_alive:
+                                return other, r
+        return None, -1
+
+    def target_in_range(self, unit: Unit) -> Optional[Unit]:
+        """The closest living enemy ``unit`` can attack without moving."""
+        return self.nearest_enemy(unit, self.profile.weapon_range)[0]
+
+    def engage(self, unit: Unit, log: Optional["BattleRecorder"] = None) -> Optional[Unit]:
+        """Manoeuvre ``unit`` for its action and return the enemy it can attack."""
+        profile = self.profile
+        side = self._sides[unit]
+        x, y = self.positions[unit]
+        target, distance = self._nearest(1 - side, x, y, profile.weapon_range + profile.move)
+        if target is None:
+            # Nobody in sight: march on the enemy line
+            new_x, new_y = x, min(max(y + self._march[side], 0), self.depth - 1)
+            if new_y == y:
+                return None
+        elif distance <= profile.weapon_range:
+            return target
+        else:
+            # Close just enough to bring the target into reach
+            tx, ty = self.positions[target]
+            step = distance - profile.weapon_range
+            new_x = x + max(-step, min(step, tx - x))
+            new_y = y + max(-step, min(step, ty - y))
+        cells = self._cells[side]
+        width = self.width
+        cells[y * width + x].remove(unit)
+        cells.setdefault(new_y * width + new_x, []).append(unit)
+        self.positions[unit] = (new_x, new_y)
+        band = self._bands[side]
+        if new_y < band[0]:
+            band[0] = new_y
+        elif new_y > band[1]:
+            band[1] = new_y
+        if log is not None:
+            log.move(unit, new_x, new_y)
+        return target
+
+
+###############################################################################
+# Abilities
+###############################################################################
+
+# Moments at which an ability can fire.  Handlers take, per trigger:
+#   ROUND_START  (unit, team, enemy, context, round_number, rng, log)
+#   ON_ATTACK    (unit, attack_context, round_number)  -- before the roll
+#   ON_KILL      (unit, victim, team, enemy, rng, log)
+#   ON_DEATH     (unit, team, enemy, rng, log)         -- the unit just fell
+ROUND_START = "round_start"
+ON_ATTACK = "on_attack"
+ON_KILL = "on_kill"
+ON_DEATH = "on_death"
+ABILITY_TRIGGERS = (ROUND_START, ON_ATTACK, ON_KILL, ON_DEATH)
+
+# ability name -> {trigger: handler}; covers leader abilities and the
+# abilities listed on each UnitType alike.
+ABILITY_REGISTRY: Dict[str, Dict[str, Callable]] = {}
+
+
+def register_ability(name: str, trigger: str, handler: Optional[Callable] = None):
+    """Register ``handler`` for ``name`` at ``trigger``; usable as a decorator."""
+    if trigger not in ABILITY_TRIGGERS:
+        raise ValueError(f"Unknown ability trigger '{trigger}'.")
+
+    def register(handler: Callable) -> Callable:
+        ABILITY_REGISTRY.setdefault(name, {})[trigger] = handler
+        return handler
+
+    return register if handler is None else register(handler)
+
+
+@dataclass(frozen=True)
+class AttackModifier:
+    """Declarative ``ON_ATTACK`` effect on hit chance and damage.
+
+    Kept as data rather than code so the vectorized engine can apply the
+    same modifiers as whole arrays.
+    """
+
+    hit_bonus: float = 0.0
+    damage_multiplier: float = 1.0
+    rounds: Optional[Tuple[int, ...]] = None  # None means every round
+
+    def __call__(self, unit: Unit, context: Dict[str, float], round_number: int) -> None:
+        if self.rounds is not None and round_number not in self.rounds:
+            return
+        context["hit_bonus"] = context.get("hit_bonus", 0.0) + self.hit_bonus
+        context["damage_multiplier"] = context.get("damage_multiplier", 1.0) * self.damage_multiplier
+
+
+@dataclass
+class AbilityHooks:
+    """A team's abilities compiled into one dispatch table per trigger.
+
+    Built once per roster (see ``Team.abilities``); an empty table lets the
+    combat loop skip a trigger with a single truth test.
+    """
+
+    round_start: List[Tuple[Unit, Callable]] = field(default_factory=list)
+    on_attack: Dict[Unit, Tuple[Callable, ...]] = field(default_factory=dict)
+    on_kill: Dict[Unit, Tuple[Callable, ...]] = field(default_factory=dict)
+    on_death: Dict[Unit, Tuple[Callable, ...]] = field(default_factory=dict)
+
+
+def compile_abilities(units: Iterable[Unit]) -> AbilityHooks:
+    """Look every unit's abilities up in ``ABILITY_REGISTRY`` once.
+
+    Leader abilities come before a unit's other abilities; names without a
+    registered handler are ignored.
+    """
+    hooks = AbilityHooks()
+    tables = {ON_ATTACK: hooks.on_attack, ON_KILL: hooks.on_kill, ON_DEATH: hooks.on_death}
+    for unit in units:
+        template = unit.template
+        names = ([template.leader_ability] if template.leader_ability else []) + list(template.abilities)
+        for name in names:
+            for trigger, handler in ABILITY_REGISTRY.get(name, {}).items():
+                if trigger == ROUND_START:
+                    hooks.round_start.append((unit, handler))
+                else:
+                    tables[trigger][unit] = tables[trigger].get(unit, ()) + (handler,)
+    return hooks
+
+
+# Leader abilities, fired at the start of a round
+
+
+@register_ability("fear_aura", ROUND_START)
+def _fear_aura(unit, team, enemy, context, round_number, rng, log) -> None:
+    # Darth Vader's fear aura lowers accuracy on the field
+    if round_number == 1:
+        context["accuracy_modifier"] = context.get("accuracy_modifier", 1.0) * 0.85
+        if log is not None:
+            log.ability(unit, "fear_aura")
+
+
+@register_ability("morale_break", ROUND_START)
+def _morale_break(unit, team, enemy, context, round_number, rng, log) -> None:
+    # Palpatine demoralises the opposition on the opening volley
+    if round_number == 1:
+        delta = enemy.apply_morale_change(-0.2)
+        if log is not None:
+            log.ability(unit, "morale_break")
+            log.morale(enemy, delta)
+
+
+@register_ability("tactical_boost", ROUND_START)
+def _tactical_boost(unit, team, enemy, context, round_number, rng, log) -> None:
+    # Thrawn's boost increases accuracy
+    if round_number == 1:
+        context["accuracy_modifier"] = context.get("accuracy_modifier", 1.0) * 1.15
+        if log is not None:
+            log.ability(unit, "tactical_boost")
+
+
+@register_ability("revive", ROUND_START)
+def _revive(unit, team, enemy, context, round_number, rng, log) -> None:
+    # Mother Talzin attempts to revive one fallen friendly unit at half health
+    if round_number < 2:
+        return
+    revived = team.random_fallen(rng)
+    if revived is None:
+        return
+    health = max(1, revived.template.health // 2)
+    team.revive(revived, health)
+    if log is not None:
+        log.revive(unit, revived, health)
+
+
+@register_ability("inspires_rebels", ROUND_START)
+def _inspires_rebels(unit, team, enemy, context, round_number, rng, log) -> None:
+    # Saw Gerrera inspires his partisans boosting morale
+    if round_number == 1:
+        delta = team.apply_morale_change(0.2)
+        if log is not None:
+            log.ability(unit, "inspires_rebels")
+            log.morale(team, delta)
+
+
+@register_ability("protective_aura", ROUND_START)
+def _protective_aura(unit, team, enemy, context, round_number, rng, log) -> None:
+    # Jedi protective aura adds a small defensive buff
+    if round_number == 1:
+        context["defense_buff"] = context.get("defense_buff", 0) + 5
+        if log is not None:
+            log.ability(unit, "protective_aura")
+
+
+# Unit abilities
+
+# Morale shifts of the kill and death abilities below, shared with the
+# vectorized engine.
+DARK_PRESENCE_MORALE = -0.05
+TACTICAL_INSIGHT_MORALE = 0.15
+RESURRECTION_HEALTH_DIVISOR = 4
+
+register_ability("force_strike", ON_ATTACK, AttackModifier(damage_multiplier=1.25))
+register_ability("force_lightning", ON_ATTACK, AttackModifier(hit_bonus=0.15))
+register_ability("force_push", ON_ATTACK, AttackModifier(hit_bonus=0.1))
+register_ability("reckless_attack", ON_ATTACK, AttackModifier(hit_bonus=-0.1, damage_multiplier=1.3))
+register_ability("furious_charge", ON_ATTACK, AttackModifier(damage_multiplier=1.5, rounds=(1,)))
+
+
+@register_ability("furious_charge", ROUND_START)
+def _furious_charge(unit, team, enemy, context, round_number, rng, log) -> None:
+    # The charge itself is the round-one damage bonus; this only narrates it
+    if round_number == 1 and log is not None:
+        log.ability(unit, "furious_charge")
+
+
+@register_ability("dark_presence", ON_KILL)
+def _dark_presence(unit, victim, team, enemy, rng, log) -> None:
+    # Every kill by a Sith Lord shakes the enemy a little more
+    delta = enemy.apply_morale_change(DARK_PRESENCE_MORALE)
+    if log is not None:
+        log.ability(unit, "dark_presence")
+        log.morale(enemy, delta)
+
+
+@register_ability("tactical_insight", ON_DEATH)
+def _tactical_insight(unit, team, enemy, rng, log) -> None:
+    # Thrawn's contingency plans steady his troops when he falls
+    delta = team.apply_morale_change(TACTICAL_INSIGHT_MORALE)
+    if log is not None:
+        log.ability(unit, "tactical_insight")
+        log.morale(team, delta)
+
+
+@register_ability("resurrection", ON_DEATH)
+def _resurrection(unit, team, enemy, rng, log) -> None:
+    # With her dying breath Talzin raises one fallen ally, badly weakened
+    revived = team.random_fallen(rng, exclude=unit)
+    if revived is None:
+        return
+    health = max(1, revived.template.health // RESURRECTION_HEALTH_DIVISOR)
+    team.revive(revived, health)
+    if log is not None:
+        log.ability(unit, "resurrection")
+        log.revive(unit, revived, health)
+
+
 ###############################################################################
 # Helper functions for battle logic
 ###############################################################################
 
+SQUAD_SPEC = re.compile(r"^\s*(\d+)\s*[x×]\s*(.+?)\s*$")
+
+
+def parse_unit_spec(spec: str) -> Tuple[int, str]:
+    """Split a roster entry such as ``"200x Stormtrooper"`` into (count, name)."""
+    match = SQUAD_SPEC.match(spec)
+    if match is None:
+        return 1, spec
+    return int(match.group(1)), match.group(2)
+
+
 def create_units_from_names(names: List[str]) -> List[Unit]:
-    """Convert a list of unit names into Unit instances from the database."""
+    """Convert a list of unit names into Unit instances from the database.
+
+    An entry of the form ``"200x Stormtrooper"`` becomes a single ``Squad``
+    of 200 models instead of 200 separate units.
+    """
     units: List[Unit] = []
-    for name in names:
+    for spec in names:
+        count, name = parse_unit_spec(spec)
         if name not in UNIT_DATABASE:
             raise ValueError(f"Unknown unit '{name}'. Please add it to UNIT_DATABASE.")
         unit_type = UNIT_DATABASE[name]
-        units.append(Unit(template=unit_type))
+        if count > 1:
+            units.append(Squad(template=unit_type, count=count))
+        elif count == 1:
+            units.append(Unit(template=unit_type))
+        else:
+            raise ValueError(f"Invalid unit count in '{spec}'.")
     return units
 
 
@@ -328,210 +1345,351 @@ def pick_random_battlefield() -> Dict[str, str]:
     return random.choice(PRESET_BATTLEFIELDS)
 
 
-def apply_synergies(attacker: Unit, friendly_team: Team, enemy_team: Team, event_context: Dict[str, float]) -> None:
+def apply_synergies(
+    attacker: Unit,
+    friendly_team: Team,
+    enemy_team: Team,
+    event_context: Dict[str, float],
+    log: Optional["BattleRecorder"] = None,
+) -> None:
     """Modify the event context based on active synergies.
 
     For each synergy defined on the attacker's template, check if the synergy's
     key appears among friendly units.  If so, adjust the context accordingly.
+    The check uses the friendly team's precompiled synergy table, so no
+    roster is scanned here.
     """
-    for target_unit_type, modifiers in attacker.template.synergies.items():
-        # If friendly team has a unit of the target type alive
-        if friendly_team.has_unit(target_unit_type):
-            for key, multiplier in modifiers.items():
-                if key == "enemy_accuracy_multiplier":
-                    # Lower enemy accuracy
-                    event_context.setdefault("enemy_accuracy_multiplier", 1.0)
-                    event_context["enemy_accuracy_multiplier"] *= multiplier
-                elif key == "morale_bonus":
-                    # Increase friendly morale slightly
-                    friendly_team.apply_morale_change(multiplier)
+    if not attacker.template.synergies:
+        return
+    for key, multiplier in friendly_team.active_synergies(attacker.template):
+        if key == "enemy_accuracy_multiplier":
+            # Lower enemy accuracy
+            event_context.setdefault("enemy_accuracy_multiplier", 1.0)
+            event_context["enemy_accuracy_multiplier"] *= multiplier
+        elif key == "morale_bonus":
+            # Increase friendly morale slightly
+            delta = friendly_team.apply_morale_change(multiplier)
+            if log is not None:
+                log.morale(friendly_team, delta)
 
 
-def resolve_attack(attacker: Unit, defender: Unit, context: Dict[str, float]) -> Tuple[bool, str]:
+def resolve_attack(
+    attacker: Unit,
+    defender: Unit,
+    context: Dict[str, float],
+    rng=random,
+) -> Tuple[bool, int, bool]:
     """Simulate an attack from attacker to defender.
 
-    Returns a tuple (killed, description).  The description attempts to
-    capture a cinematic, gritty tone: lethal strikes describe viscera
-    and smoke, whereas non‑fatal wounds still hint at searing flesh or
-    smashed armour.  These evocative phrases aim to follow the PDF's
-    suggestion that the narration should be graphic and intense【808377125943113†L0-L1】.
+    Returns a tuple (hit, damage, killed).  Only the mechanics live here;
+    the cinematic description of the blow is chosen later by the renderer
+    from the recorded event (see ``render_battle_log``).  ``rng`` may be any
+    object with the ``random`` module's interface, normally the battle's
+    own seeded ``random.Random``.
     """
+    hit = rng.random() < hit_chance(attacker.template, context)
+
+    if not hit:
+        return False, 0, False
+
+    damage = attack_damage(attacker.template, context)
+    killed = defender.take_damage(damage)
+    return True, damage, killed
+
+
+def hit_chance(template: UnitType, context: Dict[str, float]) -> float:
+    """Probability that one attack by a unit of ``template`` lands."""
     # Base hit chance depends on attacker and defender roles and morale
-    base_hit_chance = 0.6 + 0.1 * (attacker.template.damage / 30)  # stronger attackers are more likely to hit
+    base_hit_chance = 0.6 + 0.1 * (template.damage / 30)  # stronger attackers are more likely to hit
     # Apply accuracy penalty from enemy aura (e.g., Dark Presence)
     accuracy_modifier = context.get("accuracy_modifier", 1.0)
-    hit_chance = base_hit_chance * accuracy_modifier
-    hit = random.random() < min(max(hit_chance, 0.1), 0.95)
+    # Attack abilities such as force_lightning add a flat bonus on top
+    chance = base_hit_chance * accuracy_modifier + context.get("hit_bonus", 0.0)
+    return min(max(chance, 0.1), 0.95)
 
-    if not hit:
-        return False, f"{attacker.template.name} fires at {defender.template.name} but the shot goes wide"
 
-    # Calculate damage; incorporate attacker morale as small bonus
+def attack_damage(template: UnitType, context: Dict[str, float]) -> int:
+    """Damage dealt by one successful attack."""
+    # Incorporate attacker morale as small bonus
     damage_multiplier = 1.0 + 0.2 * (context.get("attacker_morale", 1.0) - 1.0)
-    damage = int(attacker.template.damage * damage_multiplier)
-    killed = defender.take_damage(damage)
+    damage_multiplier *= context.get("damage_multiplier", 1.0)
+    return int(template.damage * damage_multiplier)
 
-    # Choose some visceral descriptors for dramatic effect
-    lethal_descriptions = [
-        "carving through armour, blood spraying into the mud",
-        "searing flesh and leaving smoking armour plates",
-        "splitting bone and sinew with a wet crack",
-        "sending limbs flying in a shower of sparks and gore",
-        "driving a blade cleanly through the heart with a hiss of steam",
-    ]
-    wound_descriptions = [
-        "leaving a smoking gash",
-        "ripping open armour and drawing blood",
-        "searing through flesh and eliciting a scream",
-        "blasting a chunk of armour away",
-        "carving a deep wound that sprays crimson",
-    ]
-
-    if killed:
-        phrase = random.choice(lethal_descriptions)
-        return True, (
-            f"{attacker.template.name} strikes down {defender.template.name}, {phrase}"
-        )
-    else:
-        phrase = random.choice(wound_descriptions)
-        return False, (
-            f"{attacker.template.name} hits {defender.template.name}, {phrase}"
-        )
+
+def binomial(rng, trials: int, p: float) -> int:
+    """Draw a binomial variate, using ``binomialvariate`` where available."""
+    sampler = getattr(rng, "binomialvariate", None)
+    if sampler is not None:
+        return sampler(trials, p)
+    if trials < 50:
+        return sum(1 for _ in range(trials) if rng.random() < p)
+    # Normal approximation is plenty for large volleys
+    draw = round(rng.gauss(trials * p, math.sqrt(trials * p * (1 - p))))
+    return max(0, min(trials, draw))
 
 
-def apply_leader_abilities(team: Team, enemy: Team, context: Dict[str, float], round_number: int) -> List[str]:
-    """Trigger leader abilities at the start of a round.
+class _UnitStream(random.Random):
+    """One unit's dice: a 64-bit linear congruential stream.
 
-    Returns a list of narrative strings describing the activated abilities.
-    The context dict may be updated to reflect buffs or debuffs.
+    Seeding a Mersenne Twister costs more than a small battle, and a
+    battle needs a fresh stream per unit, so this stream keeps one integer
+    of state instead (scrambled with splitmix64 on seeding) and returns its
+    top 53 bits.  Every pick costs exactly one draw, so how many targets the
+    other side has never shifts the draws that follow.
     """
-    descriptions: List[str] = []
-    for unit in team.alive_units:
-        ability = unit.template.leader_ability
-        if not ability:
-            continue
-        # Some abilities only activate once per battle or at certain rounds
-        if ability == "fear_aura" and round_number == 1:
-            # Darth Vader's fear aura lowers enemy accuracy
-            context["accuracy_modifier"] = context.get("accuracy_modifier", 1.0) * 0.85
-            descriptions.append(
-                f"{unit.template.name}'s menacing presence unsettles the enemy, making their shots waver"
-            )
-        elif ability == "morale_break" and round_number == 1:
-            # Palpatine demoralises the opposition on the opening volley
-            enemy.apply_morale_change(-0.2)
-            descriptions.append(
-                f"{unit.template.name} cackles as dark energy fractures enemy resolve"
-            )
-        elif ability == "tactical_boost" and round_number == 1:
-            # Thrawn's boost increases friendly accuracy
-            context["accuracy_modifier"] = context.get("accuracy_modifier", 1.0) * 1.15
-            descriptions.append(
-                f"{unit.template.name}'s calculated strategies sharpen his troops' aim"
-            )
-        elif ability == "revive" and round_number >= 2:
-            # Mother Talzin attempts to revive one fallen friendly unit
-            fallen = [u for u in team.killed_units if u.template.health > 0 and not u.is_alive]
-            if fallen:
-                revived = random.choice(fallen)
-                revived.is_alive = True
-                revived.current_health = max(1, revived.template.health // 2)  # half health
-                team.killed_units.remove(revived)
-                team.units.append(revived)
-                descriptions.append(
-                    f"{unit.template.name} chants ancient Dathomirian spells, reviving {revived.template.name} from death"
-                )
-                # Revived units fight at reduced effectiveness
-                context.setdefault("revived_units", []).append(revived)
-        elif ability == "inspires_rebels" and round_number == 1:
-            # Saw Gerrera inspires his partisans boosting morale
-            team.apply_morale_change(0.2)
-            descriptions.append(
-                f"{unit.template.name}'s defiant roar emboldens his troops to fight harder"
-            )
-        elif ability == "protective_aura" and round_number == 1:
-            # Jedi protective aura adds a small defensive buff
-            context["defense_buff"] = context.get("defense_buff", 0) + 5
-            descriptions.append(
-                f"{unit.template.name} projects a shimmering aura, shielding nearby allies"
-            )
-    return descriptions
 
+    def seed(self, a=None, version=2) -> None:
+        self._state = _splitmix64(a)
 
-def compute_round_events(
-    team1: Team, team2: Team, context: Dict[str, float], round_number: int
-) -> Tuple[List[str], List[str]]:
-    """Simulate one combat round and return bullet points for both teams.
+    def random(self) -> float:
+        self._state = state = (self._state * 6364136223846793005 + 1442695040888963407) & _MASK64
+        return (state >> 11) * (1.0 / 9007199254740992)
 
-    Returns a tuple (round_descriptions, casualties_descriptions).  The first
-    element contains narrative bullets highlighting events of the round.  The
-    second element records casualties.
-    """
-    bullets: List[str] = []
-    casualties: List[str] = []
+    def _randbelow(self, n: int) -> int:
+        return int(self.random() * n)
 
-    # Randomise the order in which units act
-    acting_units = team1.alive_units + team2.alive_units
-    random.shuffle(acting_units)
+    def getstate(self) -> Tuple[int, Optional[float]]:
+        return self._state, self.gauss_next
 
-    # For each acting unit, pick a target from the opposing team
-    for unit in acting_units:
-        # Skip dead units
-        if not unit.is_alive:
-            continue
-        # Determine which team the unit belongs to
-        friendly_team = team1 if unit in team1.units else team2
-        enemy_team = team2 if friendly_team is team1 else team1
-        # Skip if enemy has no more units
-        if not enemy_team.alive_units:
-            break
-        target = random.choice(enemy_team.alive_units)
+    def setstate(self, state: Tuple[int, Optional[float]]) -> None:
+        self._state, self.gauss_next = state
 
-        # Event context includes morale and any active accuracy modifiers
-        event_context: Dict[str, float] = {
-            "attacker_morale": friendly_team.morale,
-            "accuracy_modifier": context.get("accuracy_modifier", 1.0),
-        }
-        # Apply synergies for this attack
-        apply_synergies(unit, friendly_team, enemy_team, event_context)
-        killed, desc = resolve_attack(unit, target, event_context)
-        bullets.append(desc)
-        if killed:
-            enemy_team.killed_units.append(target)
-            casualties.append(target.template.name)
-            # Morale impact: when a leader dies, morale drops drastically
-            if target.template.role == "Leader":
-                enemy_team.apply_morale_change(-0.3)
-                bullets.append(
-                    f"The death of {target.template.name} sends shockwaves through {enemy_team.name}'s ranks"
-                )
-            else:
-                enemy_team.apply_morale_change(-0.05)
-        else:
-            # Slight morale boost for wounding an enemy
-            friendly_team.apply_morale_change(0.02)
-
-    # Remove slain units from the alive list (they remain in units for potential revival)
-    # (No explicit removal needed; alive_units property filters them out.)
-
-    # Summarise casualties
-    if casualties:
-        unique_casualties = {}
-        for c in casualties:
-            unique_casualties[c] = unique_casualties.get(c, 0) + 1
-        casualties_str = ", ".join(
-            f"{count}× {name}" if count > 1 else f"1× {name}" for name, count in unique_casualties.items()
-        )
-        bullets.append(
-            f"Casualties this round: {casualties_str}"
-        )
-    return bullets, casualties
 
+_MASK64 = (1 << 64) - 1
 
-def pre_battle_analysis(team: Team, enemy: Team) -> str:
-    """Generate a pre‑battle analysis paragraph for one team."""
-    strengths: List[str] = []
-    weaknesses: List[str] = []
+
+def _splitmix64(value: int) -> int:
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+class CommonRandomStreams(random.Random):
+    """A battle RNG that gives every unit its own random stream.
+
+    Comparing two lineups that differ by one unit over the same seeds
+    (common random numbers) only pays off if the units they share roll the
+    same dice.  With one shared stream the extra unit shifts every later
+    draw and the two battles have nothing in common after a few attacks;
+    with these streams each unit draws its initiative, targets, hit rolls
+    and ability picks from a stream keyed by its team name, unit type and
+    occurrence in the roster.  Pass it as the ``rng`` of a battle between
+    ``team1`` and ``team2``; anything else still draws from it directly.
+    """
+
+    def __init__(self, seed: int, team1: "Team", team2: "Team") -> None:
+        super().__init__(seed)
+        self.streams: Dict[int, random.Random] = {}
+        for team in (team1, team2):
+            seen: Dict[str, int] = {}
+            for unit in team.units:
+                name = unit.template.name
+                seen[name] = seen.get(name, 0) + 1
+                key = zlib.crc32(f"{team.name}:{name}:{seen[name]}".encode("utf-8"))
+                self.streams[id(unit)] = _UnitStream(_splitmix64(seed & _MASK64) ^ key)
+
+    def getstate(self) -> Tuple:
+        return super().getstate(), tuple(stream.getstate() for stream in self.streams.values())
+
+    def setstate(self, state: Tuple) -> None:
+        shared, streams = state
+        super().setstate(shared)
+        for stream, stream_state in zip(self.streams.values(), streams):
+            stream.setstate(stream_state)
+
+
+def resolve_volley(
+    squad: Squad,
+    friendly_team: Team,
+    enemy_team: Team,
+    context: Dict[str, float],
+    rng=random,
+    log: Optional["BattleRecorder"] = None,
+    grid: Optional[BattleGrid] = None,
+) -> List[str]:
+    """Resolve a whole squad's attacks as one binomial volley.
+
+    The number of hits is drawn once for every standing model; each hit
+    then picks its own target, exactly as individual attacks would (on a
+    ``grid``, the nearest enemy still in range).  Returns the names of the
+    models killed.
+    """
+    shots = squad.size
+    hits = binomial(rng, shots, hit_chance(squad.template, context))
+    damage = attack_damage(squad.template, context)
+    if log is not None:
+        log.volley(squad, shots, hits)
+    casualties: List[str] = []
+    for _ in range(hits):
+        if not enemy_team.alive_count:
+            break
+        target = enemy_team.random_alive(rng) if grid is None else grid.target_in_range(squad)
+        if target is None:
+            break
+        killed = target.take_damage(damage)
+        if log is not None:
+            log.volley_hit(squad, target, damage)
+        if killed:
+            casualties.append(target.template.name)
+            if log is not None:
+                log.kill(target)
+            delta = enemy_team.apply_morale_change(-0.3 if target.template.role == "Leader" else -0.05)
+            if log is not None:
+                log.morale(enemy_team, delta)
+            resolve_kill_abilities(squad, target, friendly_team, enemy_team, rng, log)
+    # Every shot that did not kill lifts morale a little, as single attacks do
+    delta = friendly_team.apply_morale_change(0.02 * (shots - len(casualties)))
+    if log is not None:
+        log.morale(friendly_team, delta)
+    return casualties
+
+
+def apply_leader_abilities(
+    team: Team,
+    enemy: Team,
+    context: Dict[str, float],
+    round_number: int,
+    rng=random,
+    log: Optional["BattleRecorder"] = None,
+) -> None:
+    """Trigger the team's round-start abilities.
+
+    Dispatches through the team's compiled ``ROUND_START`` table (leader
+    abilities and round-start unit abilities alike).  Only units alive when
+    the round starts act, so a unit revived during this pass waits for the
+    next round.  The context dict may be updated to reflect buffs or
+    debuffs, and each ability that fires is recorded on ``log``.
+    """
+    ready = [(unit, handler) for unit, handler in team.abilities.round_start if unit.is_alive]
+    streams = getattr(rng, "streams", None)  # see CommonRandomStreams
+    for unit, handler in ready:
+        handler(unit, team, enemy, context, round_number, rng if streams is None else streams[id(unit)], log)
+
+
+def resolve_kill_abilities(
+    killer: Unit,
+    victim: Unit,
+    killer_team: Team,
+    victim_team: Team,
+    rng=random,
+    log: Optional["BattleRecorder"] = None,
+) -> None:
+    """Fire the killer's ``ON_KILL`` and the victim's ``ON_DEATH`` abilities."""
+    on_kill = killer_team.abilities.on_kill
+    if on_kill:
+        for handler in on_kill.get(killer, ()):
+            handler(killer, victim, killer_team, victim_team, rng, log)
+    on_death = victim_team.abilities.on_death
+    if on_death:
+        for handler in on_death.get(victim, ()):
+            handler(victim, victim_team, killer_team, rng, log)
+
+
+def compute_round_events(
+    team1: Team,
+    team2: Team,
+    context: Dict[str, float],
+    round_number: int,
+    rng=random,
+    log: Optional["BattleRecorder"] = None,
+    grid: Optional[BattleGrid] = None,
+) -> List[str]:
+    """Simulate one combat round.
+
+    Returns the names of the units that fell this round.  Every attack, kill
+    and morale shift is recorded on ``log`` when one is given; the narrative
+    bullets are produced from that record by ``render_battle_log``.  Without
+    a ``grid`` targets are picked at random; with one, each unit first
+    manoeuvres and only attacks the nearest enemy within reach (see
+    ``BattleGrid.engage``).
+
+    Every unit standing when the round starts acts once, in initiative
+    order.  Each rolls an exponentially distributed delay scaled by its
+    type's ``speed``, so a unit twice as fast is twice as likely to act
+    first, and equal speeds give a uniformly random order.  The rolls go on
+    a heap; a unit that falls before its turn is simply dropped when it
+    comes off, so scheduling costs O(log n) per action.
+    """
+    casualties: List[str] = []
+
+    streams = getattr(rng, "streams", None)
+    queue = []
+    for seq, unit in enumerate(team1.alive_units + team2.alive_units):
+        # Per-unit initiative rolls keep the shared units of two rosters in
+        # the same order under CommonRandomStreams
+        roll = rng.random() if streams is None else streams[id(unit)].random()
+        queue.append((-math.log(1.0 - roll) / unit.template.speed, seq, unit))
+    heapq.heapify(queue)
+    attack_hooks1 = team1.abilities.on_attack
+    attack_hooks2 = team2.abilities.on_attack
+
+    # For each acting unit, pick a target from the opposing team
+    while queue:
+        unit = heapq.heappop(queue)[2]
+        # Drop units that fell before their turn
+        if not unit.is_alive:
+            continue
+        # Determine which team the unit belongs to
+        friendly_team = unit.team
+        if friendly_team is team1:
+            enemy_team, attack_hooks = team2, attack_hooks1
+        else:
+            enemy_team, attack_hooks = team1, attack_hooks2
+        # Skip if enemy has no more units
+        if not enemy_team.alive_count:
+            break
+        if grid is not None:
+            target = grid.engage(unit, log)
+            if target is None:
+                continue
+
+        # Event context includes morale and any active accuracy modifiers
+        event_context: Dict[str, float] = {
+            "attacker_morale": friendly_team.morale,
+            "accuracy_modifier": context.get("accuracy_modifier", 1.0),
+        }
+        # Apply synergies for this attack
+        apply_synergies(unit, friendly_team, enemy_team, event_context, log)
+        if attack_hooks:
+            for handler in attack_hooks.get(unit, ()):
+                handler(unit, event_context, round_number)
+        unit_rng = rng if streams is None else streams[id(unit)]
+        if isinstance(unit, Squad):
+            casualties += resolve_volley(unit, friendly_team, enemy_team, event_context, unit_rng, log, grid)
+            continue
+        if grid is None:
+            target = enemy_team.random_alive(unit_rng)
+        hit, damage, killed = resolve_attack(unit, target, event_context, unit_rng)
+        if log is not None:
+            log.attack(unit, target, hit, damage)
+        if killed:
+            # take_damage has already moved the target to killed_units
+            casualties.append(target.template.name)
+            if log is not None:
+                log.kill(target)
+            # Morale impact: when a leader dies, morale drops drastically
+            if target.template.role == "Leader":
+                delta = enemy_team.apply_morale_change(-0.3)
+            else:
+                delta = enemy_team.apply_morale_change(-0.05)
+            if log is not None:
+                log.morale(enemy_team, delta)
+            resolve_kill_abilities(unit, target, friendly_team, enemy_team, unit_rng, log)
+        else:
+            # Slight morale boost for wounding an enemy
+            delta = friendly_team.apply_morale_change(0.02)
+            if log is not None:
+                log.morale(friendly_team, delta)
+
+    # Slain units stay in units for potential revival; alive_units filters them out.
+    return casualties
+
+
+def pre_battle_analysis(team: Team, enemy: Team) -> str:
+    """Generate a pre-battle analysis paragraph for one team."""
+    strengths: List[str] = []
+    weaknesses: List[str] = []
 
     # Evaluate strengths based on leader types and abilities
     for unit in team.alive_units:
@@ -547,7 +1705,7 @@ def pre_battle_analysis(team: Team, enemy: Team) -> str:
             elif unit.template.name == "Jedi":
                 strengths.append("a protective aura and disciplined lightsaber skills")
     # Generic troopers
-    trooper_count = sum(1 for u in team.alive_units if u.template.role == "Trooper")
+    trooper_count = sum(u.size for u in team.alive_units if u.template.role == "Trooper")
     if trooper_count > 0:
         strengths.append(f"a cadre of {trooper_count} troopers providing steady fire support")
 
@@ -570,26 +1728,24 @@ def pre_battle_analysis(team: Team, enemy: Team) -> str:
     )
 
 
+def winner_index(team1: Team, team2: Team) -> int:
+    """Return 0 if team1 wins on remaining units (then health), else 1."""
+    team1_alive = team1.alive_count
+    team2_alive = team2.alive_count
+    if team1_alive != team2_alive:
+        return 0 if team1_alive > team2_alive else 1
+    # Tie breaker: compare total remaining health
+    team1_health = sum(u.current_health for u in team1.alive_units)
+    team2_health = sum(u.current_health for u in team2.alive_units)
+    return 0 if team1_health >= team2_health else 1
+
+
 def determine_winner(team1: Team, team2: Team) -> Tuple[str, str]:
     """Decide the winner based on remaining units and return winner name and recap."""
-    team1_alive = len(team1.alive_units)
-    team2_alive = len(team2.alive_units)
-    if team1_alive > team2_alive:
-        winner = team1
-        loser = team2
-    elif team2_alive > team1_alive:
-        winner = team2
-        loser = team1
+    if winner_index(team1, team2) == 0:
+        winner, loser = team1, team2
     else:
-        # Tie breaker: compare total remaining health
-        team1_health = sum(u.current_health for u in team1.alive_units)
-        team2_health = sum(u.current_health for u in team2.alive_units)
-        if team1_health >= team2_health:
-            winner = team1
-            loser = team2
-        else:
-            winner = team2
-            loser = team1
+        winner, loser = team2, team1
     # Compose recap
     recap = (
         f"In the end, {winner.name} prevailed over {loser.name}. "
@@ -600,163 +1756,2829 @@ def determine_winner(team1: Team, team2: Team) -> Tuple[str, str]:
 
 
 ###############################################################################
-# Narrative generation functions
+# Instrumentation
 ###############################################################################
 
-def generate_battle_report(
+class CountingRandom(random.Random):
+    """``random.Random`` that counts its draws.
+
+    Both primitives are overridden, so ``shuffle``, ``choice`` and friends
+    consume exactly the same stream as a plain ``random.Random`` with the
+    same seed and profiled reports match unprofiled ones.
+    """
+
+    def __init__(self, seed=None) -> None:
+        self.draws = 0
+        super().__init__(seed)
+
+    def random(self) -> float:
+        self.draws += 1
+        return super().random()
+
+    def getrandbits(self, k: int) -> int:
+        self.draws += 1
+        return super().getrandbits(k)
+
+
+@dataclass
+class BattleProfile:
+    """Phase timings and counters for one report, collected only on request.
+
+    Pass an instance as ``profile=`` to ``generate_battle_report`` (or
+    ``iter_battle_report``); without one the engine takes no timestamps at
+    all.  Phases are ``config``, ``leader_abilities``, ``attacks`` (attack
+    resolution including synergy checks) and ``render`` (string assembly);
+    ``total`` covers everything inside ``measure``.  Counters are derived
+    from the event log after the battle, so they cost nothing per attack.
+    """
+
+    phases: Dict[str, float] = field(default_factory=dict)
+    counters: Dict[str, int] = field(default_factory=dict)
+    total: float = 0.0
+    peak_memory: Optional[int] = None
+
+    def add(self, phase: str, seconds: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    @contextmanager
+    def measure(self, memory: bool = True) -> Iterator[None]:
+        """Time the enclosed work and record its peak traced memory."""
+        started = time.perf_counter()
+        owns_tracing = memory and not tracemalloc.is_tracing()
+        if owns_tracing:
+            tracemalloc.start()
+        elif memory:
+            tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            self.total += time.perf_counter() - started
+            if memory:
+                self.peak_memory = tracemalloc.get_traced_memory()[1]
+            if owns_tracing:
+                tracemalloc.stop()
+
+    def timed(self, sections: Iterable[str], phase: str) -> Iterator[str]:
+        """Pass ``sections`` through, charging the time spent producing them."""
+        sections = iter(sections)
+        while True:
+            started = time.perf_counter()
+            section = next(sections, None)
+            self.add(phase, time.perf_counter() - started)
+            if section is None:
+                return
+            yield section
+
+    def count_events(self, log: "BattleLog") -> None:
+        """Tally attacks, hits, kills and friends from a finished battle log."""
+        has_synergies = [
+            [bool(UNIT_DATABASE[parse_unit_spec(spec)[1]].synergies) for spec in specs]
+            for _name, specs in log.teams
+        ]
+        counts = dict.fromkeys(
+            ("attacks", "hits", "kills", "abilities", "revives", "morale_shifts", "moves", "synergy_checks"), 0
+        )
+        for event in log.events:
+            code = event[0]
+            if code == EVENT_ATTACK:
+                counts["attacks"] += 1
+                counts["hits"] += event[4]
+            elif code == EVENT_VOLLEY:
+                counts["attacks"] += event[3]
+                counts["hits"] += event[4]
+            elif code == EVENT_KILL:
+                counts["kills"] += 1
+            elif code == EVENT_ABILITY:
+                counts["abilities"] += 1
+            elif code == EVENT_REVIVE:
+                counts["revives"] += 1
+            elif code == EVENT_MORALE:
+                counts["morale_shifts"] += 1
+            elif code == EVENT_MOVE:
+                counts["moves"] += 1
+            if code in (EVENT_ATTACK, EVENT_VOLLEY) and has_synergies[event[1]][event[2]]:
+                counts["synergy_checks"] += 1
+        for key, value in counts.items():
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def as_dict(self) -> Dict:
+        return {
+            "total": round(self.total, 6),
+            "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            "counters": dict(self.counters),
+            "peak_memory_bytes": self.peak_memory,
+        }
+
+
+###############################################################################
+# Battle snapshots
+###############################################################################
+
+@dataclass(frozen=True)
+class BattleSnapshot:
+    """The full state of a battle at a round boundary, packed into arrays.
+
+    ``round_number`` rounds have been fought (0 is the deployed start).  For
+    each team ``entries`` holds three ints per roster slot (a single unit's
+    health or a squad's wounds, models standing, alive flag), ``alive`` and
+    ``killed`` list roster slots in the order of the team's indexes, which
+    random picks depend on, and ``morale`` its morale.  ``context`` is the
+    round context (accuracy, defence and morale modifiers), ``rng_state``
+    the battle RNG's ``getstate()`` and ``grid`` the positions when the
+    battle uses positioning.  ``rosters`` holds the unit specs so a snapshot
+    is only restored onto the rosters it was taken from.
+
+    Snapshots are immutable and share nothing with the live battle, so any
+    number of continuations can be forked from one: ``restore`` writes the
+    state into a pair of teams in time proportional to the roster, instead
+    of replaying the rounds before it (see ``iter_battle_rounds``'s
+    ``start`` and ``simulate_many``'s ``start``).
+    """
+
+    round_number: int
+    rosters: Tuple[Tuple[str, ...], Tuple[str, ...]]
+    entries: Tuple[array, array]
+    alive: Tuple[array, array]
+    killed: Tuple[array, array]
+    morale: Tuple[float, float]
+    context: Tuple[Tuple[str, float], ...]
+    rng_state: object = None
+    grid: Optional[Tuple] = None
+
+    @classmethod
+    def capture(
+        cls,
+        team1: Team,
+        team2: Team,
+        context: Dict[str, float],
+        round_number: int,
+        rng=None,
+        grid: Optional[BattleGrid] = None,
+    ) -> "BattleSnapshot":
+        states = [team.snapshot_state() for team in (team1, team2)]
+        return cls(
+            round_number=round_number,
+            rosters=(tuple(u.spec for u in team1.units), tuple(u.spec for u in team2.units)),
+            entries=(states[0][0], states[1][0]),
+            alive=(states[0][1], states[1][1]),
+            killed=(states[0][2], states[1][2]),
+            morale=(states[0][3], states[1][3]),
+            context=tuple(context.items()),
+            rng_state=rng.getstate() if rng is not None else None,
+            grid=grid.snapshot_state(team1, team2) if grid is not None else None,
+        )
+
+    def restore(self, team1: Team, team2: Team, grid: Optional[BattleGrid] = None, rng=None) -> Dict[str, float]:
+        """Write this state into the teams (and grid) and return a fresh context.
+
+        Pass ``rng`` to also rewind it to the recorded dice, which replays
+        the original continuation exactly; without it the battle continues
+        with whatever the caller's RNG draws next.
+        """
+        for team, roster in zip((team1, team2), self.rosters):
+            if len(team.units) != len(roster) or any(u.spec != spec for u, spec in zip(team.units, roster)):
+                raise ValueError(f"The snapshot was taken of a different roster than {team.name}'s.")
+        if (grid is None) != (self.grid is None):
+            raise ValueError("A snapshot must be restored with positioning exactly when it was taken with it.")
+        for side, team in enumerate((team1, team2)):
+            team.restore_state((self.entries[side], self.alive[side], self.killed[side], self.morale[side]))
+        if grid is not None:
+            grid.restore_state(self.grid, team1, team2)
+        if rng is not None:
+            if self.rng_state is None:
+                raise ValueError("The snapshot did not record the battle's RNG.")
+            rng.setstate(self.rng_state)
+        return dict(self.context)
+
+
+###############################################################################
+# Battle simulation and event log
+###############################################################################
+
+# Compact event codes.  Units are addressed by (team index, roster slot).
+EVENT_ROUND = "R"  # ("R", round_number)
+EVENT_ABILITY = "L"  # ("L", team, slot, ability)
+EVENT_REVIVE = "V"  # ("V", team, caster_slot, revived_slot, health of the revived model)
+EVENT_ATTACK = "A"  # ("A", team, slot, target_slot, hit, damage)
+EVENT_KILL = "K"  # ("K", team, slot) -- team of the fallen unit
+EVENT_MORALE = "M"  # ("M", team, delta)
+EVENT_VOLLEY = "S"  # ("S", team, slot, shots, hits) -- a squad fires
+EVENT_VOLLEY_HIT = "H"  # ("H", team, slot, target_slot, damage) -- one hit of that volley
+EVENT_MOVE = "P"  # ("P", team, slot, x, y) -- a unit manoeuvres on the grid
+
+BATTLE_LOG_VERSION = 2
+# Older log versions that still load (version 1 predates EVENT_MOVE)
+READABLE_LOG_VERSIONS = (1, 2)
+
+# Bump whenever the rules change so cached results from older engines are ignored
+ENGINE_VERSION = 5
+
+# Blank line placed between report sections
+REPORT_SEPARATOR = "\n\n"
+
+
+@dataclass
+class BattleLog:
+    """Everything needed to re-render a battle without re-simulating it."""
+
+    seed: int
+    teams: List[Tuple[str, List[str]]]  # (team name, unit specs in roster order)
+    battlefield: Dict[str, str]
+    budget: Optional[int] = None
+    events: List[tuple] = field(default_factory=list)
+
+
+class BattleRecorder:
+    """Translate simulation callbacks into compact ``BattleLog`` events."""
+
+    def __init__(self, log: BattleLog, team1: Team, team2: Team) -> None:
+        self.events = log.events
+        self._team_index = {id(team1): 0, id(team2): 1}
+        self._address: Dict[int, Tuple[int, int]] = {}
+        for team_idx, team in enumerate((team1, team2)):
+            for slot, unit in enumerate(team.units):
+                self._address[id(unit)] = (team_idx, slot)
+
+    def round(self, round_number: int) -> None:
+        self.events.append((EVENT_ROUND, round_number))
+
+    def ability(self, unit: Unit, ability: str) -> None:
+        self.events.append((EVENT_ABILITY, *self._address[id(unit)], ability))
+
+    def revive(self, caster: Unit, revived: Unit, health: int) -> None:
+        # ``health`` is the revived model's, not the whole squad's
+        team_idx, slot = self._address[id(caster)]
+        self.events.append((EVENT_REVIVE, team_idx, slot, self._address[id(revived)][1], health))
+
+    def attack(self, attacker: Unit, defender: Unit, hit: bool, damage: int) -> None:
+        self.events.append(
+            (EVENT_ATTACK, *self._address[id(attacker)], self._address[id(defender)][1], int(hit), damage)
+        )
+
+    def volley(self, squad: Squad, shots: int, hits: int) -> None:
+        self.events.append((EVENT_VOLLEY, *self._address[id(squad)], shots, hits))
+
+    def volley_hit(self, squad: Squad, defender: Unit, damage: int) -> None:
+        self.events.append(
+            (EVENT_VOLLEY_HIT, *self._address[id(squad)], self._address[id(defender)][1], damage)
+        )
+
+    def move(self, unit: Unit, x: int, y: int) -> None:
+        self.events.append((EVENT_MOVE, *self._address[id(unit)], x, y))
+
+    def kill(self, unit: Unit) -> None:
+        self.events.append((EVENT_KILL, *self._address[id(unit)]))
+
+    def morale(self, team: Team, delta: float) -> None:
+        if delta:
+            self.events.append((EVENT_MORALE, self._team_index[id(team)], round(delta, 4)))
+
+
+# Rounds in a battle, and the cap on a battle fought to completion
+BATTLE_ROUNDS = 3
+MAX_BATTLE_ROUNDS = 50
+
+
+def fights_to_completion(battlefield: Optional[Dict[str, str]]) -> bool:
+    """Whether ``battlefield`` asks for the battle to go on until a side is wiped out."""
+    return bool(battlefield and battlefield.get("fight_to_completion"))
+
+
+def iter_battle_rounds(
+    team1: Team,
+    team2: Team,
+    rng=random,
+    log: Optional[BattleRecorder] = None,
+    profile: Optional[BattleProfile] = None,
+    grid: Optional[BattleGrid] = None,
+    start: Optional[BattleSnapshot] = None,
+    snapshots: Optional[List[BattleSnapshot]] = None,
+    to_completion: bool = False,
+) -> Iterator[int]:
+    """Reset both teams and play the three combat rounds, yielding after each.
+
+    A ``grid`` (see ``BattleGrid.for_battlefield``) is redeployed first and
+    turns on positioning.  With a ``start`` snapshot the teams and grid are
+    restored from it instead and only the rounds after it are played; the
+    RNG is left alone, so each call forks a new continuation.  A
+    ``snapshots`` list receives a ``BattleSnapshot`` at the start and after
+    every round.  With ``to_completion`` rounds go on until one side is
+    wiped out (at most ``MAX_BATTLE_ROUNDS``) and the battle ends with the
+    round in which that happens.
+    """
+    if start is None:
+        team1.reset()
+        team2.reset()
+        if grid is not None:
+            grid.deploy(team1, team2)
+        context: Dict[str, float] = {}
+        first = 1
+    else:
+        context = start.restore(team1, team2, grid)
+        first = start.round_number + 1
+    if snapshots is not None and start is None:
+        snapshots.append(BattleSnapshot.capture(team1, team2, context, 0, rng, grid))
+    last = MAX_BATTLE_ROUNDS if to_completion else BATTLE_ROUNDS
+    for round_num in range(first, last + 1):
+        if to_completion and not (team1.alive_count and team2.alive_count):
+            return
+        if log is not None:
+            log.round(round_num)
+        started = time.perf_counter() if profile is not None else 0.0
+        # Apply leader abilities at the start of the round
+        apply_leader_abilities(team1, team2, context, round_num, rng, log)
+        apply_leader_abilities(team2, team1, context, round_num, rng, log)
+        if profile is not None:
+            now = time.perf_counter()
+            profile.add("leader_abilities", now - started)
+            started = now
+        # Resolve actions
+        compute_round_events(team1, team2, context, round_num, rng, log, grid)
+        if profile is not None:
+            profile.add("attacks", time.perf_counter() - started)
+        if snapshots is not None:
+            snapshots.append(BattleSnapshot.capture(team1, team2, context, round_num, rng, grid))
+        yield round_num
+
+
+def play_battle(
+    team1: Team,
+    team2: Team,
+    rng=random,
+    log: Optional[BattleRecorder] = None,
+    grid: Optional[BattleGrid] = None,
+    to_completion: bool = False,
+) -> None:
+    """Reset both teams and play the combat rounds (see ``iter_battle_rounds``)."""
+    for _ in iter_battle_rounds(team1, team2, rng, log, grid=grid, to_completion=to_completion):
+        pass
+
+
+def new_battle_seed() -> int:
+    """Draw a fresh seed for a battle that did not request one."""
+    return random.getrandbits(63)
+
+
+def new_battle_log(
     team1: Team,
     team2: Team,
     battlefield: Dict[str, str],
     budget: Optional[int] = None,
-) -> str:
-    """Generate the full battle narrative given two teams and a battlefield."""
+    seed: Optional[int] = None,
+) -> BattleLog:
+    """Validate a matchup and start an empty event log for it."""
     # Validate budgets
     if budget is not None:
         if team1.total_cost > budget:
             raise ValueError(f"Team {team1.name} exceeds the budget (cost {team1.total_cost} > {budget}).")
         if team2.total_cost > budget:
             raise ValueError(f"Team {team2.name} exceeds the budget (cost {team2.total_cost} > {budget}).")
+    if seed is None:
+        seed = new_battle_seed()
+    return BattleLog(
+        seed=seed,
+        teams=[(t.name, [u.spec for u in t.units]) for t in (team1, team2)],
+        battlefield=dict(battlefield),
+        budget=budget,
+    )
+
+
+def run_battle(
+    team1: Team,
+    team2: Team,
+    battlefield: Dict[str, str],
+    budget: Optional[int] = None,
+    seed: Optional[int] = None,
+) -> BattleLog:
+    """Simulate a battle with its own seeded RNG and return its event log."""
+    log = new_battle_log(team1, team2, battlefield, budget, seed)
+    grid = BattleGrid.for_battlefield(log.battlefield)
+    recorder = BattleRecorder(log, team1, team2)
+    play_battle(team1, team2, random.Random(log.seed), recorder, grid, fights_to_completion(log.battlefield))
+    return log
 
-    # Build title
-    title = f"The Battle of {battlefield['location'].title()}"
 
-    # Battlefield introduction
-    introduction = (
-        f"On {battlefield['weather']}, the forces assemble at {battlefield['location']}. "
-        f"The terrain consists of {battlefield['terrain']}. Visibility is poor, and every shadow could hide an enemy."
+def battle_snapshots(
+    team1: Team, team2: Team, battlefield: Optional[Dict[str, str]], seed: int
+) -> List[BattleSnapshot]:
+    """Replay the battle ``run_battle`` fights with ``seed`` and snapshot every round boundary.
+
+    Entry ``n`` is the state after ``n`` rounds (0 is the deployed start).
+    A battle fought to completion that ends early has fewer entries.
+    """
+    snapshots: List[BattleSnapshot] = []
+    grid = BattleGrid.for_battlefield(battlefield)
+    rounds = iter_battle_rounds(
+        team1,
+        team2,
+        random.Random(seed),
+        grid=grid,
+        snapshots=snapshots,
+        to_completion=fights_to_completion(battlefield),
     )
+    for _ in rounds:
+        pass
+    return snapshots
 
-    # Team listings
-    def format_team_list(team: Team) -> str:
-        listing_lines = [f"**{team.name}** (Total: {team.total_cost} pts)"]
-        for u in team.units:
-            listing_lines.append(
-                f"  - {u.template.name} (Tier {u.template.tier}, {u.template.cost} pts)"
-            )
-        return "\n".join(listing_lines)
 
-    team_lists = f"\n{format_team_list(team1)}\n\n{format_team_list(team2)}\n"
+def dump_battle_log(log: BattleLog, fp) -> None:
+    """Write ``log`` as JSON lines: one header object, then one array per event."""
+    header = {
+        "v": BATTLE_LOG_VERSION,
+        "seed": log.seed,
+        "teams": [[name, units] for name, units in log.teams],
+        "battlefield": log.battlefield,
+        "budget": log.budget,
+    }
+    fp.write(json.dumps(header, ensure_ascii=False, separators=(",", ":")) + "\n")
+    for event in log.events:
+        fp.write(json.dumps(event, separators=(",", ":")) + "\n")
+
 
-    # Pre‑battle analysis
-    analysis = (
-        f"Pre‑Battle Analysis:\n"
-        f"{pre_battle_analysis(team1, team2)}\n"
-        f"{pre_battle_analysis(team2, team1)}"
+def load_battle_log(fp) -> BattleLog:
+    """Read a log written by ``dump_battle_log``."""
+    lines = iter(fp)
+    header = json.loads(next(lines))
+    if header.get("v") not in READABLE_LOG_VERSIONS:
+        raise ValueError(f"Unsupported battle log version {header.get('v')!r}.")
+    events = [tuple(json.loads(line)) for line in lines if line.strip()]
+    return BattleLog(
+        seed=header["seed"],
+        teams=[(name, list(units)) for name, units in header["teams"]],
+        battlefield=header["battlefield"],
+        budget=header.get("budget"),
+        events=events,
     )
 
-    # Simulate rounds
-    round_sections: List[str] = []
-    # Reset teams for battle simulation
-    team1.reset()
-    team2.reset()
 
-    context: Dict[str, float] = {}
-    for round_num in range(1, 4):
-        # Apply leader abilities at the start of the round
-        leader_descriptions: List[str] = []
-        leader_descriptions += apply_leader_abilities(team1, team2, context, round_num)
-        leader_descriptions += apply_leader_abilities(team2, team1, context, round_num)
+###############################################################################
+# Narrative generation functions
+###############################################################################
 
-        # Build header
-        round_text = [f"Round {round_num}"]
-        # Add leader ability narratives if any
-        round_text.extend(leader_descriptions)
+LETHAL_DESCRIPTIONS = [
+    "carving through armour, blood spraying into the mud",
+    "searing flesh and leaving smoking armour plates",
+    "splitting bone and sinew with a wet crack",
+    "sending limbs flying in a shower of sparks and gore",
+    "driving a blade cleanly through the heart with a hiss of steam",
+]
 
-        # Resolve actions
-        events, casualties = compute_round_events(team1, team2, context, round_num)
-        round_text.extend(events)
+WOUND_DESCRIPTIONS = [
+    "leaving a smoking gash",
+    "ripping open armour and drawing blood",
+    "searing through flesh and eliciting a scream",
+    "blasting a chunk of armour away",
+    "carving a deep wound that sprays crimson",
+]
+
+# Attack narration per outcome (miss, wound, kill), precompiled once.  A
+# renderer formats each table for a given attacker/defender pair the first
+# time it meets it, so later attacks only pick a ready-made line.
+ATTACK_MISS, ATTACK_WOUND, ATTACK_KILL = 0, 1, 2
+ATTACK_TEMPLATES: Tuple[Tuple[str, ...], ...] = (
+    ("{attacker} fires at {defender} but the shot goes wide",),
+    tuple("{attacker} hits {defender}, " + phrase for phrase in WOUND_DESCRIPTIONS),
+    tuple("{attacker} strikes down {defender}, " + phrase for phrase in LETHAL_DESCRIPTIONS),
+)
+# The flavour phrase behind each template, for structured output
+ATTACK_PHRASES: Tuple[Tuple[Optional[str], ...], ...] = (
+    (None,),
+    tuple(WOUND_DESCRIPTIONS),
+    tuple(LETHAL_DESCRIPTIONS),
+)
+
+# Narration for the leader abilities recorded as EVENT_ABILITY
+ABILITY_DESCRIPTIONS = {
+    "fear_aura": "{name}'s menacing presence unsettles the enemy, making their shots waver",
+    "morale_break": "{name} cackles as dark energy fractures enemy resolve",
+    "tactical_boost": "{name}'s calculated strategies sharpen his troops' aim",
+    "inspires_rebels": "{name}'s defiant roar emboldens his troops to fight harder",
+    "protective_aura": "{name} projects a shimmering aura, shielding nearby allies",
+    "furious_charge": "{name} bellows a war cry and crashes into the enemy line",
+    "dark_presence": "{name} stands over the fallen, and the enemy falters at the sight",
+    "tactical_insight": "{name} falls, but his contingency orders keep the line steady",
+    "resurrection": "{name} collapses, and with her dying breath the dead stir",
+}
+
+# Output formats of the report renderers (see ``REPORT_RENDERERS``)
+REPORT_FORMATS = ("markdown", "html", "json")
+REPORT_CONTENT_TYPES = {
+    "markdown": "text/plain; charset=utf-8",
+    "html": "text/html; charset=utf-8",
+    "json": "application/json",
+}
+
+
+def attack_outcome(hit: bool, killed: bool) -> int:
+    """Index of an attack's row in ``ATTACK_TEMPLATES``."""
+    if not hit:
+        return ATTACK_MISS
+    return ATTACK_KILL if killed else ATTACK_WOUND
+
+
+def describe_attack(attacker: Unit, defender: Unit, hit: bool, killed: bool, flavor=random) -> str:
+    """Cinematic one-liner for a resolved attack.
+
+    The description attempts to capture a cinematic, gritty tone: lethal
+    strikes describe viscera and smoke, whereas non-fatal wounds still hint
+    at searing flesh or smashed armour.  These evocative phrases aim to
+    follow the PDF's suggestion that the narration should be graphic and
+    intense【808377125943113†L0-L1】.
+    """
+    templates = ATTACK_TEMPLATES[attack_outcome(hit, killed)]
+    template = templates[0] if len(templates) == 1 else flavor.choice(templates)
+    return template.format(attacker=attacker.template.name, defender=defender.template.name)
+
+
+def unit_label(name: str, count: int) -> str:
+    """Name a group of models, e.g. ``Stormtrooper`` or ``57× Stormtrooper``."""
+    return f"{count}× {name}" if count > 1 else name
+
+
+def loss_counts(team: Team) -> Dict[str, int]:
+    """Models a team has lost so far per unit type (revived units excluded)."""
+    counts: Dict[str, int] = {}
+    for u in team.killed_units:
+        counts[u.template.name] = counts.get(u.template.name, 0) + u.count
+    # Squads still in the fight may have lost some of their models
+    for u in team.units:
+        if isinstance(u, Squad) and u.is_alive and u.size < u.count:
+            counts[u.template.name] = counts.get(u.template.name, 0) + u.count - u.size
+    return counts
+
+
+def summarise_losses(team: Team) -> str:
+    """List the units a team has lost so far (revived units excluded)."""
+    counts = loss_counts(team)
+    if not counts:
+        return f"No significant losses for {team.name}."
+    summary = ", ".join(
+        f"{num}× {name}" if num > 1 else f"1× {name}" for name, num in counts.items()
+    )
+    return f"{team.name} casualties: {summary}."
+
+
+class ReportRenderer:
+    """Incrementally render a recorded battle as the Markdown cinematic report.
+
+    The events are replayed onto fresh ``Team`` objects, so no simulation
+    randomness is involved; flavour phrases come from a separate generator
+    seeded with the battle's seed, which makes re-rendering deterministic.
+    Sections are handed out as soon as they are complete, which lets
+    ``iter_battle_report`` stream a battle while it is still being fought.
+
+    Attack bullets come ready-made from ``attack_bullets``, which formats
+    ``ATTACK_TEMPLATES`` once per attacker/defender pair and renderer class,
+    and every bullet is appended to one reused round buffer.  Subclasses
+    change the markup by overriding the ``format_*`` methods, ``bullet`` and
+    ``escape``; see ``HtmlReportRenderer`` and, for structured data,
+    ``JsonReportRenderer``.
+    """
+
+    def __init__(self, log: BattleLog) -> None:
+        self.log = log
+        self.teams = [Team(name=name, units=create_units_from_names(units)) for name, units in log.teams]
+        self.flavor = random.Random(log.seed)
+        self._heading: Optional[str] = None
+        self._round: List[str] = []
+        self._casualties: Dict[str, int] = {}
+        self._moves: List[set] = [set(), set()]
+        self._pairings: Dict[Tuple[str, str, int], Tuple[str, ...]] = {}
 
+    @staticmethod
+    def escape(text: str) -> str:
+        return text
+
+    @classmethod
+    @lru_cache(maxsize=4096)
+    def attack_bullets(cls, attacker: str, defender: str, outcome: int) -> Tuple[str, ...]:
+        """Finished bullets narrating one pairing's attack, one per flavour phrase."""
+        return tuple(
+            cls.bullet(template.format(attacker=attacker, defender=defender))
+            for template in ATTACK_TEMPLATES[outcome]
+        )
+
+    # Battle data shared by every format
+
+    def preamble_data(self) -> Dict:
+        """Title, setting, rosters, analysis and estimated odds as plain data.
+
+        ``estimate_odds`` models the default three-round battle without
+        positioning, so ``odds`` is None for a battlefield that changes
+        those rules rather than quoting odds for a different battle.
+        """
+        team1, team2 = self.teams
+        battlefield = self.log.battlefield
+        odds = None
+        if not fights_to_completion(battlefield) and not battlefield.get("positioning"):
+            odds = roster_odds(tuple((name, tuple(specs)) for name, specs in self.log.teams)).as_dict()
+        return {
+            "title": f"The Battle of {battlefield['location'].title()}",
+            "introduction": (
+                f"On {battlefield['weather']}, the forces assemble at {battlefield['location']}. "
+                f"The terrain consists of {battlefield['terrain']}. Visibility is poor, and every shadow could hide an enemy."
+            ),
+            "teams": [
+                {
+                    "name": team.name,
+                    "total_cost": team.total_cost,
+                    # One ``[name, count, tier, cost]`` row per unit
+                    "units": [(u.template.name, u.count, u.template.tier, u.template.cost * u.count) for u in team.units],
+                }
+                for team in (team1, team2)
+            ],
+            "analysis": [pre_battle_analysis(team1, team2), pre_battle_analysis(team2, team1)],
+            "odds": odds,
+        }
+
+    def verdict_data(self) -> Dict:
+        """The winner and the closing recap as plain data."""
+        team1, team2 = self.teams
+        winner_name, recap = determine_winner(team1, team2)
+        return {"winner": winner_index(team1, team2), "winner_name": winner_name, "recap": recap}
+
+    def final_state_data(self) -> List[Dict]:
+        """Survivors and fallen of both teams as plain data."""
+        return [
+            {
+                "name": team.name,
+                "survivors": [[u.template.name, u.size] for u in team.units if u.is_alive],
+                "fallen": [[u.template.name, u.count - u.size] for u in team.units if u.size < u.count],
+            }
+            for team in self.teams
+        ]
+
+    # Markup
+
+    def format_preamble(self, data: Dict) -> List[str]:
+        def format_team_list(team: Dict) -> str:
+            listing_lines = [f"**{team['name']}** (Total: {team['total_cost']} pts)"]
+            for name, count, tier, cost in team["units"]:
+                listing_lines.append(f"  - {unit_label(name, count)} (Tier {tier}, {cost} pts)")
+            return "\n".join(listing_lines)
+
+        team1, team2 = data["teams"]
+        team_lists = f"\n{format_team_list(team1)}\n\n{format_team_list(team2)}\n"
+        analysis = f"Pre‑Battle Analysis:\n{data['analysis'][0]}\n{data['analysis'][1]}"
+        if data["odds"] is not None:
+            analysis += f"\n{format_odds_estimate(data['odds'])}"
+        return [f"# {data['title']}", data["introduction"], "Team Rosters:", team_lists, analysis]
+
+    def format_round(self, heading: str, bullets: str) -> str:
+        return f"* {heading}\n{bullets[:-1]}"
+
+    def format_verdict(self, data: Dict) -> str:
+        team1, team2 = self.teams
+        return (
+            f"Casualties & Survivors:\n"
+            f"{summarise_final_state(team1)}\n"
+            f"{summarise_final_state(team2)}\n\n"
+            f"Winner: **{data['winner_name']}**\n"
+            f"{data['recap']}"
+        )
+
+    # Sections
+
+    def preamble(self) -> List[str]:
+        """Title, introduction, rosters and pre-battle analysis."""
+        return self.format_preamble(self.preamble_data())
+
+    def verdict(self) -> str:
+        """Final casualties, survivors and the winner."""
+        return self.format_verdict(self.verdict_data())
+
+    @staticmethod
+    def bullet(text: str) -> str:
+        """``text`` as one finished bullet of a round section."""
+        return f"* {text}\n"
+
+    def close_round(self) -> Optional[str]:
+        """Finish the round in progress and return its section, if any."""
+        heading = self._heading
+        if heading is None:
+            return None
+        self._heading = None
+        body = "".join(self._round)
+        self._round.clear()
+        bullet = self.bullet
+        # This round's manoeuvres open the section
+        opening = ""
+        if self._moves[0] or self._moves[1]:
+            terrain = self.log.battlefield["terrain"]
+            for team, moved in zip(self.teams, self._moves):
+                if moved:
+                    label = "unit" if len(moved) == 1 else "units"
+                    opening += bullet(f"{team.name} manoeuvre {len(moved)} {label} across {terrain}")
+            self._moves = [set(), set()]
+        closing = ""
+        if self._casualties:
+            casualties_str = ", ".join(
+                f"{count}× {name}" if count > 1 else f"1× {name}" for name, count in self._casualties.items()
+            )
+            closing = bullet(f"Casualties this round: {casualties_str}")
         # List casualties at end of round for both sides
-        def summarise_losses(team: Team) -> str:
-            lost = [u for u in team.killed_units if not u.is_alive]
-            if not lost:
-                return f"No significant losses for {team.name}."
-            counts: Dict[str, int] = {}
-            for u in lost:
-                counts[u.template.name] = counts.get(u.template.name, 0) + 1
-            summary = ", ".join(
-                f"{num}× {name}" if num > 1 else f"1× {name}" for name, num in counts.items()
+        closing += bullet(summarise_losses(self.teams[0])) + bullet(summarise_losses(self.teams[1]))
+        self._casualties = {}
+        return self.format_round(heading, opening + body + closing)
+
+    def consume(self, events: Iterable[tuple]) -> List[str]:
+        """Replay events and return the round sections they completed."""
+        teams = self.teams
+        write = self._round.append
+        bullet = self.bullet
+        attack_bullets = self.attack_bullets
+        # Per-battle front for the shared cache; the pairings seen are few
+        pairings: Dict[Tuple[str, str, int], Tuple[str, ...]] = self._pairings
+        choice = self.flavor.choice
+        finished: List[str] = []
+        for event in events:
+            code = event[0]
+            if code == EVENT_ROUND:
+                section = self.close_round()
+                if section is not None:
+                    finished.append(section)
+                self._heading = f"Round {event[1]}"
+            elif code == EVENT_ABILITY:
+                unit = teams[event[1]].units[event[2]]
+                write(bullet(ABILITY_DESCRIPTIONS[event[3]].format(name=unit.template.name)))
+            elif code == EVENT_REVIVE:
+                team = teams[event[1]]
+                caster = team.units[event[2]]
+                revived = team.units[event[3]]
+                team.revive(revived, event[4])
+                write(bullet(
+                    f"{caster.template.name} chants ancient Dathomirian spells, reviving {revived.template.name} from death"
+                ))
+            elif code == EVENT_ATTACK:
+                _, team_idx, slot, target_slot, hit, damage = event
+                attacker = teams[team_idx].units[slot]
+                defender = teams[1 - team_idx].units[target_slot]
+                killed = defender.take_damage(damage) if hit else False
+                key = (attacker.template.name, defender.template.name, attack_outcome(hit, killed))
+                lines = pairings.get(key)
+                if lines is None:
+                    lines = pairings[key] = attack_bullets(*key)
+                write(lines[0] if len(lines) == 1 else choice(lines))
+            elif code == EVENT_VOLLEY:
+                _, team_idx, slot, shots, hits = event
+                squad = teams[team_idx].units[slot]
+                write(bullet(
+                    f"{unit_label(squad.template.name, shots)} unleash a volley, "
+                    f"{hits} of {shots} shots finding their mark"
+                ))
+            elif code == EVENT_VOLLEY_HIT:
+                _, team_idx, slot, target_slot, damage = event
+                teams[1 - team_idx].units[target_slot].take_damage(damage)
+            elif code == EVENT_KILL:
+                team = teams[event[1]]
+                fallen = team.units[event[2]]
+                self._casualties[fallen.template.name] = self._casualties.get(fallen.template.name, 0) + 1
+                if fallen.template.role == "Leader":
+                    write(bullet(f"The death of {fallen.template.name} sends shockwaves through {team.name}'s ranks"))
+            elif code == EVENT_MORALE:
+                teams[event[1]].apply_morale_change(event[2])
+            elif code == EVENT_MOVE:
+                self._moves[event[1]].add(event[2])
+        return finished
+
+
+class HtmlReportRenderer(ReportRenderer):
+    """The cinematic report as an HTML fragment, one element per section."""
+
+    @staticmethod
+    def bullet(text: str) -> str:
+        return f"<li>{html.escape(text, quote=False)}</li>\n"
+
+    @staticmethod
+    def escape(text: str) -> str:
+        return html.escape(text, quote=False)
+
+    def format_preamble(self, data: Dict) -> List[str]:
+        escape = self.escape
+        rosters = []
+        for team in data["teams"]:
+            units = "".join(
+                f"<li>{escape(unit_label(name, count))} (Tier {tier}, {cost} pts)</li>"
+                for name, count, tier, cost in team["units"]
             )
-            return f"{team.name} casualties: {summary}."
+            rosters.append(
+                f"<li><strong>{escape(team['name'])}</strong> (Total: {team['total_cost']} pts)<ul>{units}</ul></li>"
+            )
+        analysis = "".join(f"<p>{escape(text)}</p>" for text in data["analysis"])
+        if data["odds"] is not None:
+            analysis += f"<p class=\"odds\">{escape(format_odds_estimate(data['odds']))}</p>"
+        return [
+            f"<h1>{escape(data['title'])}</h1>",
+            f"<p>{escape(data['introduction'])}</p>",
+            f"<h2>Team Rosters</h2>\n<ul class=\"rosters\">{''.join(rosters)}</ul>",
+            f"<h2>Pre‑Battle Analysis</h2>\n{analysis}",
+        ]
 
-        round_text.append(summarise_losses(team1))
-        round_text.append(summarise_losses(team2))
-        round_sections.append("\n".join("* " + line for line in round_text))
+    def format_round(self, heading: str, bullets: str) -> str:
+        return f"<section class=\"round\">\n<h2>{heading}</h2>\n<ul>\n{bullets}</ul>\n</section>"
 
-    # Determine the winner and recap
-    winner_name, recap = determine_winner(team1, team2)
-    final_section = (
-        f"Casualties & Survivors:\n"
-        f"{summarise_final_state(team1)}\n"
-        f"{summarise_final_state(team2)}\n\n"
-        f"Winner: **{winner_name}**\n"
-        f"{recap}"
-    )
+    def format_verdict(self, data: Dict) -> str:
+        escape = self.escape
+        team1, team2 = self.teams
+        return (
+            f"<h2>Casualties &amp; Survivors</h2>\n"
+            f"<p>{escape(summarise_final_state(team1))}</p>\n"
+            f"<p>{escape(summarise_final_state(team2))}</p>\n"
+            f"<p class=\"winner\">Winner: <strong>{escape(data['winner_name'])}</strong></p>\n"
+            f"<p>{escape(data['recap'])}</p>"
+        )
 
-    # Assemble full report
-    report_parts = [f"# {title}", introduction, "Team Rosters:", team_lists, analysis]
-    report_parts.extend(round_sections)
-    report_parts.append(final_section)
-    return "\n\n".join(report_parts)
 
+class JsonReportRenderer(ReportRenderer):
+    """The battle as one JSON document of structured data for a frontend.
 
-def summarise_final_state(team: Team) -> str:
-    """Generate a final summary of survivors and dead for a team."""
-    survivors = [u for u in team.units if u.is_alive]
-    dead = [u for u in team.units if not u.is_alive]
-    parts: List[str] = []
-    if survivors:
-        names = ", ".join(u.template.name for u in survivors)
-        parts.append(f"Survivors for {team.name}: {names}.")
-    else:
-        parts.append(f"No survivors for {team.name}.")
-    if dead:
-        names = ", ".join(u.template.name for u in dead)
-        parts.append(f"Fallen for {team.name}: {names}.")
-    return " ".join(parts)
+    No narration is formatted: rounds hold typed event records (attacks
+    keep the flavour ``phrase`` the text report would use), so a client can
+    render or animate them as it likes.  Every section but the last is
+    empty; ``verdict`` returns the whole document.
+    """
 
+    def __init__(self, log: BattleLog) -> None:
+        super().__init__(log)
+        self._preamble: Dict = {}
+        self._rounds: List[Dict] = []
+        self._events: List[Dict] = []
 
-###############################################################################
-# Command‑line interface
-###############################################################################
+    def preamble(self) -> List[str]:
+        self._preamble = self.preamble_data()
+        return []
 
-def load_battle_config(path: str) -> Tuple[Team, Team, Dict[str, str], Optional[int]]:
-    """Load a JSON battle configuration file and produce Team objects."""
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    # Budget
-    budget = data.get("budget")
-    # Teams
-    teams = data["teams"]
-    if len(teams) != 2:
-        raise ValueError("Exactly two teams must be specified in the configuration.")
-    team_objs: List[Team] = []
-    for t in teams:
-        name = t.get("name") or f"Team {len(team_objs) + 1}"
-        units = create_units_from_names(t["units"])
-        team_objs.append(Team(name=name, units=units))
-    # Battlefield
-    battlefield = data.get("battlefield") or pick_random_battlefield()
-    return team_objs[0], team_objs[1], battlefield, budget
+    def close_round(self) -> Optional[str]:
+        if self._heading is None:
+            return None
+        self._rounds.append(
+            {
+                "round": self._heading,
+                "events": self._events,
+                "casualties": self._casualties,
+                "losses": [loss_counts(team) for team in self.teams],
+            }
+        )
+        self._heading = None
+        self._events = []
+        self._casualties = {}
+        return None
 
+    def verdict(self) -> str:
+        document = {
+            "seed": self.log.seed,
+            "battlefield": self.log.battlefield,
+            **self._preamble,
+            "rounds": self._rounds,
+            "final_state": self.final_state_data(),
+            **self.verdict_data(),
+        }
+        return json.dumps(document, ensure_ascii=False, separators=(",", ":"))
 
-def main(argv: List[str]) -> int:
-    if len(argv) < 2:
+    def consume(self, events: Iterable[tuple]) -> List[str]:
+        teams = self.teams
+        for event in events:
+            code = event[0]
+            if code == EVENT_ROUND:
+                self.close_round()
+                self._heading = event[1]
+                continue
+            records = self._events
+            if code == EVENT_ABILITY:
+                unit = teams[event[1]].units[event[2]]
+                records.append(
+                    {"type": "ability", "team": event[1], "slot": event[2], "unit": unit.template.name, "ability": event[3]}
+                )
+            elif code == EVENT_REVIVE:
+                team = teams[event[1]]
+                revived = team.units[event[3]]
+                team.revive(revived, event[4])
+                records.append(
+                    {
+                        "type": "revive",
+                        "team": event[1],
+                        "slot": event[2],
+                        "caster": team.units[event[2]].template.name,
+                        "revived_slot": event[3],
+                        "unit": revived.template.name,
+                        "health": event[4],
+                    }
+                )
+            elif code == EVENT_ATTACK:
+                _, team_idx, slot, target_slot, hit, damage = event
+                defender = teams[1 - team_idx].units[target_slot]
+                killed = defender.take_damage(damage) if hit else False
+                phrases = ATTACK_PHRASES[attack_outcome(hit, killed)]
+                records.append(
+                    {
+                        "type": "attack",
+                        "team": team_idx,
+                        "slot": slot,
+                        "attacker": teams[team_idx].units[slot].template.name,
+                        "target_slot": target_slot,
+                        "target": defender.template.name,
+                        "hit": bool(hit),
+                        "damage": damage,
+                        "killed": killed,
+                        "phrase": phrases[0] if len(phrases) == 1 else self.flavor.choice(phrases),
+                    }
+                )
+            elif code == EVENT_VOLLEY:
+                _, team_idx, slot, shots, hits = event
+                records.append(
+                    {
+                        "type": "volley",
+                        "team": team_idx,
+                        "slot": slot,
+                        "unit": teams[team_idx].units[slot].template.name,
+                        "shots": shots,
+                        "hits": hits,
+                    }
+                )
+            elif code == EVENT_VOLLEY_HIT:
+                _, team_idx, slot, target_slot, damage = event
+                defender = teams[1 - team_idx].units[target_slot]
+                records.append(
+                    {
+                        "type": "volley_hit",
+                        "team": team_idx,
+                        "slot": slot,
+                        "target_slot": target_slot,
+                        "target": defender.template.name,
+                        "damage": damage,
+                        "killed": defender.take_damage(damage),
+                    }
+                )
+            elif code == EVENT_KILL:
+                fallen = teams[event[1]].units[event[2]]
+                self._casualties[fallen.template.name] = self._casualties.get(fallen.template.name, 0) + 1
+                records.append(
+                    {
+                        "type": "kill",
+                        "team": event[1],
+                        "slot": event[2],
+                        "unit": fallen.template.name,
+                        "leader": fallen.template.role == "Leader",
+                    }
+                )
+            elif code == EVENT_MORALE:
+                team = teams[event[1]]
+                team.apply_morale_change(event[2])
+                records.append({"type": "morale", "team": event[1], "delta": event[2], "morale": round(team.morale, 4)})
+            elif code == EVENT_MOVE:
+                _, team_idx, slot, x, y = event
+                records.append({"type": "move", "team": team_idx, "slot": slot, "x": x, "y": y})
+        return []
+
+
+# Renderer class per entry of REPORT_FORMATS
+REPORT_RENDERERS = {
+    "markdown": ReportRenderer,
+    "html": HtmlReportRenderer,
+    "json": JsonReportRenderer,
+}
+
+
+def report_renderer(log: BattleLog, format: str = "markdown") -> ReportRenderer:
+    """The renderer for ``format`` (one of ``REPORT_FORMATS``) over ``log``."""
+    try:
+        renderer_class = REPORT_RENDERERS[format]
+    except KeyError:
+        raise ValueError(f"Unknown report format '{format}'.") from None
+    return renderer_class(log)
+
+
+def iter_rendered_log(log: BattleLog, format: str = "markdown") -> Iterator[str]:
+    """Yield the report sections for a stored log."""
+    renderer = report_renderer(log, format)
+    yield from renderer.preamble()
+    yield from renderer.consume(log.events)
+    section = renderer.close_round()
+    if section is not None:
+        yield section
+    yield renderer.verdict()
+
+
+def render_battle_log(log: BattleLog, format: str = "markdown") -> str:
+    """Render a recorded battle as a report in ``format`` (Markdown by default)."""
+    return REPORT_SEPARATOR.join(iter_rendered_log(log, format))
+
+
+def iter_battle_report(
+    team1: Team,
+    team2: Team,
+    battlefield: Dict[str, str],
+    budget: Optional[int] = None,
+    seed: Optional[int] = None,
+    log: Optional[BattleLog] = None,
+    profile: Optional[BattleProfile] = None,
+    format: str = "markdown",
+) -> Iterator[str]:
+    """Simulate and narrate a battle, yielding each section as it is ready.
+
+    The title, introduction, rosters and analysis come out before a single
+    attack is rolled; each round follows as soon as it has been fought, and
+    the verdict comes last.  Joining the sections with ``REPORT_SEPARATOR``
+    gives exactly ``generate_battle_report``'s text.  Pass ``log`` (from
+    ``new_battle_log``) to keep the recorded events and ``profile`` to
+    collect timings and counters (see ``BattleProfile``).  ``format``
+    selects the renderer; ``"json"`` yields a single document at the end.
+    """
+    if log is None:
+        log = new_battle_log(team1, team2, battlefield, budget, seed)
+    renderer = report_renderer(log, format)
+
+    def render(sections: Iterable[str]) -> Iterable[str]:
+        return sections if profile is None else profile.timed(sections, "render")
+
+    def round_sections(events: List[tuple]) -> Iterator[str]:
+        yield from renderer.consume(events)
+        section = renderer.close_round()
+        if section is not None:
+            yield section
+
+    def verdict() -> Iterator[str]:
+        yield renderer.verdict()
+
+    yield from render(renderer.preamble())
+    cursor = 0
+    rng = random.Random(log.seed) if profile is None else CountingRandom(log.seed)
+    grid = BattleGrid.for_battlefield(log.battlefield)
+    rounds = iter_battle_rounds(
+        team1,
+        team2,
+        rng,
+        BattleRecorder(log, team1, team2),
+        profile,
+        grid,
+        to_completion=fights_to_completion(log.battlefield),
+    )
+    for _ in rounds:
+        yield from render(round_sections(log.events[cursor:]))
+        cursor = len(log.events)
+    yield from render(verdict())
+    if profile is not None:
+        profile.count_events(log)
+        profile.counters["rng_draws"] = profile.counters.get("rng_draws", 0) + rng.draws
+
+
+def generate_battle_report(
+    team1: Team,
+    team2: Team,
+    battlefield: Dict[str, str],
+    budget: Optional[int] = None,
+    seed: Optional[int] = None,
+    profile: Optional[BattleProfile] = None,
+    format: str = "markdown",
+) -> str:
+    """Generate the full battle narrative given two teams and a battlefield.
+
+    The same ``seed`` always produces the same report, in any of the
+    ``REPORT_FORMATS``.  A ``profile`` is filled with the run's timings,
+    counters and peak memory.
+    """
+    if profile is None:
+        return REPORT_SEPARATOR.join(iter_battle_report(team1, team2, battlefield, budget, seed, format=format))
+    with profile.measure():
+        return REPORT_SEPARATOR.join(
+            iter_battle_report(team1, team2, battlefield, budget, seed, profile=profile, format=format)
+        )
+
+
+def write_streamed(sections: Iterable[str], out=None) -> None:
+    """Write report sections to ``out`` as they arrive, flushing each one."""
+    out = out or sys.stdout
+    for index, section in enumerate(sections):
+        out.write(section if index == 0 else REPORT_SEPARATOR + section)
+        out.flush()
+    out.write("\n")
+    out.flush()
+
+
+def summarise_final_state(team: Team) -> str:
+    """Generate a final summary of survivors and dead for a team."""
+    survivors = [unit_label(u.template.name, u.size) for u in team.units if u.is_alive]
+    dead = [unit_label(u.template.name, u.count - u.size) for u in team.units if u.size < u.count]
+    parts: List[str] = []
+    if survivors:
+        names = ", ".join(survivors)
+        parts.append(f"Survivors for {team.name}: {names}.")
+    else:
+        parts.append(f"No survivors for {team.name}.")
+    if dead:
+        names = ", ".join(dead)
+        parts.append(f"Fallen for {team.name}: {names}.")
+    return " ".join(parts)
+
+
+###############################################################################
+# Monte Carlo odds
+###############################################################################
+
+@dataclass
+class BattleOutcome:
+    """Result of one silent (narration-free) battle simulation."""
+
+    winner: int  # 0 for the first team, 1 for the second
+    survivors: Tuple[int, int]
+    casualties: Tuple[Dict[str, int], Dict[str, int]]
+    rounds: int = 3
+
+
+@dataclass
+class OddsResult:
+    """Aggregated win probabilities from many simulated battles."""
+
+    team_names: Tuple[str, str]
+    battles: int
+    wins: Tuple[int, int]
+    win_rates: Tuple[float, float]
+    confidence: float
+    confidence_intervals: Tuple[Tuple[float, float], Tuple[float, float]]
+    mean_survivors: Tuple[float, float]
+    casualty_rates: Tuple[Dict[str, float], Dict[str, float]]
+    stopped_early: bool = False
+    states: int = 0  # set instead of battles when solved exactly (see battle_exact)
+
+
+def simulate_battle(
+    team1: Team,
+    team2: Team,
+    rng=random,
+    grid: Optional[BattleGrid] = None,
+    start: Optional[BattleSnapshot] = None,
+    to_completion: bool = False,
+) -> BattleOutcome:
+    """Run the battle loop without building any narrative text.
+
+    This drives the same ``apply_leader_abilities``/``compute_round_events``
+    rules as ``generate_battle_report`` so the odds stay faithful to the
+    stories players read.  Pass the battlefield's ``grid`` for positioning,
+    a ``start`` snapshot to continue a battle from a round boundary and
+    ``to_completion`` to fight until one side is wiped out.
+    """
+    rounds = start.round_number if start is not None else 0
+    for rounds in iter_battle_rounds(team1, team2, rng, grid=grid, start=start, to_completion=to_completion):
+        pass
+
+    def dead_counts(team: Team) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for u in team.units:
+            if u.size < u.count:
+                counts[u.template.name] = counts.get(u.template.name, 0) + u.count - u.size
+        return counts
+
+    return BattleOutcome(
+        winner=winner_index(team1, team2),
+        survivors=(team1.alive_count, team2.alive_count),
+        casualties=(dead_counts(team1), dead_counts(team2)),
+        rounds=rounds,
+    )
+
+
+SIMULATION_ENGINES = ("scalar", "numpy", "exact")
+
+
+def _simulate_chunk(
+    team_specs: Tuple[Tuple[str, List[str]], ...],
+    count: int,
+    seed: int,
+    engine: str = "scalar",
+    battlefield: Optional[Dict[str, str]] = None,
+    record: Optional[Tuple[str, ...]] = None,
+    start: Optional[BattleSnapshot] = None,
+) -> Dict:
+    """Process-pool entry point: simulate ``count`` battles with one seed.
+
+    Teams travel as (name, unit specs) pairs so that only plain data is
+    pickled between processes.  The ``numpy`` engine hands the chunk to the
+    optional lockstep kernel in ``battle_vectorized``.  With ``record`` (the
+    unit types of an outcome store) every battle's outcome is also returned
+    under ``"outcomes"`` as the columns of ``battle_outcomes.OutcomeColumns``.
+    Every battle continues from ``start`` when one is given.
+    """
+    grid = BattleGrid.for_battlefield(battlefield)
+    to_completion = fights_to_completion(battlefield)
+    if engine == "numpy":
+        if grid is not None:
+            raise ValueError("The numpy engine does not model battlefield positioning.")
+        if to_completion:
+            raise ValueError("The numpy engine always fights three rounds.")
+        if record is not None:
+            raise ValueError("The numpy engine does not record individual outcomes.")
+        if start is not None:
+            raise ValueError("The numpy engine cannot continue from a snapshot.")
+        from battle_vectorized import simulate_chunk
+
+        return simulate_chunk(team_specs, count, seed)
+    rng = random.Random(seed)
+    teams = [Team(name=name, units=create_units_from_names(names)) for name, names in team_specs]
+    wins = [0, 0]
+    survivors = [0, 0]
+    casualties: List[Dict[str, int]] = [{}, {}]
+    outcomes = None
+    if record is not None:
+        from battle_outcomes import OutcomeColumns
+
+        outcomes = OutcomeColumns(team_specs, record)
+    for _ in range(count):
+        outcome = simulate_battle(teams[0], teams[1], rng, grid, start, to_completion)
+        wins[outcome.winner] += 1
+        for side in (0, 1):
+            survivors[side] += outcome.survivors[side]
+            for name, num in outcome.casualties[side].items():
+                casualties[side][name] = casualties[side].get(name, 0) + num
+        if outcomes is not None:
+            outcomes.add(teams, outcome.winner, outcome.rounds)
+    part = {"battles": count, "wins": wins, "survivors": survivors, "casualties": casualties}
+    if outcomes is not None:
+        part["outcomes"] = outcomes.columns
+    return part
+
+
+def wilson_interval(successes: int, trials: int, confidence: float = 0.95) -> Tuple[float, float]:
+    """Wilson score interval for a binomial proportion."""
+    if trials == 0:
+        return 0.0, 1.0
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / trials
+    denom = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denom
+    half = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denom
+    return max(0.0, centre - half), min(1.0, centre + half)
+
+
+def simulate_many(
+    team1: Team,
+    team2: Team,
+    battlefield: Optional[Dict[str, str]] = None,
+    n: int = 1000,
+    workers: Optional[int] = None,
+    tolerance: Optional[float] = None,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    engine: str = "scalar",
+    record=None,
+    start: Optional[BattleSnapshot] = None,
+    state_budget: Optional[int] = None,
+) -> OddsResult:
+    """Estimate win probabilities by simulating up to ``n`` battles.
+
+    Battles are split into chunks and spread over a process pool of
+    ``workers`` processes (``None`` uses every CPU, ``1`` stays in-process).
+    When ``tolerance`` is given the run stops as soon as the half-width of
+    the confidence interval on the win rate drops below it.  The
+    battlefield only influences the rules when it enables positioning
+    (see ``BattleGrid``) or ``"fight_to_completion"``.  ``engine="numpy"``
+    resolves each chunk with the vectorized kernel from
+    ``battle_vectorized``, which models neither.  Passing a ``battle_outcomes.OutcomeWriter`` as ``record``
+    appends every simulated battle's outcome to its store.  With a
+    ``start`` snapshot of a battle between these teams, every battle is a
+    continuation forked from it, so late-round odds only pay for the rounds
+    left to play.
+
+    ``engine="exact"`` works the odds out exactly with ``battle_exact``
+    when the battle has at most ``state_budget`` states (its
+    ``DEFAULT_STATE_BUDGET`` by default) and can be solved in about the
+    time sampling would take, and samples ``n`` scalar battles otherwise.
+    """
+    if n <= 0:
+        raise ValueError("The number of battles must be positive.")
+    if engine not in SIMULATION_ENGINES:
+        raise ValueError(f"Unknown simulation engine '{engine}'.")
+    if engine == "numpy" and BattleGrid.for_battlefield(battlefield) is not None:
+        raise ValueError("The numpy engine does not model battlefield positioning.")
+    if engine == "numpy" and fights_to_completion(battlefield):
+        raise ValueError("The numpy engine always fights three rounds.")
+    if engine == "numpy" and record is not None:
+        raise ValueError("The numpy engine does not record individual outcomes.")
+    if engine == "numpy" and start is not None:
+        raise ValueError("The numpy engine cannot continue from a snapshot.")
+    if engine == "exact":
+        if record is not None:
+            raise ValueError("The exact engine does not record individual outcomes.")
+        from battle_exact import DEFAULT_STATE_BUDGET, StateBudgetExceeded, sampling_seconds, solve_battle
+
+        budget = DEFAULT_STATE_BUDGET if state_budget is None else state_budget
+        # Give the solver no longer than sampling would take
+        seconds = sampling_seconds(
+            team1, team2, battlefield, n, workers or os.cpu_count() or 1, start, tolerance
+        )
+        try:
+            return solve_battle(team1, team2, battlefield, start, budget, seconds).odds()
+        except StateBudgetExceeded:
+            # Too big to enumerate: sample it instead
+            engine = "scalar"
+    workers = workers or os.cpu_count() or 1
+    if chunk_size is None:
+        # Small enough chunks to stop early, large enough to amortise IPC
+        # (and, for the numpy engine, the per-round array overhead).
+        floor, ceiling = (1000, 20000) if engine == "numpy" else (25, 500)
+        chunk_size = max(floor, min(ceiling, n // (workers * 8) or 1))
+    team_specs = tuple(
+        (team.name, [u.spec for u in team.units]) for team in (team1, team2)
+    )
+    unit_types = None
+    if record is not None:
+        record.register(team_specs)
+        unit_types = tuple(record.unit_types)
+    seeder = random.Random(seed)
+    chunks: List[int] = []
+    remaining = n
+    while remaining > 0:
+        chunks.append(min(chunk_size, remaining))
+        remaining -= chunks[-1]
+
+    totals: Dict = {"battles": 0, "wins": [0, 0], "survivors": [0, 0], "casualties": [{}, {}]}
+
+    def merge(part: Dict) -> None:
+        if record is not None:
+            record.extend(part["outcomes"])
+        totals["battles"] += part["battles"]
+        for side in (0, 1):
+            totals["wins"][side] += part["wins"][side]
+            totals["survivors"][side] += part["survivors"][side]
+            for name, num in part["casualties"][side].items():
+                totals["casualties"][side][name] = totals["casualties"][side].get(name, 0) + num
+
+    def precise_enough() -> bool:
+        if tolerance is None or totals["battles"] < 30:
+            return False
+        low, high = wilson_interval(totals["wins"][0], totals["battles"], confidence)
+        return (high - low) / 2 <= tolerance
+
+    stopped_early = False
+    if workers <= 1:
+        for count in chunks:
+            merge(
+                _simulate_chunk(team_specs, count, seeder.getrandbits(64), engine, battlefield, unit_types, start)
+            )
+            if precise_enough():
+                stopped_early = totals["battles"] < n
+                break
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            queue = list(chunks)
+            while queue or pending:
+                # Keep a bounded number of chunks in flight so early stopping
+                # does not leave a long tail of wasted work behind it.
+                while queue and len(pending) < workers * 2:
+                    pending.add(
+                        pool.submit(
+                            _simulate_chunk,
+                            team_specs,
+                            queue.pop(),
+                            seeder.getrandbits(64),
+                            engine,
+                            battlefield,
+                            unit_types,
+                            start,
+                        )
+                    )
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    merge(future.result())
+                if precise_enough():
+                    stopped_early = totals["battles"] < n
+                    for future in pending:
+                        future.cancel()
+                    break
+
+    battles = totals["battles"]
+    wins = (totals["wins"][0], totals["wins"][1])
+
+    def casualty_rates(team: Team, dead: Dict[str, int]) -> Dict[str, float]:
+        fielded: Dict[str, int] = {}
+        for u in team.units:
+            fielded[u.template.name] = fielded.get(u.template.name, 0) + u.count
+        return {name: dead.get(name, 0) / (num * battles) for name, num in fielded.items()}
+
+    return OddsResult(
+        team_names=(team1.name, team2.name),
+        battles=battles,
+        wins=wins,
+        win_rates=(wins[0] / battles, wins[1] / battles),
+        confidence=confidence,
+        confidence_intervals=(
+            wilson_interval(wins[0], battles, confidence),
+            wilson_interval(wins[1], battles, confidence),
+        ),
+        mean_survivors=(totals["survivors"][0] / battles, totals["survivors"][1] / battles),
+        casualty_rates=(
+            casualty_rates(team1, totals["casualties"][0]),
+            casualty_rates(team2, totals["casualties"][1]),
+        ),
+        stopped_early=stopped_early,
+    )
+
+
+def format_odds_report(result: OddsResult) -> str:
+    """Render an ``OddsResult`` as a short Markdown summary."""
+    lines = [f"# Odds: {result.team_names[0]} vs {result.team_names[1]}"]
+    if result.states:
+        lines.append(f"Exact solution over {result.states} states")
+    else:
+        note = " (stopped early)" if result.stopped_early else ""
+        lines.append(f"Simulated battles: {result.battles}{note}")
+    level = f"{result.confidence * 100:.0f}%"
+    for side in (0, 1):
+        low, high = result.confidence_intervals[side]
+        interval = "" if result.states else f" ({level} CI {low * 100:.1f}–{high * 100:.1f}%)"
+        lines.append(
+            f"* {result.team_names[side]}: {result.win_rates[side] * 100:.1f}% win chance{interval}, "
+            f"{result.mean_survivors[side]:.2f} survivors on average"
+        )
+        rates = ", ".join(
+            f"{name} {rate * 100:.0f}%" for name, rate in result.casualty_rates[side].items()
+        )
+        lines.append(f"  Casualty rates: {rates}")
+    return "\n".join(lines)
+
+
+###############################################################################
+# Analytical odds
+###############################################################################
+
+# Slices each round is split into by ``estimate_odds``; both sides firing a
+# slice at a time stands in for the shuffled order units act in.
+ESTIMATE_STEPS = 1
+# Scale from the summed per-model survival variance to the spread of the
+# final survivor margin, and the 95th percentile of |estimated - simulated|
+# win rate over 125 calibration matchups (the mean error is about 5 points);
+# both from ``benchmarks/bench_estimator.py``.
+ESTIMATE_SPREAD = 0.9
+ESTIMATE_ERROR_BOUND = 0.19
+
+# Round-one effects of leader abilities, mirroring their handlers above:
+# accuracy multipliers on the shared context and (own, enemy) morale shifts.
+OPENING_ACCURACY = {"fear_aura": 0.85, "tactical_boost": 1.15}
+OPENING_MORALE = {"inspires_rebels": (0.2, 0.0), "morale_break": (0.0, -0.2)}
+
+
+@dataclass(frozen=True)
+class OddsEstimate:
+    """Closed-form win probabilities from ``estimate_odds``."""
+
+    team_names: Tuple[str, str]
+    win_rates: Tuple[float, float]
+    expected_survivors: Tuple[float, float]
+    error_bound: float = ESTIMATE_ERROR_BOUND
+
+    def as_dict(self) -> Dict:
+        return {
+            "team_names": list(self.team_names),
+            "win_rates": [round(rate, 4) for rate in self.win_rates],
+            "expected_survivors": [round(count, 2) for count in self.expected_survivors],
+            "error_bound": self.error_bound,
+        }
+
+
+@dataclass(eq=False)
+class _OddsGroup:
+    """The models of one unit type on one side, as expected values.
+
+    Single units spread the hits they take, so each cohort (the models
+    fielded together, or raised together) tracks the expected hits per
+    model, the sum of squared per-attack hit chances (which fixes the
+    variance of the hit count) and the first two moments of the damage per
+    hit.  A model is alive while a binomial number of hits with that mean
+    and variance, whose summed damage is taken as normal, stays below its
+    health.  A squad's hits all land on its front
+    model, so each squad simply loses a model per ``ceil(health / damage)``
+    hits (its ``wear``), less the wound left on the front model at the end.
+    Models a squad raises come back weakened (``frail``) and fall faster.
+    """
+
+    template: UnitType
+    names: Tuple[str, ...]
+    modifiers: Tuple[AttackModifier, ...]
+    morale_bonus: float  # per attack, from synergies
+    squad: bool
+    base_hit: float = 0.0
+    death_morale: float = 0.0  # own morale shift per model lost
+    kill_morale: float = 0.0  # enemy morale shift per kill (dark_presence)
+    fielded: float = 0.0
+    models: float = 0.0  # squads only, fielded plus raised
+    wear: float = 0.0  # squads only, killing blows' worth of hits taken
+    entries: int = 0  # roster entries; a squad's round-start abilities fire once per entry
+    # Squads only: (models, share of health, wear so far) per raised batch
+    frail: List[Tuple[float, float, float]] = field(default_factory=list)
+    # [models, hits per model, damage per model, squared damage per model, health,
+    #  squared hit chances per model]
+    cohorts: List[List[float]] = field(default_factory=list)
+    _alive: Optional[float] = field(default=None, repr=False)
+
+    def alive(self) -> float:
+        """Expected living models (cached until the group takes fire or is raised)."""
+        if self.squad:
+            if self.wear <= 0:
+                return self.models
+            wear = self.wear
+            for models, share, before in self.frail:
+                # Raised models come back weakened and stand at the front, so the
+                # hits since take them down 1/share times as fast until they are gone
+                wear += min((self.wear - before) / share, models) - min(self.wear - before, models * share)
+            # E[floor(hits / needed)] per squad: the last partial kill is only a wound
+            wear /= self.entries
+            return max(self.models - self.entries * (wear - 0.5 * (1.0 - math.exp(-2.0 * wear))), 0.0)
+        if self._alive is not None:
+            return self._alive
+        total = 0.0
+        for models, hits, damage, squares, health, chances in self.cohorts:
+            if hits <= 0:
+                total += models
+                continue
+            mean = damage / hits
+            # Hits ~ binomial(trials, chance) matching the mean and variance
+            chance = min(chances / hits, 0.95)
+            trials = hits / chance
+            odds = chance / (1.0 - chance)
+            # Sum over k of P(k hits) * P(k hits deal less than ``health``)
+            term = survival = math.exp(trials * math.log1p(-chance))
+            scale = 1.0 / math.sqrt(2.0 * max(squares / hits - mean * mean, 1e-9))
+            margin = health - 0.5
+            for k in range(1, 64):
+                if k > trials + 1.0:
+                    break
+                term *= (trials - k + 1.0) / k * odds
+                z = (margin - k * mean) * scale * _ROOT_RECIPROCALS[k]
+                if z > 3.0:
+                    survival += term
+                    continue
+                if z < -2.7 or (term < 1e-4 and k > hits):
+                    break
+                survival += term * 0.5 * (1.0 + math.erf(z))
+            total += models * min(survival, 1.0)
+        self._alive = total
+        return total
+
+    def acting(self, alive: float) -> float:
+        """Expected number of units that trigger a round-start ability."""
+        return min(self.entries, alive) if self.squad else alive
+
+    def health_left(self, alive: float) -> float:
+        """Expected health of the ``alive`` models still standing."""
+        if self.squad:
+            return alive * self.template.health
+        standing = sum(cohort[0] * cohort[4] for cohort in self.cohorts)
+        absorbed = sum(cohort[0] * cohort[2] for cohort in self.cohorts)
+        # Survivors carry their share of the damage that did not kill
+        fielded = sum(cohort[0] for cohort in self.cohorts)
+        return max(alive / fielded * (standing - absorbed), 0.0) if fielded else 0.0
+
+    def take_fire(self, fire: List[float], alive: float) -> None:
+        """Spread one slice of incoming ``[hits, damage, squared damage, squad kills, chances]``.
+
+        The last entry is already per model: the squared chance that each
+        attack lands on any one model.
+        """
+        if self.squad:
+            self.wear += fire[3]
+            return
+        self._alive = None
+        for cohort in self.cohorts:
+            cohort[1] += fire[0] / alive
+            cohort[2] += fire[1] / alive
+            cohort[3] += fire[2] / alive
+            cohort[5] += fire[4]
+
+    def raise_fallen(self, models: float, divisor: int) -> None:
+        """Bring ``models`` fallen models back with 1/``divisor`` of their health."""
+        self.fielded += models
+        health = max(1, self.template.health // divisor)
+        if self.squad:
+            # A model raised into a wiped-out squad has just ``health``; one joining
+            # a standing squad replaces the front model's wound with its own
+            # (see ``Squad.revive_model``), which with that wound taken as uniform
+            # leaves it worth ``share + (1 - share**2) / 2`` of a fresh model
+            share = health / self.template.health
+            self.models += models
+            self.frail.append((models, share + (1.0 - share * share) / 2, self.wear))
+            return
+        if self._alive is not None:
+            self._alive += models
+        last = self.cohorts[-1]
+        if last[1] == 0 and last[4] == health:
+            # Nothing has hit the last raised cohort yet, so it simply grows
+            last[0] += models
+        else:
+            self.cohorts.append([models, 0.0, 0.0, 0.0, health, 0.0])
+
+
+_ROOT_RECIPROCALS = [0.0] + [1.0 / math.sqrt(k) for k in range(1, 64)]
+
+
+def _odds_groups(team: Team) -> List[_OddsGroup]:
+    groups: Dict[Tuple[str, bool], _OddsGroup] = {}
+    for unit in team.units:
+        squad = isinstance(unit, Squad)
+        group = groups.get((unit.template.name, squad))
+        if group is None:
+            template = unit.template
+            names = ([template.leader_ability] if template.leader_ability else []) + list(template.abilities)
+            handlers = [ABILITY_REGISTRY.get(name, {}).get(ON_ATTACK) for name in names]
+            group = groups[template.name, squad] = _OddsGroup(
+                template=template,
+                names=tuple(names),
+                modifiers=tuple(h for h in handlers if isinstance(h, AttackModifier)),
+                morale_bonus=sum(m for key, m in team.active_synergies(template) if key == "morale_bonus"),
+                squad=squad,
+                base_hit=0.6 + 0.1 * (template.damage / 30),
+                death_morale=(-0.3 if template.role == "Leader" else -0.05)
+                + (TACTICAL_INSIGHT_MORALE if "tactical_insight" in names else 0.0),
+                kill_morale=DARK_PRESENCE_MORALE if "dark_presence" in names else 0.0,
+            )
+            if not squad:
+                group.cohorts.append([0.0, 0.0, 0.0, 0.0, template.health, 0.0])
+        group.fielded += unit.count
+        group.entries += 1
+        group._alive = None
+        if squad:
+            group.models += unit.size
+        else:
+            group.cohorts[0][0] += unit.size
+    return list(groups.values())
+
+
+def _clamp_morale(morale: float) -> float:
+    return min(max(morale, 0.1), 2.0)
+
+
+def _normal_above(mean: float, spread: float) -> float:
+    """P(X > 0) for X normal with ``mean`` and standard deviation ``spread``."""
+    if spread <= 1e-9:
+        return 1.0 if mean > 0 else 0.0 if mean < 0 else 0.5
+    return 0.5 * (1.0 + math.erf(mean / (spread * math.sqrt(2.0))))
+
+
+def _raise_fallen(
+    groups: List[_OddsGroup], alive: List[float], raised: float, divisor: int, exclude: Optional[List[float]] = None
+) -> None:
+    """Return fallen models to ``raised`` casters, drawn in proportion to the fallen.
+
+    A caster only finds someone to raise if anyone has fallen, so with ``F``
+    expected fallen the ``raised`` casters bring back ``raised * (1 -
+    exp(-F / max(raised, 1)))`` models: a smooth ``min(raised, F)`` that
+    for a fraction of a caster is that fraction times P(anyone fell).  ``exclude``
+    holds, per group, fallen models that cannot be picked (the casters
+    themselves).
+    """
+    fallen = [g.fielded - a for g, a in zip(groups, alive)]
+    if exclude is not None:
+        fallen = [max(lost - skip, 0.0) for lost, skip in zip(fallen, exclude)]
+    total = sum(fallen)
+    if raised <= 0 or total <= 1e-9:
+        return
+    share = raised * -math.expm1(-total / max(raised, 1.0)) / total
+    for g, lost in zip(groups, fallen):
+        if lost > 0:
+            g.raise_fallen(lost * share, divisor)
+
+
+def estimate_odds(team1: Team, team2: Team, rounds: int = 3, steps: int = ESTIMATE_STEPS) -> OddsEstimate:
+    """Estimate win probabilities without simulating, in the spirit of Lanchester's laws.
+
+    Each side is reduced to expected model counts per unit type (see
+    ``_OddsGroup``).  Every slice of a round both sides fire at once: a
+    type's expected hits follow ``hit_chance`` (with round-one leader
+    accuracy and attack abilities) and ``attack_damage`` (with morale), and
+    are spread over the enemy types by living models.  Morale, opening
+    leader abilities, Talzin's revivals and the kill and death abilities
+    move the same expected quantities the simulator moves.  The survivor
+    margin is taken as normal, with a variance from the per-model survival
+    odds, and a level margin goes to the side expected to keep more health.
+    It takes one pass over the units and then well under a millisecond for
+    a handful of unit types, however large the armies, but it is an
+    approximation: ``error_bound`` is its calibrated error against
+    ``simulate_many``, and battlefield positioning is not modelled.
+    """
+    sides = (_odds_groups(team1), _odds_groups(team2))
+    morale = [team1.morale, team2.morale]
+    accuracy = 1.0
+    for side, groups in enumerate(sides):
+        for group in groups:
+            for name in group.names:
+                if name not in OPENING_ACCURACY and name not in OPENING_MORALE:
+                    continue
+                for _ in range(round(group.acting(group.alive()))):
+                    accuracy *= OPENING_ACCURACY.get(name, 1.0)
+                    own, enemy = OPENING_MORALE.get(name, (0.0, 0.0))
+                    morale[side] = _clamp_morale(morale[side] + own)
+                    morale[1 - side] = _clamp_morale(morale[1 - side] + enemy)
+    alive = ([g.alive() for g in sides[0]], [g.alive() for g in sides[1]])
+    damage_variance = [0.0, 0.0]  # of the damage each side takes
+    for round_number in range(1, rounds + 1):
+        if round_number >= 2:
+            for side, groups in enumerate(sides):
+                # Each living caster raises one fallen model at half health
+                casters = sum(g.acting(a) for g, a in zip(groups, alive[side]) if "revive" in g.names)
+                if casters:
+                    _raise_fallen(groups, alive[side], casters, 2)
+                    alive[side][:] = [g.alive() for g in groups]
+        volleys = []
+        for groups in sides:
+            volley = []
+            for g in groups:
+                hit_bonus, multiplier = 0.0, 1.0
+                for modifier in g.modifiers:
+                    if modifier.rounds is None or round_number in modifier.rounds:
+                        hit_bonus += modifier.hit_bonus
+                        multiplier *= modifier.damage_multiplier
+                volley.append((min(max(g.base_hit * accuracy + hit_bonus, 0.1), 0.95), g.template.damage * multiplier))
+            volleys.append(volley)
+        for _ in range(steps):
+            shift = [0.0, 0.0]
+            incoming = []
+            for side in (0, 1):
+                enemies, living, targets = sides[1 - side], alive[1 - side], sum(alive[1 - side])
+                fire = [[0.0, 0.0, 0.0, 0.0, 0.0] for _ in enemies]  # see _OddsGroup.take_fire
+                incoming.append(fire)
+                if targets <= 1e-9:
+                    continue
+                boost = 1.0 + 0.2 * (morale[side] - 1.0)
+                for g, (chance, strength), attackers in zip(sides[side], volleys[side], alive[side]):
+                    damage = int(strength * boost)
+                    if attackers <= 0 or damage <= 0:
+                        continue
+                    attacks = attackers / steps
+                    share = attacks * chance / targets
+                    spread = share * chance / targets
+                    # Every attack lands somewhere, so only its own hit or miss varies the total
+                    damage_variance[1 - side] += attacks * chance * (1.0 - chance) * damage * damage
+                    for enemy, lives, totals in zip(enemies, living, fire):
+                        hits = share * lives
+                        totals[0] += hits
+                        totals[1] += hits * damage
+                        totals[2] += hits * damage * damage
+                        totals[3] += hits / -(-enemy.template.health // damage)
+                        totals[4] += spread
+                    shift[side] += (0.02 + g.morale_bonus) * attacks
+            for side, groups in enumerate(sides):
+                before = alive[side]
+                for g, fire, living in zip(groups, incoming[1 - side], before):
+                    if fire[0] > 0 and living > 1e-9:
+                        g.take_fire(fire, living)
+                after = [g.alive() for g in groups]
+                losses = [max(was - now, 0.0) for was, now in zip(before, after)]
+                lost = sum(losses)
+                if lost <= 0:
+                    continue
+                # Killing blows lift no morale on the attacking side
+                shift[1 - side] -= 0.02 * lost
+                shift[side] += sum(g.death_morale * n for g, n in zip(groups, losses))
+                killers = sum(g.kill_morale * a for g, a in zip(sides[1 - side], alive[1 - side]))
+                shift[side] += killers * lost / max(sum(alive[1 - side]), 1e-9)
+                casters = [n if "resurrection" in g.names else 0.0 for g, n in zip(groups, losses)]
+                raised = sum(casters)
+                if raised:
+                    # A fallen caster is never raised, nor is any model of a caster squad
+                    exclude = [g.fielded - a if n and g.squad else n for g, a, n in zip(groups, after, casters)]
+                    _raise_fallen(groups, after, raised, RESURRECTION_HEALTH_DIVISOR, exclude)
+                    after = [g.alive() for g in groups]
+                alive[side][:] = after
+            for side in (0, 1):
+                morale[side] = _clamp_morale(morale[side] + shift[side])
+    survivors = (sum(alive[0]), sum(alive[1]))
+    # Each model's survival is roughly an independent Bernoulli draw, so the
+    # survivor margin is near normal; an equal count goes to the healthier side
+    variance = sum(
+        a * (1.0 - min(a / g.fielded, 1.0)) for groups, side_alive in zip(sides, alive) for g, a in zip(groups, side_alive)
+    )
+    margin = survivors[0] - survivors[1]
+    spread = ESTIMATE_SPREAD * math.sqrt(variance)
+    health = [sum(g.health_left(a) for g, a in zip(groups, side_alive)) for groups, side_alive in zip(sides, alive)]
+    health_spread = math.sqrt(damage_variance[0] + damage_variance[1])
+    first = _normal_above(margin - 0.5, spread)
+    first += (_normal_above(margin + 0.5, spread) - first) * _normal_above(health[0] - health[1], health_spread)
+    return OddsEstimate(
+        team_names=(team1.name, team2.name),
+        win_rates=(first, 1.0 - first),
+        expected_survivors=survivors,
+    )
+
+
+def roster_odds(team_specs: Tuple[Tuple[str, Tuple[str, ...]], ...]) -> OddsEstimate:
+    """``estimate_odds`` for two (name, unit specs) pairs, memoised.
+
+    Reports keep re-rendering the same matchups with new seeds, so after the
+    first one the pre-battle odds cost a dictionary lookup.  Entries are
+    keyed on ``UNIT_DATABASE.version`` too, so loading a roster that
+    changes a unit's stats never serves odds worked out with the old ones.
+    """
+    return _roster_odds(team_specs, UNIT_DATABASE.version)
+
+
+@lru_cache(maxsize=1024)
+def _roster_odds(team_specs: Tuple[Tuple[str, Tuple[str, ...]], ...], database_version: int) -> OddsEstimate:
+    team1, team2 = (Team(name=name, units=create_units_from_names(list(specs))) for name, specs in team_specs)
+    return estimate_odds(team1, team2)
+
+
+def format_odds_estimate(odds: Dict) -> str:
+    """One line summarising ``OddsEstimate.as_dict()``, e.g. a report's ``odds``."""
+    (name1, name2), (rate1, rate2) = odds["team_names"], odds["win_rates"]
+    survivors1, survivors2 = odds["expected_survivors"]
+    return (
+        f"Estimated odds: {name1} {rate1 * 100:.0f}%, {name2} {rate2 * 100:.0f}% "
+        f"(±{odds['error_bound'] * 100:.0f} pts); expected survivors {survivors1:.1f} vs {survivors2:.1f}."
+    )
+
+
+###############################################################################
+# Report cache
+###############################################################################
+
+def report_cache_key(
+    team1: Team,
+    team2: Team,
+    battlefield: Dict[str, str],
+    budget: Optional[int] = None,
+    seed: Optional[int] = None,
+    format: str = "markdown",
+) -> str:
+    """Content address of a battle report.
+
+    The key hashes a canonical form of the matchup: team names with their
+    sorted unit specs, the battlefield, the budget, the seed (``"*"`` for
+    "any sample"), the report format and ``ENGINE_VERSION``, so rule
+    changes never serve stale reports.
+    """
+    canonical = {
+        "engine": ENGINE_VERSION,
+        "format": format,
+        "teams": [[t.name, sorted(u.spec for u in t.units)] for t in (team1, team2)],
+        "battlefield": battlefield,
+        "budget": budget,
+        "seed": "*" if seed is None else seed,
+    }
+    payload = json.dumps(canonical, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ReportCache:
+    """Two-tier cache of rendered reports keyed by ``report_cache_key``.
+
+    The memory tier is an LRU bounded to ``max_entries`` reports.  When a
+    ``directory`` is given, reports are also written there as small JSON
+    files; entries older than ``ttl`` seconds are treated as misses and
+    removed.  ``stats`` reports hits per tier, misses and evictions.
+    """
+
+    def __init__(self, max_entries: int = 256, directory: Optional[str] = None, ttl: Optional[float] = None) -> None:
+        self.max_entries = max_entries
+        self.directory = directory
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[int, str]]" = OrderedDict()
+        self._puts = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _expired(self, path: str) -> bool:
+        return self.ttl is not None and time.time() - os.path.getmtime(path) > self.ttl
+
+    def _remember(self, key: str, entry: Tuple[int, str]) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key: str) -> Optional[Tuple[int, str]]:
+        """Return ``(seed, report)`` for ``key`` or None on a miss."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.memory_hits += 1
+            return entry
+        if self.directory:
+            path = self._path(key)
+            try:
+                if self._expired(path):
+                    os.remove(path)
+                    self.evictions += 1
+                else:
+                    with open(path, "r", encoding="utf-8") as f:
+                        data = json.load(f)
+                    entry = (data["seed"], data["report"])
+            except (OSError, ValueError, KeyError):
+                entry = None
+            if entry is not None:
+                self.disk_hits += 1
+                self._remember(key, entry)
+                return entry
+        self.misses += 1
+        return None
+
+    def put(self, key: str, seed: int, report: str) -> None:
+        self._remember(key, (seed, report))
+        if not self.directory:
+            return
+        # Write then rename so concurrent readers never see half a file
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"seed": seed, "report": report}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+        self._puts += 1
+        if self.ttl is not None and self._puts % 100 == 0:
+            self.prune()
+
+    def prune(self) -> int:
+        """Delete expired disk entries and return how many were removed."""
+        if not self.directory or self.ttl is None:
+            return 0
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith(".json") and self._expired(path):
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                continue
+        self.evictions += removed
+        return removed
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+def iter_cached_battle_report(
+    cache: ReportCache,
+    team1: Team,
+    team2: Team,
+    battlefield: Dict[str, str],
+    budget: Optional[int] = None,
+    seed: Optional[int] = None,
+    any_sample: bool = False,
+    on_seed=None,
+    format: str = "markdown",
+) -> Iterator[str]:
+    """``iter_battle_report`` with a cache in front of it.
+
+    Seeded battles are looked up by their exact key.  Unseeded battles are
+    simulated afresh as before, unless ``any_sample`` is set: then any
+    previously cached report for the matchup is acceptable.  A hit is
+    yielded as a single section.  ``on_seed`` is called with the seed of
+    the report actually served.
+    """
+    keys: List[str] = []
+    if seed is not None:
+        keys.append(report_cache_key(team1, team2, battlefield, budget, seed, format))
+    elif any_sample:
+        keys.append(report_cache_key(team1, team2, battlefield, budget, None, format))
+    if keys:
+        hit = cache.get(keys[0])
+        if hit is not None:
+            if on_seed is not None:
+                on_seed(hit[0])
+            yield hit[1]
+            return
+    log = new_battle_log(team1, team2, battlefield, budget, seed)
+    if on_seed is not None:
+        on_seed(log.seed)
+    sections: List[str] = []
+    for section in iter_battle_report(team1, team2, battlefield, log=log, format=format):
+        sections.append(section)
+        yield section
+    report = REPORT_SEPARATOR.join(sections)
+    # A fresh sample can also answer later seeded requests for the same seed
+    keys.append(report_cache_key(team1, team2, battlefield, budget, log.seed, format))
+    for key in dict.fromkeys(keys):
+        cache.put(key, log.seed, report)
+
+
+###############################################################################
+# Configuration loading
+###############################################################################
+
+def parse_battle_config(data: Dict) -> Tuple[Team, Team, Dict[str, str], Optional[int]]:
+    """Build Team objects from an already decoded battle configuration."""
+    # Budget
+    budget = data.get("budget")
+    # Teams
+    teams = data["teams"]
+    if len(teams) != 2:
+        raise ValueError("Exactly two teams must be specified in the configuration.")
+    team_objs: List[Team] = []
+    for t in teams:
+        name = t.get("name") or f"Team {len(team_objs) + 1}"
+        units = create_units_from_names(t["units"])
+        team_objs.append(Team(name=name, units=units))
+    # Battlefield
+    battlefield = data.get("battlefield") or pick_random_battlefield()
+    return team_objs[0], team_objs[1], battlefield, budget
+
+
+def load_battle_config(path: str) -> Tuple[Team, Team, Dict[str, str], Optional[int]]:
+    """Load a JSON battle configuration file and produce Team objects.
+
+    A path of ``-`` reads the configuration from standard input, which is
+    how ``cinematic_server.js`` hands over the request body.
+    """
+    if path == "-":
+        data = json.load(sys.stdin)
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    return parse_battle_config(data)
+
+
+###############################################################################
+# Worker mode
+###############################################################################
+
+def worker_responses(
+    line: str, cache: Optional[ReportCache] = None, defaults: Optional[Dict] = None
+) -> Iterator[Dict]:
+    """Process one JSON-lines request and yield its response objects.
+
+    The request is a battle configuration in the ``load_battle_config``
+    format, optionally carrying an ``id`` that is echoed back so the caller
+    can match responses to requests and a ``seed`` for a reproducible
+    battle.  Normally a single ``{"id", "ok", "seed", "report"}`` object is
+    produced.  With ``"stream": true`` the report is instead sent as
+    ``{"id", "chunk"}`` objects, one per section as soon as it is ready
+    (concatenating the chunks gives the report), followed by a closing
+    ``{"id", "ok", "seed", "done"}``.  Failures end with
+    ``{"id", "ok": false, "error"}``.
+
+    With a ``cache``, seeded requests and requests marked
+    ``"any_sample": true`` may be answered from it, and ``{"op": "stats"}``
+    returns the cache statistics.  ``"profile": true`` adds a ``profile``
+    object (``BattleProfile.as_dict``) to the final response; profiled
+    requests always simulate so the numbers describe the engine.
+    ``"format"`` picks one of ``REPORT_FORMATS``; a ``"json"`` report is the
+    structured battle document encoded as a string.  Keys missing from the
+    request are taken from ``defaults``.
+    """
+    request_id = None
+    try:
+        data = json.loads(line)
+        if not isinstance(data, dict):
+            raise ValueError("Request must be a JSON object.")
+        if defaults:
+            data = {**defaults, **data}
+        request_id = data.get("id")
+        if data.get("op") == "stats":
+            yield {"id": request_id, "ok": True, "stats": cache.stats() if cache else {}}
+            return
+        profile = BattleProfile() if data.get("profile") else None
+        report_format = data.get("format") or "markdown"
+        if report_format not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report format '{report_format}'.")
+        with profile.measure() if profile is not None else nullcontext():
+            with profile.phase("config") if profile is not None else nullcontext():
+                team1, team2, battlefield, budget = parse_battle_config(data)
+            used_seed: List[int] = []
+            if cache is not None and profile is None:
+                sections = iter_cached_battle_report(
+                    cache,
+                    team1,
+                    team2,
+                    battlefield,
+                    budget,
+                    data.get("seed"),
+                    any_sample=bool(data.get("any_sample")),
+                    on_seed=used_seed.append,
+                    format=report_format,
+                )
+            else:
+                log = new_battle_log(team1, team2, battlefield, budget, data.get("seed"))
+                used_seed.append(log.seed)
+                sections = iter_battle_report(
+                    team1, team2, battlefield, log=log, profile=profile, format=report_format
+                )
+            if data.get("stream"):
+                for index, section in enumerate(sections):
+                    chunk = section if index == 0 else REPORT_SEPARATOR + section
+                    yield {"id": request_id, "chunk": chunk}
+                response = {"id": request_id, "ok": True, "seed": used_seed[0], "done": True}
+            else:
+                report = REPORT_SEPARATOR.join(sections)
+                response = {"id": request_id, "ok": True, "seed": used_seed[0], "report": report}
+        if profile is not None:
+            response["profile"] = profile.as_dict()
+    except Exception as e:
+        yield {"id": request_id, "ok": False, "error": str(e)}
+        return
+    yield response
+
+
+def serve(stdin=None, stdout=None, cache: Optional[ReportCache] = None) -> int:
+    """Run as a long-lived worker speaking JSON lines over stdin/stdout.
+
+    Each input line holds one battle configuration; each output line holds
+    one response object (see ``worker_responses``).  Reports are JSON
+    encoded so embedded newlines never break the framing, and every line is
+    flushed at once so streamed chunks reach the caller immediately.  The
+    worker exits cleanly at EOF.  A ``cache`` lives for the whole session.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    for line in stdin:
+        if not line.strip():
+            continue
+        for response in worker_responses(line, cache):
+            stdout.write(json.dumps(response, ensure_ascii=False) + "\n")
+            stdout.flush()
+    return 0
+
+
+###############################################################################
+# HTTP mode
+###############################################################################
+
+HTTP_MAX_BODY = 1024 * 1024
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+# Per-process report cache of the HTTP mode's pool workers
+_POOL_CACHE: Optional[ReportCache] = None
+
+
+def _init_pool_worker(cache_size: int, cache_dir: Optional[str], cache_ttl: Optional[float]) -> None:
+    global _POOL_CACHE
+    if cache_size > 0:
+        _POOL_CACHE = ReportCache(cache_size, cache_dir, cache_ttl)
+
+
+def _render_request(line: str) -> Dict:
+    """Pool entry point: answer one request exactly as a ``--serve`` worker would."""
+    response: Dict = {}
+    for response in worker_responses(line, _POOL_CACHE):
+        pass
+    return response
+
+
+def request_key(data: Dict) -> str:
+    """Identity of a ``/cinematic`` request for coalescing.
+
+    Only what shapes the report counts; ids and transport flags do not.
+    """
+    canonical = {key: data.get(key) for key in ("teams", "battlefield", "budget", "seed", "any_sample", "format")}
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class CinematicServer:
+    """Standard-library asyncio HTTP front end for report generation.
+
+    ``POST /cinematic`` takes the same JSON body as ``cinematic_server.js``
+    and answers with the report as ``text/plain`` (``text/html`` or
+    ``application/json`` when the body asks for that ``"format"``), or a
+    500 with the error text.  Reports are produced on a process pool of ``workers`` processes;
+    at most ``queue_limit`` further computations may wait for a free
+    worker, and any request beyond that is refused at once with ``503`` and
+    a ``Retry-After`` estimated from recent latencies.  Requests identical
+    in everything that shapes the report (see ``request_key``) that arrive
+    while one is being computed share its result instead of queueing
+    again; without a seed they therefore share one freshly sampled battle.
+    ``GET /stats`` reports queue depth, latency percentiles and throughput.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        queue_limit: int = 32,
+        cache_size: int = 256,
+        cache_dir: Optional[str] = None,
+        cache_ttl: Optional[float] = None,
+    ) -> None:
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_limit = queue_limit
+        self._pool_args = (cache_size, cache_dir, cache_ttl)
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.inflight: Dict[str, asyncio.Future] = {}
+        self.started = time.monotonic()
+        self.counters = dict.fromkeys(("requests", "completed", "failed", "rejected", "coalesced"), 0)
+        self.latencies: deque = deque(maxlen=1000)
+        self.finished_at: deque = deque()
+
+    @property
+    def queued(self) -> int:
+        return max(0, len(self.inflight) - self.workers)
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        while self.finished_at and now - self.finished_at[0] > 60:
+            self.finished_at.popleft()
+        ordered = sorted(self.latencies)
+
+        def percentile(q: float) -> Optional[float]:
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+        window = min(60.0, now - self.started) or 1.0
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": min(len(self.inflight), self.workers),
+            "queued": self.queued,
+            **self.counters,
+            "latency_ms": {
+                "mean": round(statistics.fmean(ordered) * 1000, 2) if ordered else None,
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "max": percentile(1.0),
+            },
+            "throughput_per_s": round(len(self.finished_at) / window, 3),
+            "uptime_s": round(now - self.started, 1),
+        }
+
+    def retry_after(self) -> int:
+        """Seconds until a queue slot is likely to free up."""
+        mean = statistics.fmean(self.latencies) if self.latencies else 1.0
+        return max(1, math.ceil(mean * (self.queued + 1) / self.workers))
+
+    async def cinematic(self, body: bytes) -> Tuple[int, Dict[str, str], bytes]:
+        try:
+            data = json.loads(body or b"{}")
+            if not isinstance(data, dict):
+                raise ValueError("Request must be a JSON object.")
+        except ValueError as e:
+            return 400, {}, f"Invalid request: {e}".encode("utf-8")
+        key = request_key(data)
+        future = self.inflight.get(key)
+        if future is not None:
+            self.counters["coalesced"] += 1
+        elif len(self.inflight) >= self.workers + self.queue_limit:
+            self.counters["rejected"] += 1
+            return 503, {"Retry-After": str(self.retry_after())}, b"Server busy, please retry."
+        else:
+            future = asyncio.get_running_loop().run_in_executor(
+                self.pool, _render_request, json.dumps({**data, "stream": False, "profile": False})
+            )
+            self.inflight[key] = future
+            future.add_done_callback(lambda _f, key=key: self.inflight.pop(key, None))
+        started = time.monotonic()
+        try:
+            result = await asyncio.shield(future)
+        except Exception as e:
+            result = {"ok": False, "error": str(e)}
+        self.latencies.append(time.monotonic() - started)
+        self.finished_at.append(time.monotonic())
+        if not result.get("ok"):
+            self.counters["failed"] += 1
+            return 500, {}, (result.get("error") or "AI failed").encode("utf-8")
+        self.counters["completed"] += 1
+        headers = {
+            "Content-Type": REPORT_CONTENT_TYPES[data.get("format") or "markdown"],
+            "X-Battle-Seed": str(result["seed"]),
+        }
+        return 200, headers, result["report"].encode("utf-8")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        status, headers, payload, content_type = 500, {}, b"", "text/plain; charset=utf-8"
+        try:
+            request_line = (await reader.readline()).decode("latin-1").split()
+            if len(request_line) != 3:
+                return
+            method, target, _version = request_line
+            length = 0
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                if name.strip().lower() == "content-length":
+                    length = int(value.strip() or 0)
+            path = target.split("?", 1)[0]
+            self.counters["requests"] += 1
+            if path == "/stats":
+                if method != "GET":
+                    status, payload = 405, b"Use GET."
+                else:
+                    status, content_type = 200, "application/json"
+                    payload = json.dumps(self.stats()).encode("utf-8")
+            elif path == "/cinematic":
+                if method != "POST":
+                    status, payload = 405, b"Use POST."
+                elif length > HTTP_MAX_BODY:
+                    status, payload = 413, b"Request body too large."
+                else:
+                    body = await reader.readexactly(length)
+                    status, headers, payload = await self.cinematic(body)
+                    content_type = headers.pop("Content-Type", content_type)
+            else:
+                status, payload = 404, b"Not found."
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            status, payload = 400, f"Malformed HTTP request: {e}".encode("utf-8")
+        finally:
+            head = [f"HTTP/1.1 {status} {HTTP_REASONS[status]}"]
+            head.append(f"Content-Type: {content_type}")
+            head.append(f"Content-Length: {len(payload)}")
+            head.append("Connection: close")
+            head.extend(f"{name}: {value}" for name, value in headers.items())
+            try:
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + payload)
+                await writer.drain()
+            except ConnectionError:
+                pass
+            writer.close()
+
+    async def run(self, host: str, port: int) -> None:
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_pool_worker, initargs=self._pool_args
+        )
+        try:
+            server = await asyncio.start_server(self.handle, host, port)
+            bound = ", ".join(str(sock.getsockname()[:2]) for sock in server.sockets)
+            print(f"Galaxy Clash AI listening on {bound}", file=sys.stderr, flush=True)
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+
+
+def serve_http(host: str, port: int, **options) -> int:
+    """Run ``CinematicServer`` until interrupted."""
+    try:
+        asyncio.run(CinematicServer(**options).run(host, port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+###############################################################################
+# Batch mode
+###############################################################################
+
+BATCH_CHUNK_SIZE = 16
+
+
+def _render_batch_chunk(records: List[Tuple[int, str]], defaults: Dict) -> List[Dict]:
+    """Pool entry point: answer a chunk of numbered batch records in order."""
+    responses = []
+    for number, line in records:
+        response: Dict = {}
+        for response in worker_responses(line, _POOL_CACHE, defaults):
+            pass
+        responses.append({"line": number, **response})
+    return responses
+
+
+def _batch_chunks(lines: Iterable[str], chunk_size: int) -> Iterator[List[Tuple[int, str]]]:
+    """Group the non-blank input lines into chunks, keeping their line numbers."""
+    chunk: List[Tuple[int, str]] = []
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        chunk.append((number, line))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_batch(
+    input_path: str,
+    output_path: str,
+    errors_path: Optional[str] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = BATCH_CHUNK_SIZE,
+    format: str = "markdown",
+    cache_size: int = 0,
+    cache_dir: Optional[str] = None,
+    cache_ttl: Optional[float] = None,
+    status=None,
+) -> Dict:
+    """Render every configuration of a JSON-lines file into another one.
+
+    Each input line is one request in the ``worker_responses`` format (a
+    ``load_battle_config`` configuration with optional ``id``, ``seed`` and
+    ``format``, which defaults to ``format``).  Each output line is its
+    ``{"line", "id", "ok", "seed", "report"}`` response, in input order,
+    where ``line`` is the input line number; blank lines are skipped.  A
+    record that fails is written as ``{"line", "id", "ok": false, "error"}``
+    to ``errors_path`` (``output_path`` + ``.errors`` by default) instead of
+    stopping the run.
+
+    Records are handed to ``workers`` processes (``None`` uses every CPU,
+    ``1`` stays in-process) ``chunk_size`` at a time.  Every process imports
+    the unit database, including ``GALAXY_CLASH_UNITS`` rosters, once and
+    keeps it for all its chunks.  At most two chunks per worker are in
+    flight and results are written as soon as every earlier chunk is, so
+    memory stays bounded however long the input is.  An input path of ``-``
+    reads standard input.  A one-line throughput summary goes to
+    ``status`` (standard error by default) and the counts are returned.
+    """
+    if chunk_size <= 0:
+        raise ValueError("The batch chunk size must be positive.")
+    if format not in REPORT_FORMATS:
+        raise ValueError(f"Unknown report format '{format}'.")
+    workers = workers or os.cpu_count() or 1
+    errors_path = errors_path or output_path + ".errors"
+    status = status or sys.stderr
+    defaults = {"format": format, "stream": False}
+    counts = {"records": 0, "ok": 0, "failed": 0}
+    started = time.perf_counter()
+
+    def write(responses: List[Dict], out, errors) -> None:
+        for response in responses:
+            counts["records"] += 1
+            if response.get("ok"):
+                counts["ok"] += 1
+                out.write(json.dumps(response, ensure_ascii=False) + "\n")
+            else:
+                counts["failed"] += 1
+                errors.write(json.dumps(response, ensure_ascii=False) + "\n")
+
+    source = sys.stdin if input_path == "-" else open(input_path, "r", encoding="utf-8")
+    try:
+        with open(output_path, "w", encoding="utf-8") as out, open(errors_path, "w", encoding="utf-8") as errors:
+            chunks = _batch_chunks(source, chunk_size)
+            if workers <= 1:
+                _init_pool_worker(cache_size, cache_dir, cache_ttl)
+                for chunk in chunks:
+                    write(_render_batch_chunk(chunk, defaults), out, errors)
+            else:
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_pool_worker,
+                    initargs=(cache_size, cache_dir, cache_ttl),
+                ) as pool:
+                    pending: deque = deque()
+                    for chunk in chunks:
+                        pending.append(pool.submit(_render_batch_chunk, chunk, defaults))
+                        # Waiting on the oldest chunk keeps the output in
+                        # input order and the number in flight bounded.
+                        if len(pending) >= workers * 2:
+                            write(pending.popleft().result(), out, errors)
+                    while pending:
+                        write(pending.popleft().result(), out, errors)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    elapsed = time.perf_counter() - started
+    counts["seconds"] = round(elapsed, 3)
+    counts["records_per_s"] = round(counts["records"] / elapsed, 1) if elapsed > 0 else None
+    print(
+        f"Batch: {counts['records']} records ({counts['ok']} ok, {counts['failed']} failed) "
+        f"in {elapsed:.2f} s, {counts['records_per_s']} records/s with {workers} worker(s)"
+        + (f"; errors in {errors_path}" if counts["failed"] else ""),
+        file=status,
+    )
+    return counts
+
+
+###############################################################################
+# Command-line interface
+###############################################################################
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="battle_story_ai.py",
+        description="Generate a cinematic Galaxy Clash battle report.",
+    )
+    parser.add_argument(
+        "config",
+        nargs="?",
+        help="battle configuration JSON file, or '-' to read it from stdin",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="run as a persistent worker reading JSON-lines configs from stdin",
+    )
+    parser.add_argument(
+        "--http",
+        type=int,
+        metavar="PORT",
+        help="serve POST /cinematic and GET /stats over HTTP on PORT",
+    )
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="interface for --http (default: 127.0.0.1)",
+    )
+    parser.add_argument(
+        "--queue-limit",
+        type=int,
+        default=32,
+        help="reports --http lets wait for a worker before answering 503",
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="PATH",
+        help="render every JSON-lines config in PATH ('-' for stdin) into --out",
+    )
+    parser.add_argument(
+        "--out",
+        metavar="PATH",
+        help="JSON-lines file receiving the --batch responses in input order",
+    )
+    parser.add_argument(
+        "--errors",
+        metavar="PATH",
+        help="JSON-lines file receiving failed --batch records (default: OUT.errors)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=BATCH_CHUNK_SIZE,
+        help="--batch records handed to a worker at a time",
+    )
+    parser.add_argument(
+        "--odds",
+        type=int,
+        metavar="N",
+        help="simulate up to N battles and print win probabilities instead of a story",
+    )
+    parser.add_argument(
+        "--from-round",
+        type=int,
+        choices=(1, 2),
+        metavar="N",
+        help="with --odds, fork the battles from the state after round N of the --seed battle",
+    )
+    parser.add_argument(
+        "--record",
+        metavar="PATH",
+        help="append every --odds battle's outcome to the columnar store PATH",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="processes used by --odds, --batch and --http (default: one per CPU)",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        help="stop --odds early once the win-rate interval half-width is below this",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=SIMULATION_ENGINES,
+        default="scalar",
+        help="simulation engine for --odds (numpy requires NumPy; exact enumerates small battles)",
+    )
+    parser.add_argument(
+        "--state-budget",
+        type=int,
+        metavar="N",
+        help="states --engine exact may visit before it simulates the --odds battles instead",
+    )
+    parser.add_argument(
+        "--format",
+        choices=REPORT_FORMATS,
+        default="markdown",
+        help="report markup: the Markdown story, an HTML fragment or structured JSON",
+    )
+    parser.add_argument(
+        "--positioning",
+        action="store_true",
+        help="place units on a terrain-derived grid with movement and weapon range",
+    )
+    parser.add_argument(
+        "--to-completion",
+        action="store_true",
+        help="keep fighting rounds until one side is wiped out instead of stopping after three",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="seed the battle so the same report can be produced again",
+    )
+    parser.add_argument(
+        "--log",
+        metavar="PATH",
+        help="also write the battle's compact JSON-lines event log to PATH",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="PATH",
+        help="re-render a stored event log instead of simulating a battle",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=256,
+        help="reports kept in the in-memory cache (0 disables caching)",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        help="also keep cached reports on disk in DIR",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        type=float,
+        metavar="SECONDS",
+        help="expire on-disk cached reports after SECONDS",
+    )
+    parser.add_argument(
+        "--any-sample",
+        action="store_true",
+        help="without --seed, accept any cached report for the same matchup",
+    )
+    parser.add_argument(
+        "--roster",
+        metavar="PATH",
+        action="append",
+        help="load extra units from a JSON or text roster file (repeatable)",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="print phase timings, counters and peak memory as JSON on stderr",
+    )
+    parser.add_argument(
+        "--profile-dump",
+        metavar="PATH",
+        help="run under cProfile and write the stats to PATH (read with pstats)",
+    )
+    return parser
+
+
+def main(argv: List[str]) -> int:
+    if len(argv) > 1 and argv[1] == "tournament":
+        from battle_tournament import main as tournament_main
+
+        return tournament_main(argv[1:])
+    if len(argv) > 1 and argv[1] == "outcomes":
+        from battle_outcomes import main as outcomes_main
+
+        return outcomes_main(argv[1:])
+    if len(argv) > 1 and argv[1] == "balance":
+        from battle_balance import main as balance_main
+
+        return balance_main(argv[1:])
+    args = build_arg_parser().parse_args(argv[1:])
+    if args.profile_dump:
+        import cProfile
+
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(run_command, args)
+        finally:
+            profiler.dump_stats(args.profile_dump)
+    return run_command(args)
+
+
+def run_command(args: argparse.Namespace) -> int:
+    """Carry out the command described by parsed command-line arguments."""
+    for path in args.roster or ():
+        try:
+            load_unit_database(path)
+        except Exception as e:
+            print(f"Error: {e}")
+            return 1
+        # Let pool workers started from here load the same roster
+        loaded = os.environ.get(ROSTER_ENV)
+        os.environ[ROSTER_ENV] = os.pathsep.join(filter(None, [loaded, path]))
+    cache = None
+    if args.cache_size > 0:
+        cache = ReportCache(args.cache_size, args.cache_dir, args.cache_ttl)
+    if args.serve:
+        return serve(cache=cache)
+    if args.http is not None:
+        return serve_http(
+            args.host,
+            args.http,
+            workers=args.workers,
+            queue_limit=args.queue_limit,
+            cache_size=args.cache_size,
+            cache_dir=args.cache_dir,
+            cache_ttl=args.cache_ttl,
+        )
+    if args.batch:
+        if not args.out:
+            print("Error: --batch needs --out")
+            return 1
+        try:
+            counts = run_batch(
+                args.batch,
+                args.out,
+                args.errors,
+                workers=args.workers,
+                chunk_size=args.chunk_size,
+                format=args.format,
+                cache_size=args.cache_size,
+                cache_dir=args.cache_dir,
+                cache_ttl=args.cache_ttl,
+            )
+        except Exception as e:
+            print(f"Error: {e}")
+            return 1
+        return 1 if counts["failed"] else 0
+    if args.replay:
+        try:
+            with open(args.replay, "r", encoding="utf-8") as f:
+                print(render_battle_log(load_battle_log(f), args.format))
+        except Exception as e:
+            print(f"Error: {e}")
+            return 1
+        return 0
+    if not args.config:
         print("Usage: python battle_story_ai.py <battle_config.json>")
         return 1
-    config_path = argv[1]
-    if not os.path.isfile(config_path):
+    config_path = args.config
+    if config_path != "-" and not os.path.isfile(config_path):
         print(f"Configuration file '{config_path}' not found.")
         return 1
+    profile = BattleProfile() if args.profile else None
     try:
-        team1, team2, battlefield, budget = load_battle_config(config_path)
-        report = generate_battle_report(team1, team2, battlefield, budget)
-        print(report)
+        with profile.measure() if profile is not None else nullcontext():
+            status = run_report(args, cache, profile)
     except Exception as e:
         print(f"Error: {e}")
         return 1
+    if profile is not None:
+        print(json.dumps(profile.as_dict()), file=sys.stderr)
+    return status
+
+
+def run_report(args: argparse.Namespace, cache: Optional[ReportCache], profile: Optional[BattleProfile]) -> int:
+    """Produce the story (or the odds) for ``args.config`` on standard output."""
+    with profile.phase("config") if profile is not None else nullcontext():
+        team1, team2, battlefield, budget = load_battle_config(args.config)
+    if args.positioning:
+        battlefield = dict(battlefield, positioning=True)
+    if args.to_completion:
+        battlefield = dict(battlefield, fight_to_completion=True)
+    if args.odds:
+        start = None
+        if args.from_round:
+            seed = args.seed if args.seed is not None else new_battle_seed()
+            snapshots = battle_snapshots(team1, team2, battlefield, seed)
+            if args.from_round >= len(snapshots):
+                raise ValueError(
+                    f"The battle seed {seed} ended after round {len(snapshots) - 1}, "
+                    f"before round {args.from_round} could be continued."
+                )
+            start = snapshots[args.from_round]
+            print(f"Continuing battle seed {seed} after round {args.from_round}")
+        record = None
+        if args.record:
+            from battle_outcomes import OutcomeWriter
+
+            record = OutcomeWriter(args.record, sorted(UNIT_DATABASE))
+        with record if record is not None else nullcontext():
+            result = simulate_many(
+                team1,
+                team2,
+                battlefield,
+                args.odds,
+                workers=args.workers,
+                tolerance=args.tolerance,
+                engine=args.engine,
+                seed=args.seed,
+                record=record,
+                start=start,
+                state_budget=args.state_budget,
+            )
+        print(format_odds_report(result))
+        return 0
+    log = new_battle_log(team1, team2, battlefield, budget, args.seed)
+    if cache is not None and args.cache_dir and not args.log and profile is None:
+        # Only the disk tier outlives a single command-line run
+        sections = iter_cached_battle_report(
+            cache, team1, team2, battlefield, budget, args.seed, args.any_sample, format=args.format
+        )
+    else:
+        sections = iter_battle_report(team1, team2, battlefield, log=log, profile=profile, format=args.format)
+    # Flush each section as soon as it is ready so callers can stream it
+    write_streamed(sections)
+    if args.log:
+        with open(args.log, "w", encoding="utf-8") as f:
+            dump_battle_log(log, f)
     return 0
 
 
 if __name__ == "__main__":
-    sys.exit(main(sys.argv))
\ No newline at end of file
+    sys.exit(main(sys.argv))
@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+battle_tournament.py
+====================
+
+Round-robin win-rate matrix for a set of Galaxy Clash lineups.
+
+Balance work needs to know how every candidate lineup fares against every
+other one.  ``run_tournament`` plays each unordered pair of lineups once,
+with each lineup taking both team slots for half of the battles so the
+tie-breaker's bias towards team one cancels out, and fills an N×N matrix
+whose entry ``[i][j]`` is lineup ``i``'s win rate against lineup ``j``
+(the diagonal is 0.5 by definition).
+
+Pair slots are small independent tasks pulled from the shared queue of a
+process pool, so a worker that finishes early simply takes the next task
+and long pairs never hold up short ones.  Every finished pair is appended
+to a JSON-lines checkpoint and flushed immediately; rerunning the same
+tournament with the same checkpoint skips the pairs already played.
+Seeds are derived from the tournament seed and the pair, so a resumed run
+produces exactly the matrix an uninterrupted one would.
+
+Usage
+-----
+Lineups come from a JSON file (a list of ``{"name", "units"}`` objects or
+plain unit lists) or are generated from ``UNIT_DATABASE`` within a budget::
+
+    python battle_tournament.py --budget 200 --max-units 4 --out matrix.csv
+    python battle_tournament.py --lineups lineups.json --checkpoint run.jsonl \\
+        --out matrix.bin
+
+``battle_story_ai.py tournament ...`` is the same command.  ``.bin``
+output is the compact binary layout read back by ``load_matrix``.
+``--record sweep.gco`` also keeps every battle in a columnar outcome store
+for ``battle_outcomes.py`` to query.
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import random
+import struct
+import sys
+from array import array
+from contextlib import nullcontext
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from battle_optimizer import enumerate_lineups, lineup_from_specs, lineup_specs
+from battle_outcomes import OutcomeWriter
+from battle_story_ai import UNIT_DATABASE, _simulate_chunk
+
+MATRIX_MAGIC = b"GCMATRIX"
+
+
+###############################################################################
+# Lineups
+###############################################################################
+
+@dataclass
+class Entrant:
+    """One lineup taking part in a tournament."""
+
+    name: str
+    units: List[str]
+
+
+def lineup_name(units: Sequence[str]) -> str:
+    """Readable name for an unnamed lineup, e.g. ``"Jedi + 2x Stormtrooper"``."""
+    return " + ".join(f"{num}x {name}" if num > 1 else name for name, num in lineup_from_specs(units))
+
+
+def load_entrants(path: str) -> List[Entrant]:
+    """Read lineups from a JSON list of ``{"name", "units"}`` objects or unit lists."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list) or len(data) < 2:
+        raise ValueError("A tournament needs a JSON list of at least two lineups.")
+    entrants: List[Entrant] = []
+    for item in data:
+        units = item["units"] if isinstance(item, dict) else item
+        lineup_from_specs(units)  # validates unit names
+        name = item.get("name") if isinstance(item, dict) else None
+        entrants.append(Entrant(name or lineup_name(units), list(units)))
+    return entrants
+
+
+def generate_entrants(
+    budget: int, units: Optional[Sequence[str]] = None, max_units: Optional[int] = None
+) -> List[Entrant]:
+    """Every maximal budget-legal lineup from ``UNIT_DATABASE``."""
+    entrants = []
+    for lineup in enumerate_lineups(budget, units, max_units):
+        specs = lineup_specs(lineup)
+        if specs:
+            entrants.append(Entrant(lineup_name(specs), specs))
+    return entrants
+
+
+###############################################################################
+# Scheduling and checkpoints
+###############################################################################
+
+def pair_seed(seed: int, i: int, j: int, slot: int) -> int:
+    """Deterministic seed for one slot of one pair, independent of run order."""
+    return random.Random(f"{seed}:{i}:{j}:{slot}").getrandbits(64)
+
+
+def tournament_signature(entrants: Sequence[Entrant], battles: int, seed: int) -> Dict:
+    """Header identifying a tournament, so checkpoints are never mixed up."""
+    return {
+        "entrants": [[e.name, e.units] for e in entrants],
+        "battles": battles,
+        "seed": seed,
+    }
+
+
+def read_checkpoint(path: str, signature: Dict) -> Tuple[Dict[Tuple[int, int], Tuple[int, int]], int]:
+    """Pairs already played according to the checkpoint at ``path``.
+
+    Returns them with the byte offset just past the last complete line.
+    A partially written last line (the run was killed mid-write) is
+    ignored, and the caller truncates the file to that offset before
+    appending; a checkpoint from a different tournament is an error.
+    """
+    done: Dict[Tuple[int, int], Tuple[int, int]] = {}
+    if not os.path.exists(path):
+        return done, 0
+    with open(path, "rb") as f:
+        header = f.readline()
+        if not header.endswith(b"\n"):
+            return done, 0
+        if json.loads(header) != signature:
+            raise ValueError(f"Checkpoint '{path}' belongs to a different tournament.")
+        offset = len(header)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            try:
+                i, j, wins, battles = json.loads(line)
+            except ValueError:
+                break
+            done[(i, j)] = (wins, battles)
+            offset += len(line)
+    return done, offset
+
+
+@dataclass
+class TournamentResult:
+    """Win-rate matrix of a round robin."""
+
+    names: List[str]
+    matrix: List[List[float]]
+    battles_per_pair: int
+    resumed_pairs: int = 0
+
+
+def run_tournament(
+    entrants: Sequence[Entrant],
+    battles: int = 200,
+    workers: Optional[int] = None,
+    seed: int = 0,
+    checkpoint: Optional[str] = None,
+    progress=None,
+    outcomes=None,
+) -> TournamentResult:
+    """Play every pair of ``entrants`` and return the win-rate matrix.
+
+    ``battles`` are split evenly over the two team slots of each pair.
+    With a ``checkpoint`` path, finished pairs are appended to it as they
+    complete and pairs already recorded there are not played again.
+    ``progress`` is called with ``(finished, total)`` after each pair.
+    Every battle played (not those of resumed pairs) is appended to the
+    ``battle_outcomes.OutcomeWriter`` given as ``outcomes``.
+    """
+    if len(entrants) < 2:
+        raise ValueError("A tournament needs at least two lineups.")
+    if battles < 2:
+        raise ValueError("Each pair needs at least two battles.")
+    n = len(entrants)
+    workers = workers or os.cpu_count() or 1
+    pairs = [(i, j) for i in range(n) for j in range(i + 1, n)]
+    signature = tournament_signature(entrants, battles, seed)
+    results, offset = read_checkpoint(checkpoint, signature) if checkpoint else ({}, 0)
+    resumed = len(results)
+    out = None
+    if checkpoint:
+        fresh = not offset
+        out = open(checkpoint, "w" if fresh else "a", encoding="utf-8")
+        if fresh:
+            out.write(json.dumps(signature) + "\n")
+            out.flush()
+        else:
+            # Drop a torn last line so new records start on a line of their own
+            out.truncate(offset)
+    half = battles // 2
+    unit_types = None
+    if outcomes is not None:
+        outcomes.register([(e.name, e.units) for e in entrants])
+        unit_types = tuple(outcomes.unit_types)
+
+    def played(part: Dict) -> Dict:
+        if outcomes is not None:
+            outcomes.extend(part["outcomes"])
+        return part
+
+    def tasks(i: int, j: int) -> List[Tuple]:
+        a = (entrants[i].name, entrants[i].units)
+        b = (entrants[j].name, entrants[j].units)
+        # Slot 0 puts lineup i first, slot 1 puts lineup j first
+        return [((a, b), half, pair_seed(seed, i, j, 0), 0), ((b, a), battles - half, pair_seed(seed, i, j, 1), 1)]
+
+    def record(i: int, j: int, wins: int, played: int) -> None:
+        results[(i, j)] = (wins, played)
+        if out is not None:
+            out.write(json.dumps([i, j, wins, played]) + "\n")
+            out.flush()
+        if progress is not None:
+            progress(len(results), len(pairs))
+
+    todo = [pair for pair in pairs if pair not in results]
+    try:
+        if workers <= 1:
+            for i, j in todo:
+                wins = 0
+                for specs, count, chunk_seed, slot in tasks(i, j):
+                    wins += played(_simulate_chunk(specs, count, chunk_seed, "scalar", None, unit_types))["wins"][slot]
+                record(i, j, wins, battles)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                pending = {}
+                partial: Dict[Tuple[int, int], List[int]] = {}
+                queue = list(reversed(todo))
+                while queue or pending:
+                    # A bounded backlog keeps memory flat on huge round robins
+                    while queue and len(pending) < workers * 4:
+                        i, j = queue.pop()
+                        for specs, count, chunk_seed, slot in tasks(i, j):
+                            future = pool.submit(_simulate_chunk, specs, count, chunk_seed, "scalar", None, unit_types)
+                            pending[future] = (i, j, slot)
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        i, j, slot = pending.pop(future)
+                        parts = partial.setdefault((i, j), [])
+                        parts.append(played(future.result())["wins"][slot])
+                        if len(parts) == 2:
+                            del partial[(i, j)]
+                            record(i, j, sum(parts), battles)
+    finally:
+        if out is not None:
+            out.close()
+
+    matrix = [[0.5] * n for _ in range(n)]
+    for (i, j), (wins, played) in results.items():
+        matrix[i][j] = wins / played
+        matrix[j][i] = 1 - wins / played
+    return TournamentResult(
+        names=[e.name for e in entrants],
+        matrix=matrix,
+        battles_per_pair=battles,
+        resumed_pairs=resumed,
+    )
+
+
+###############################################################################
+# Matrix output
+###############################################################################
+
+def write_matrix_csv(result: TournamentResult, path: str) -> None:
+    """Write the matrix as CSV with lineup names as row and column headers."""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow([""] + result.names)
+        for name, row in zip(result.names, result.matrix):
+            writer.writerow([name] + [f"{value:.4f}" for value in row])
+
+
+def write_matrix_binary(result: TournamentResult, path: str) -> None:
+    """Write ``MATRIX_MAGIC``, the JSON name list and little-endian float64 rows."""
+    names = json.dumps(result.names).encode("utf-8")
+    values = array("d", (value for row in result.matrix for value in row))
+    if sys.byteorder != "little":
+        values.byteswap()
+    with open(path, "wb") as f:
+        f.write(MATRIX_MAGIC)
+        f.write(struct.pack("<I", len(names)))
+        f.write(names)
+        f.write(struct.pack("<I", len(result.names)))
+        values.tofile(f)
+
+
+def load_matrix(path: str) -> Tuple[List[str], List[List[float]]]:
+    """Read a matrix written by ``write_matrix_binary``."""
+    with open(path, "rb") as f:
+        if f.read(len(MATRIX_MAGIC)) != MATRIX_MAGIC:
+            raise ValueError(f"'{path}' is not a Galaxy Clash matrix file.")
+        (size,) = struct.unpack("<I", f.read(4))
+        names = json.loads(f.read(size).decode("utf-8"))
+        (n,) = struct.unpack("<I", f.read(4))
+        values = array("d")
+        values.fromfile(f, n * n)
+    if sys.byteorder != "little":
+        values.byteswap()
+    return names, [list(values[r * n : (r + 1) * n]) for r in range(n)]
+
+
+###############################################################################
+# Command-line interface
+###############################################################################
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="battle_tournament.py",
+        description="Play a round robin between lineups and write the win-rate matrix.",
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--lineups", metavar="PATH", help="JSON list of lineups to play")
+    source.add_argument("--budget", type=int, help="generate every maximal lineup within this budget")
+    parser.add_argument("--max-units", type=int, help="largest generated lineup")
+    parser.add_argument("--units", help="comma-separated unit names allowed in generated lineups")
+    parser.add_argument("--battles", type=int, default=200, help="battles per pair, split over both slots")
+    parser.add_argument("--workers", type=int, help="worker processes (defaults to all CPUs)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--checkpoint", metavar="PATH", help="JSON-lines file to record and resume progress")
+    parser.add_argument("--record", metavar="PATH", help="append every battle to this columnar outcome store")
+    parser.add_argument(
+        "--out", metavar="PATH", required=True, help="matrix output; '.bin' is binary, anything else CSV"
+    )
+    args = parser.parse_args(argv[1:])
+    try:
+        if args.lineups:
+            entrants = load_entrants(args.lineups)
+        else:
+            units = [name.strip() for name in args.units.split(",")] if args.units else None
+            entrants = generate_entrants(args.budget, units, args.max_units)
+        total = len(entrants) * (len(entrants) - 1) // 2
+        print(f"{len(entrants)} lineups, {total} pairs", file=sys.stderr)
+
+        def progress(finished: int, pairs: int) -> None:
+            if finished % 100 == 0 or finished == pairs:
+                print(f"  {finished}/{pairs} pairs", file=sys.stderr)
+
+        outcomes = None
+        if args.record:
+            outcomes = OutcomeWriter(args.record, sorted(UNIT_DATABASE))
+        with outcomes if outcomes is not None else nullcontext():
+            result = run_tournament(
+                entrants,
+                battles=args.battles,
+                workers=args.workers,
+                seed=args.seed,
+                checkpoint=args.checkpoint,
+                progress=progress,
+                outcomes=outcomes,
+            )
+        if args.out.endswith(".bin"):
+            write_matrix_binary(result, args.out)
+        else:
+            write_matrix_csv(result, args.out)
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+    if result.resumed_pairs:
+        print(f"Resumed {result.resumed_pairs} pairs from {args.checkpoint}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
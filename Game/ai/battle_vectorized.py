@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+battle_vectorized.py
+====================
+
+Optional NumPy engine that simulates thousands of Galaxy Clash battles in
+lockstep.
+
+The scalar engine in ``battle_story_ai.py`` resolves one ``Unit`` and one
+``random.random()`` call at a time, which is ideal for narration but far
+too slow for balance sweeps.  This module keeps the whole battle state as
+``(battles × units)`` arrays instead:
+
+* ``health`` and ``alive`` hold every unit of both teams, team one first;
+* ``morale`` holds one column per team and ``accuracy`` the shared
+  accuracy modifier that leader auras write into the round context.
+
+Each round first applies leader abilities as mask operations
+(``fear_aura`` and ``tactical_boost`` scale ``accuracy``, ``morale_break``
+and ``inspires_rebels`` shift ``morale``, ``revive`` raises one fallen
+ally per living Talzin), then walks the action slots in initiative order.
+Every slot is resolved for all battles at once: target choice, hit roll,
+damage and morale updates are single array expressions.  Attack abilities are the
+``AttackModifier`` entries of ``ABILITY_REGISTRY`` folded into per-slot
+``hit_bonus`` and ``damage_multiplier`` vectors, and the kill and death
+abilities (``dark_presence``, ``tactical_insight``, ``resurrection``) are
+per-slot masks applied right after the kill's morale change.  Within a battle the order of
+events is exactly that of ``compute_round_events``, so the outcome
+distribution matches the scalar engine; ``equivalence_check`` verifies this
+statistically.
+
+Usage
+-----
+The engine is normally reached through ``simulate_many(..., engine="numpy")``
+or ``battle_story_ai.py config.json --odds N --engine numpy``.  Running this
+file directly compares both engines on a battle configuration::
+
+    python battle_vectorized.py battle.json --battles 20000
+
+NumPy is only needed when this engine is used; the rest of the project keeps
+running on the standard library alone.
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import random
+import sys
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional
+    np = None
+
+from battle_story_ai import (
+    ABILITY_REGISTRY,
+    DARK_PRESENCE_MORALE,
+    ON_ATTACK,
+    RESURRECTION_HEALTH_DIVISOR,
+    TACTICAL_INSIGHT_MORALE,
+    UNIT_DATABASE,
+    AttackModifier,
+    Team,
+    UnitType,
+    load_battle_config,
+    parse_unit_spec,
+    simulate_battle,
+)
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("The vectorized engine requires NumPy (pip install numpy).")
+
+
+###############################################################################
+# Battle layout
+###############################################################################
+
+class BattleLayout:
+    """Static per-slot unit statistics shared by every simulated battle.
+
+    Squad entries such as ``"200x Stormtrooper"`` are expanded into one
+    slot per model, since arrays already make large formations cheap.
+    """
+
+    def __init__(self, team1_specs: Sequence[str], team2_specs: Sequence[str]) -> None:
+        _require_numpy()
+        team1_names = self._expand(team1_specs)
+        team2_names = self._expand(team2_specs)
+        self.names: List[str] = team1_names + team2_names
+        self.templates: List[UnitType] = []
+        for name in self.names:
+            if name not in UNIT_DATABASE:
+                raise ValueError(f"Unknown unit '{name}'. Please add it to UNIT_DATABASE.")
+            self.templates.append(UNIT_DATABASE[name])
+        self.size = len(self.names)
+        self.team = np.array([0] * len(team1_names) + [1] * len(team2_names), dtype=np.int8)
+        self.max_health = np.array([t.health for t in self.templates], dtype=np.int64)
+        self.damage = np.array([t.damage for t in self.templates], dtype=np.float64)
+        self.base_hit = 0.6 + 0.1 * (self.damage / 30)
+        self.speed = np.array([t.speed for t in self.templates], dtype=np.float64)
+        self.is_leader = np.array([t.role == "Leader" for t in self.templates])
+        self.team_masks = (self.team == 0, self.team == 1)
+        # Morale synergies: (slot, mask of friendly slots of the required type, bonus)
+        self.morale_synergies: List[Tuple[int, "np.ndarray", float]] = []
+        for slot, template in enumerate(self.templates):
+            for required, modifiers in template.synergies.items():
+                bonus = modifiers.get("morale_bonus")
+                if bonus is None:
+                    continue
+                names = np.array(self.names)
+                mask = (names == required) & (self.team == self.team[slot])
+                self.morale_synergies.append((slot, mask, bonus))
+        # Attack abilities: each slot's AttackModifier handlers, in scalar order
+        self.attack_modifiers: List[Tuple[int, AttackModifier]] = []
+        for slot, template in enumerate(self.templates):
+            names = ([template.leader_ability] if template.leader_ability else []) + list(template.abilities)
+            for name in names:
+                handler = ABILITY_REGISTRY.get(name, {}).get(ON_ATTACK)
+                if handler is None:
+                    continue
+                if not isinstance(handler, AttackModifier):
+                    raise ValueError(f"Ability '{name}' is not supported by the vectorized engine.")
+                self.attack_modifiers.append((slot, handler))
+        self.dark_presence = self._has_ability("dark_presence")
+        self.tactical_insight = self._has_ability("tactical_insight")
+        self.resurrection = self._has_ability("resurrection")
+
+    def _has_ability(self, name: str) -> "np.ndarray":
+        return np.array([name in t.abilities for t in self.templates])
+
+    def round_modifiers(self, round_number: int) -> Tuple["np.ndarray", "np.ndarray"]:
+        """Per-slot ``(hit_bonus, damage_multiplier)`` from attack abilities."""
+        hit_bonus = np.zeros(self.size, dtype=np.float64)
+        damage_multiplier = np.ones(self.size, dtype=np.float64)
+        for slot, modifier in self.attack_modifiers:
+            context: Dict[str, float] = {}
+            modifier(None, context, round_number)
+            hit_bonus[slot] += context.get("hit_bonus", 0.0)
+            damage_multiplier[slot] *= context.get("damage_multiplier", 1.0)
+        return hit_bonus, damage_multiplier
+
+    @staticmethod
+    def _expand(specs: Sequence[str]) -> List[str]:
+        names: List[str] = []
+        for spec in specs:
+            count, name = parse_unit_spec(spec)
+            names.extend([name] * count)
+        return names
+
+
+###############################################################################
+# Kernel
+###############################################################################
+
+def _clip_morale(values):
+    return np.clip(values, 0.1, 2.0)
+
+
+def _apply_leader_abilities(layout: BattleLayout, state: Dict, side: int, round_number: int, rng) -> None:
+    """Mask-based mirror of ``apply_leader_abilities`` for one team."""
+    alive = state["alive"]
+    health = state["health"]
+    morale = state["morale"]
+    enemy = 1 - side
+    # The scalar engine iterates over a snapshot of the living units, so a
+    # unit revived during this pass does not get to use its own ability.
+    snapshot = alive.copy()
+    for slot in np.flatnonzero(layout.team_masks[side]):
+        ability = layout.templates[slot].leader_ability
+        if not ability:
+            continue
+        active = snapshot[:, slot]
+        if ability == "fear_aura" and round_number == 1:
+            state["accuracy"][active] *= 0.85
+        elif ability == "morale_break" and round_number == 1:
+            morale[active, enemy] = _clip_morale(morale[active, enemy] - 0.2)
+        elif ability == "tactical_boost" and round_number == 1:
+            state["accuracy"][active] *= 1.15
+        elif ability == "revive" and round_number >= 2:
+            sides = np.full(alive.shape[0], side, dtype=np.int8)
+            _revive_random(layout, state, active, sides, None, 2, rng)
+        elif ability == "inspires_rebels" and round_number == 1:
+            morale[active, side] = _clip_morale(morale[active, side] + 0.2)
+        # protective_aura only writes a defense buff the rules never read
+
+
+def _revive_random(layout: BattleLayout, state: Dict, active, side, exclude, divisor: int, rng) -> None:
+    """Revive one random fallen slot of ``side`` (per battle) in ``active`` rows.
+
+    ``side`` holds the team of each battle and ``exclude`` an optional slot
+    per battle that may not be picked.
+    """
+    alive = state["alive"]
+    fallen = ~alive & (layout.team[None, :] == side[:, None])
+    if exclude is not None:
+        fallen[np.arange(alive.shape[0]), exclude] = False
+    active = active & fallen.any(axis=1)
+    if not active.any():
+        return
+    keys = rng.random(alive.shape)
+    keys[~fallen] = -1.0
+    chosen = keys.argmax(axis=1)
+    rows = np.flatnonzero(active)
+    slots = chosen[rows]
+    alive[rows, slots] = True
+    state["health"][rows, slots] = np.maximum(1, layout.max_health[slots] // divisor)
+
+
+def _run_round(layout: BattleLayout, state: Dict, round_number: int, rng) -> None:
+    """Mask-based mirror of ``compute_round_events`` for every battle."""
+    alive = state["alive"]
+    health = state["health"]
+    morale = state["morale"]
+    accuracy = state["accuracy"]
+    battles = alive.shape[0]
+    rows = np.arange(battles)
+
+    # Initiative: exponential delays scaled by speed, as compute_round_events
+    # rolls them; dead slots sort to the end
+    keys = rng.standard_exponential(alive.shape) / layout.speed
+    keys[~alive] = np.inf
+    order = keys.argsort(axis=1)
+    acting = alive.sum(axis=1)
+    finished = np.zeros(battles, dtype=bool)
+    hit_bonus, damage_multiplier = layout.round_modifiers(round_number)
+
+    for k in range(layout.size):
+        actor = order[:, k]
+        valid = (k < acting) & ~finished & alive[rows, actor]
+        if not valid.any():
+            continue
+        side = layout.team[actor].astype(np.intp)
+        enemy = 1 - side
+        enemy_alive = alive & (layout.team[None, :] == enemy[:, None])
+        has_targets = enemy_alive.any(axis=1)
+        # compute_round_events stops the whole round once a side is wiped out
+        finished |= valid & ~has_targets
+        valid &= has_targets
+        if not valid.any():
+            continue
+
+        target_keys = rng.random(alive.shape)
+        target_keys[~enemy_alive] = -1.0
+        target = target_keys.argmax(axis=1)
+
+        # Attack damage uses morale from before this attacker's synergies
+        attacker_morale = morale[rows, side]
+        for slot, mask, bonus in layout.morale_synergies:
+            boosted = valid & (actor == slot) & alive[:, mask].any(axis=1)
+            if boosted.any():
+                morale[boosted, side[boosted]] = _clip_morale(morale[boosted, side[boosted]] + bonus)
+
+        hit_chance = np.clip(layout.base_hit[actor] * accuracy + hit_bonus[actor], 0.1, 0.95)
+        hit = valid & (rng.random(battles) < hit_chance)
+        multiplier = (1.0 + 0.2 * (attacker_morale - 1.0)) * damage_multiplier[actor]
+        damage = (layout.damage[actor] * multiplier).astype(np.int64)
+        health[rows[hit], target[hit]] -= damage[hit]
+        killed = hit & (health[rows, target] <= 0)
+        alive[rows[killed], target[killed]] = False
+
+        leader_killed = killed & layout.is_leader[target]
+        trooper_killed = killed & ~layout.is_leader[target]
+        morale[leader_killed, enemy[leader_killed]] = _clip_morale(morale[leader_killed, enemy[leader_killed]] - 0.3)
+        morale[trooper_killed, enemy[trooper_killed]] = _clip_morale(morale[trooper_killed, enemy[trooper_killed]] - 0.05)
+        # Kill and death abilities, in resolve_kill_abilities order
+        shaken = killed & layout.dark_presence[actor]
+        morale[shaken, enemy[shaken]] = _clip_morale(morale[shaken, enemy[shaken]] + DARK_PRESENCE_MORALE)
+        steadied = killed & layout.tactical_insight[target]
+        morale[steadied, enemy[steadied]] = _clip_morale(morale[steadied, enemy[steadied]] + TACTICAL_INSIGHT_MORALE)
+        raised = killed & layout.resurrection[target]
+        if raised.any():
+            _revive_random(layout, state, raised, enemy, target, RESURRECTION_HEALTH_DIVISOR, rng)
+        survived = valid & ~killed
+        morale[survived, side[survived]] = _clip_morale(morale[survived, side[survived]] + 0.02)
+
+
+def simulate_batch(layout: BattleLayout, battles: int, rng) -> Dict:
+    """Simulate ``battles`` independent three-round battles at once.
+
+    Returns the final ``health``, ``alive`` and ``morale`` arrays along with
+    the per-battle ``winner`` (0 or 1) following ``winner_index``.
+    """
+    state = {
+        "health": np.tile(layout.max_health, (battles, 1)),
+        "alive": np.ones((battles, layout.size), dtype=bool),
+        "morale": np.ones((battles, 2), dtype=np.float64),
+        "accuracy": np.ones(battles, dtype=np.float64),
+    }
+    for round_num in range(1, 4):
+        _apply_leader_abilities(layout, state, 0, round_num, rng)
+        _apply_leader_abilities(layout, state, 1, round_num, rng)
+        _run_round(layout, state, round_num, rng)
+
+    alive = state["alive"]
+    survivors = np.stack([alive[:, m].sum(axis=1) for m in layout.team_masks], axis=1)
+    remaining = np.where(alive, state["health"], 0)
+    health = np.stack([remaining[:, m].sum(axis=1) for m in layout.team_masks], axis=1)
+    team1_wins = (survivors[:, 0] > survivors[:, 1]) | (
+        (survivors[:, 0] == survivors[:, 1]) & (health[:, 0] >= health[:, 1])
+    )
+    state["survivors"] = survivors
+    state["winner"] = np.where(team1_wins, 0, 1)
+    return state
+
+
+def simulate_chunk(team_specs: Tuple[Tuple[str, List[str]], ...], count: int, seed: int) -> Dict:
+    """Drop-in replacement for ``battle_story_ai._simulate_chunk``."""
+    layout = BattleLayout(team_specs[0][1], team_specs[1][1])
+    state = simulate_batch(layout, count, np.random.default_rng(seed))
+    winner = state["winner"]
+    dead = (~state["alive"]).sum(axis=0)
+    casualties: List[Dict[str, int]] = [{}, {}]
+    for slot, name in enumerate(layout.names):
+        side = int(layout.team[slot])
+        casualties[side][name] = casualties[side].get(name, 0) + int(dead[slot])
+    return {
+        "battles": count,
+        "wins": [int((winner == 0).sum()), int((winner == 1).sum())],
+        "survivors": [int(state["survivors"][:, 0].sum()), int(state["survivors"][:, 1].sum())],
+        "casualties": casualties,
+    }
+
+
+###############################################################################
+# Statistical equivalence with the scalar engine
+###############################################################################
+
+def _two_sample_z(mean_a: float, var_a: float, n_a: int, mean_b: float, var_b: float, n_b: int) -> float:
+    se = math.sqrt(var_a / n_a + var_b / n_b)
+    if se == 0:
+        return 0.0 if mean_a == mean_b else math.inf
+    return (mean_a - mean_b) / se
+
+
+def equivalence_check(
+    team1: Team, team2: Team, battles: int = 20000, seed: Optional[int] = 0, z_limit: float = 4.0
+) -> Dict[str, float]:
+    """Compare the scalar and vectorized engines on one matchup.
+
+    Simulates ``battles`` battles with each engine and computes two-sample
+    z statistics for the team one win rate and for each side's mean number
+    of survivors.  The result includes ``passed``, which is False as soon as
+    any statistic exceeds ``z_limit`` in absolute value.  Rosters with
+    ``Squad`` entries are compared against the per-model kernel, so small
+    differences there reflect the squad approximation itself.
+    """
+    _require_numpy()
+    rng = random.Random(seed)
+    scalar_wins: List[int] = []
+    scalar_survivors: Tuple[List[int], List[int]] = ([], [])
+    for _ in range(battles):
+        outcome = simulate_battle(team1, team2, rng)
+        scalar_wins.append(1 - outcome.winner)
+        scalar_survivors[0].append(outcome.survivors[0])
+        scalar_survivors[1].append(outcome.survivors[1])
+
+    layout = BattleLayout([u.spec for u in team1.units], [u.spec for u in team2.units])
+    state = simulate_batch(layout, battles, np.random.default_rng(seed))
+    vector_wins = (state["winner"] == 0).astype(np.float64)
+
+    def stats(values) -> Tuple[float, float]:
+        arr = np.asarray(values, dtype=np.float64)
+        return float(arr.mean()), float(arr.var(ddof=1))
+
+    results: Dict[str, float] = {}
+    pairs = {
+        "win_rate": (scalar_wins, vector_wins),
+        "survivors_team1": (scalar_survivors[0], state["survivors"][:, 0]),
+        "survivors_team2": (scalar_survivors[1], state["survivors"][:, 1]),
+    }
+    for key, (a, b) in pairs.items():
+        mean_a, var_a = stats(a)
+        mean_b, var_b = stats(b)
+        results[f"{key}_scalar"] = mean_a
+        results[f"{key}_vectorized"] = mean_b
+        results[f"{key}_z"] = _two_sample_z(mean_a, var_a, battles, mean_b, var_b, battles)
+    results["passed"] = all(abs(results[f"{key}_z"]) <= z_limit for key in pairs)
+    return results
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(
+        prog="battle_vectorized.py",
+        description="Check that the NumPy engine matches the scalar battle engine.",
+    )
+    parser.add_argument("config", help="battle configuration JSON file, or '-' for stdin")
+    parser.add_argument("--battles", type=int, default=20000, help="battles per engine")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv[1:])
+    try:
+        team1, team2, _battlefield, _budget = load_battle_config(args.config)
+        results = equivalence_check(team1, team2, args.battles, args.seed)
+    except Exception as e:
+        print(f"Error: {e}")
+        return 1
+    for key, value in results.items():
+        print(f"{key}: {value}")
+    return 0 if results["passed"] else 2
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,16 @@
+"""
+Benchmarks for the Galaxy Clash battle engine and narrative renderer.
+
+* ``bench_scaling`` -- how one silent battle scales with army size;
+* ``bench_engine``  -- fixed-seed scenarios timing the simulation and the
+  full report separately, with a JSON history and regression comparison.
+* ``bench_startup`` -- start-up cost of an external unit roster, cold and
+  with its compiled cache.
+* ``bench_render`` -- report rendering throughput in each ``--format``
+  from pre-recorded battle logs.
+* ``bench_estimator`` -- the analytical odds estimate against simulated
+  win rates: its error, the fitted margin spread and the time of each.
+
+Run them from ``Game/ai``, e.g. ``python -m benchmarks.bench_engine run``,
+or as plain scripts.
+"""
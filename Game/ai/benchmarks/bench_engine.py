@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+bench_engine.py
+===============
+
+Fixed-seed benchmarks for the battle engine and the narrative renderer.
+
+Scenarios
+---------
+* ``readme``      -- the sample battle from ``battle_story_ai.py``'s docstring;
+* ``leaders``     -- two all-leader rosters, so every round fires auras;
+* ``talzin``      -- four Mother Talzins per side, exercising revive chains;
+* ``army_100``, ``army_1000``, ``army_10000`` -- Darth Vader with ``N``
+  Stormtroopers against a Jedi with ``N`` Clone Troopers;
+* ``grid_1000``, ``grid_10000`` -- the same armies with battlefield
+  positioning on (``BattleGrid``), to hold nearest-enemy targeting to the
+  cost of the random targeting it replaces.
+
+Each scenario is timed along five paths: ``simulate`` (``play_battle``,
+no narration), ``report`` (``generate_battle_report``, simulation plus
+rendering) and the three hot helpers ``resolve_attack``,
+``compute_round_events`` (one full round) and ``apply_leader_abilities``
+(both sides at the start of round two, after round one has left fallen
+units for Talzin to raise).  Set-up such as resetting the teams is never
+inside the timed region.
+
+Every measurement is ``repeat`` samples of the mean time per call; calls
+are batched so that a sample lasts at least ``--min-time`` seconds.
+
+History and regressions
+-----------------------
+``run`` appends the samples to a JSON history file (one record per run,
+with a label, the Python version and the platform).  ``compare`` checks
+the latest run against a stored baseline: a measurement is flagged when
+its median moved by more than ``--threshold`` *and* a Mann–Whitney U test
+says the two sample sets differ at level ``--alpha``, so noise alone does
+not raise alarms::
+
+    python -m benchmarks.bench_engine run --label before --save-baseline base.json
+    python -m benchmarks.bench_engine run --label after
+    python -m benchmarks.bench_engine compare --baseline base.json
+
+``compare`` (and ``run --compare``) exit with status 1 when anything
+regressed.
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from battle_story_ai import (  # noqa: E402
+    PRESET_BATTLEFIELDS,
+    BattleGrid,
+    Team,
+    Unit,
+    UNIT_DATABASE,
+    apply_leader_abilities,
+    compute_round_events,
+    create_units_from_names,
+    generate_battle_report,
+    play_battle,
+    resolve_attack,
+)
+
+DEFAULT_HISTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "history.json")
+SEED = 2003
+
+# scenario -> (team one units, team two units)
+SCENARIOS: Dict[str, Tuple[List[str], List[str]]] = {
+    "readme": (
+        ["Darth Vader", "Emperor Palpatine", "Stormtrooper", "Stormtrooper"],
+        ["Saw Gerrera", "Clone Trooper", "Clone Trooper", "Mother Talzin"],
+    ),
+    "leaders": (
+        ["Darth Vader", "Emperor Palpatine", "Grand Admiral Thrawn", "Mother Talzin"],
+        ["Saw Gerrera", "Jedi", "Grand Admiral Thrawn", "Mother Talzin"],
+    ),
+    "talzin": (
+        ["Mother Talzin"] * 4 + ["Stormtrooper"] * 4,
+        ["Mother Talzin"] * 4 + ["Clone Trooper"] * 4,
+    ),
+}
+for _size in (100, 1000, 10000):
+    SCENARIOS[f"army_{_size}"] = (
+        ["Darth Vader"] + ["Stormtrooper"] * _size,
+        ["Jedi"] + ["Clone Trooper"] * _size,
+    )
+# Scenarios fought with battlefield positioning, and the army each one reuses
+GRID_SCENARIOS = {"grid_1000": "army_1000", "grid_10000": "army_10000"}
+for _name, _army in GRID_SCENARIOS.items():
+    SCENARIOS[_name] = SCENARIOS[_army]
+
+PATHS = ("simulate", "report", "resolve_attack", "compute_round_events", "apply_leader_abilities")
+
+
+###############################################################################
+# Measurement
+###############################################################################
+
+def measure(
+    op: Callable[[], None],
+    setup: Optional[Callable[[], None]] = None,
+    repeat: int = 7,
+    min_time: float = 0.05,
+) -> Tuple[List[float], int]:
+    """Time ``op`` and return (seconds per call for each sample, calls per sample).
+
+    ``setup`` runs before every call but outside the timed region.
+    """
+
+    def sample(number: int) -> float:
+        total = 0.0
+        for _ in range(number):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            op()
+            total += time.perf_counter() - start
+        return total
+
+    number = 1
+    elapsed = sample(1)  # also warms up caches
+    if elapsed < min_time:
+        number = max(1, int(min_time / max(elapsed, 1e-9)))
+    return [sample(number) / number for _ in range(repeat)], number
+
+
+def scenario_measurements(name: str, paths=PATHS, repeat: int = 7, min_time: float = 0.05) -> Dict[str, Dict]:
+    """Run every requested path of one scenario."""
+    units1, units2 = SCENARIOS[name]
+    team1 = Team(name="Side A", units=create_units_from_names(units1))
+    team2 = Team(name="Side B", units=create_units_from_names(units2))
+    battlefield = PRESET_BATTLEFIELDS[0]
+    if name in GRID_SCENARIOS:
+        battlefield = dict(battlefield, positioning=True)
+    grid = BattleGrid.for_battlefield(battlefield)
+    rng = random.Random(SEED)
+    context: Dict[str, float] = {}
+
+    def fresh_round(number: int) -> Callable[[], None]:
+        def setup() -> None:
+            rng.seed(SEED)
+            team1.reset()
+            team2.reset()
+            if grid is not None:
+                grid.deploy(team1, team2)
+            context.clear()
+            for previous in range(1, number):
+                compute_round_events(team1, team2, context, previous, rng, grid=grid)
+
+        return setup
+
+    attacker = Unit(UNIT_DATABASE[units1[0]])
+    defender = Unit(UNIT_DATABASE[units2[-1]])
+
+    def attack() -> None:
+        resolve_attack(attacker, defender, context, rng)
+        if not defender.is_alive:
+            defender.heal_full()
+
+    def leader_abilities() -> None:
+        apply_leader_abilities(team1, team2, context, 2, rng)
+        apply_leader_abilities(team2, team1, context, 2, rng)
+
+    ops = {
+        "simulate": (lambda: play_battle(team1, team2, rng, grid=grid), lambda: rng.seed(SEED)),
+        "report": (lambda: generate_battle_report(team1, team2, battlefield, seed=SEED), None),
+        "resolve_attack": (attack, None),
+        "compute_round_events": (
+            lambda: compute_round_events(team1, team2, context, 1, rng, grid=grid),
+            fresh_round(1),
+        ),
+        "apply_leader_abilities": (leader_abilities, fresh_round(2)),
+    }
+    results = {}
+    for path in paths:
+        op, setup = ops[path]
+        samples, number = measure(op, setup, repeat, min_time)
+        results[f"{name}/{path}"] = {"samples": samples, "number": number}
+    return results
+
+
+def run_benchmarks(
+    scenarios=None, paths=PATHS, repeat: int = 7, min_time: float = 0.05, label: Optional[str] = None, progress=None
+) -> Dict:
+    """Measure the requested scenarios and return one history record."""
+    record = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "label": label,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "results": {},
+    }
+    for name in scenarios or SCENARIOS:
+        measured = scenario_measurements(name, paths, repeat, min_time)
+        record["results"].update(measured)
+        if progress is not None:
+            progress(measured)
+    return record
+
+
+###############################################################################
+# History and comparison
+###############################################################################
+
+def load_history(path: str) -> List[Dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["runs"]
+
+
+def append_history(path: str, record: Dict) -> None:
+    runs = load_history(path)
+    runs.append(record)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"runs": runs}, f, indent=1)
+    os.replace(tmp, path)
+
+
+def mann_whitney_p(a: List[float], b: List[float]) -> float:
+    """Two-sided p-value of the Mann–Whitney U test (normal approximation)."""
+    n1, n2 = len(a), len(b)
+    if not n1 or not n2:
+        return 1.0
+    pooled = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    ranks = [0.0] * len(pooled)
+    ties = 0.0
+    i = 0
+    while i < len(pooled):
+        j = i
+        while j + 1 < len(pooled) and pooled[j + 1][0] == pooled[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        tied = j - i + 1
+        ties += tied ** 3 - tied
+        i = j + 1
+    rank_sum = sum(rank for rank, (_value, group) in zip(ranks, pooled) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = max(0.0, abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variance)
+    return 2 * (1 - statistics.NormalDist().cdf(z))
+
+
+def compare_runs(baseline: Dict, current: Dict, threshold: float = 0.05, alpha: float = 0.05) -> List[Dict]:
+    """Compare two history records measurement by measurement.
+
+    Each row carries the baseline and current medians, their ratio, the
+    p-value and a ``status`` of ``regression``, ``improvement`` or ``same``.
+    """
+    rows = []
+    for key, base in baseline["results"].items():
+        if key not in current["results"]:
+            continue
+        before = base["samples"]
+        after = current["results"][key]["samples"]
+        ratio = statistics.median(after) / statistics.median(before)
+        p = mann_whitney_p(before, after)
+        status = "same"
+        if p < alpha and ratio > 1 + threshold:
+            status = "regression"
+        elif p < alpha and ratio < 1 - threshold:
+            status = "improvement"
+        rows.append(
+            {
+                "name": key,
+                "baseline": statistics.median(before),
+                "current": statistics.median(after),
+                "ratio": ratio,
+                "p": p,
+                "status": status,
+            }
+        )
+    return rows
+
+
+def format_seconds(seconds: float) -> str:
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+def format_comparison(rows: List[Dict]) -> str:
+    lines = [f"{'benchmark':<40} {'baseline':>10} {'current':>10} {'change':>8} {'p':>6}"]
+    for row in rows:
+        flag = {"regression": "  SLOWER", "improvement": "  faster"}.get(row["status"], "")
+        lines.append(
+            f"{row['name']:<40} {format_seconds(row['baseline']):>10} {format_seconds(row['current']):>10} "
+            f"{(row['ratio'] - 1) * 100:>+7.1f}% {row['p']:>6.3f}{flag}"
+        )
+    return "\n".join(lines)
+
+
+###############################################################################
+# Command-line interface
+###############################################################################
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the battle engine and renderer.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    run = commands.add_parser("run", help="measure and append the results to the history")
+    run.add_argument("--scenario", choices=list(SCENARIOS), nargs="+", help="scenarios to run (default: all)")
+    run.add_argument("--path", choices=PATHS, nargs="+", default=list(PATHS), help="code paths to time")
+    run.add_argument("--repeat", type=int, default=7, help="samples per measurement")
+    run.add_argument("--min-time", type=float, default=0.05, help="minimum seconds per sample")
+    run.add_argument("--label", help="name stored with this run, e.g. a commit or branch")
+    run.add_argument("--history", default=DEFAULT_HISTORY, help="JSON history file to append to")
+    run.add_argument("--save-baseline", metavar="PATH", help="also store this run as the baseline")
+    run.add_argument("--compare", metavar="PATH", help="compare this run with a stored baseline")
+    compare = commands.add_parser("compare", help="compare the latest run in the history with a baseline")
+    compare.add_argument("--baseline", required=True, metavar="PATH")
+    compare.add_argument("--history", default=DEFAULT_HISTORY)
+    for sub in (run, compare):
+        sub.add_argument("--threshold", type=float, default=0.05, help="relative change worth reporting")
+        sub.add_argument("--alpha", type=float, default=0.05, help="significance level of the U test")
+    args = parser.parse_args(argv[1:])
+
+    if args.command == "run":
+
+        def progress(measured: Dict[str, Dict]) -> None:
+            for key, value in measured.items():
+                print(f"{key:<40} {format_seconds(statistics.median(value['samples'])):>10}")
+
+        record = run_benchmarks(args.scenario, args.path, args.repeat, args.min_time, args.label, progress)
+        append_history(args.history, record)
+        if args.save_baseline:
+            with open(args.save_baseline, "w", encoding="utf-8") as f:
+                json.dump(record, f, indent=1)
+        if not args.compare:
+            return 0
+        baseline_path = args.compare
+    else:
+        runs = load_history(args.history)
+        if not runs:
+            print(f"Error: no runs recorded in {args.history}")
+            return 1
+        record = runs[-1]
+        baseline_path = args.baseline
+
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare_runs(baseline, record, args.threshold, args.alpha)
+    print(format_comparison(rows))
+    return 1 if any(row["status"] == "regression" for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
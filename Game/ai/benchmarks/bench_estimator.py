@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+bench_estimator.py
+==================
+
+Calibrate ``estimate_odds`` against the simulator and time it.
+
+The matchups are the ``bench_engine`` scenarios (without positioning and
+without the 10,000-unit armies) plus ``--random`` seeded random matchups of
+two to eight entries a side, some of them squads, with both sides bought
+for about the same cost.  For each one the analytical
+estimate is compared with ``simulate_many`` over ``--battles`` battles
+(fewer for the big armies), and the table lists both win rates, the
+error and the time of each method::
+
+    python benchmarks/bench_estimator.py
+    python benchmarks/bench_estimator.py --random 60 --battles 4000
+
+The summary gives the mean, 95th percentile and maximum absolute error on
+the win rate; the 95th percentile is what ``ESTIMATE_ERROR_BOUND`` should
+hold.  It also refits ``ESTIMATE_SPREAD`` by trying a range of spreads on
+the same simulations and reporting the one with the tightest 95th
+percentile (the smaller mean error breaking ties).
+Errors include the simulations' own sampling noise (about 1 point at
+2000 battles).
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from typing import Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import battle_story_ai  # noqa: E402
+from battle_story_ai import UNIT_DATABASE, Team, create_units_from_names, estimate_odds, simulate_many  # noqa: E402
+from benchmarks.bench_engine import GRID_SCENARIOS, SCENARIOS, SEED  # noqa: E402
+
+SPREADS = [0.5, 0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.25, 1.5, 1.75, 2.0]
+
+
+def random_entry(rng: random.Random, names: List[str]) -> Tuple[str, int]:
+    """One roster entry, roughly one in five of them a squad, and its cost."""
+    name = rng.choice(names)
+    if rng.random() < 0.2:
+        count = rng.randint(3, 12)
+        return f"{count}x {name}", count * UNIT_DATABASE[name].cost
+    return name, UNIT_DATABASE[name].cost
+
+
+def random_matchup(rng: random.Random, names: List[str]) -> Tuple[List[str], List[str]]:
+    """Two to eight entries a side, the second side bought up to the first's cost.
+
+    Lopsided matchups are trivially predicted, so balancing the budgets keeps
+    the calibration on the close battles where the estimate matters.
+    """
+    first, budget = [], 0
+    for _ in range(rng.randint(2, 8)):
+        spec, cost = random_entry(rng, names)
+        first.append(spec)
+        budget += cost
+    second, spent = [], 0
+    for _ in range(100):
+        if spent >= budget or len(second) == 12:
+            break
+        spec, cost = random_entry(rng, names)
+        if spent + cost <= budget * 1.1 or not second:
+            second.append(spec)
+            spent += cost
+    return first, second
+
+
+def matchups(count: int, seed: int) -> Dict[str, Tuple[List[str], List[str]]]:
+    chosen = {
+        name: units
+        for name, units in SCENARIOS.items()
+        if name not in GRID_SCENARIOS and name != "army_10000"
+    }
+    rng = random.Random(seed)
+    names = sorted(UNIT_DATABASE)
+    for i in range(count):
+        chosen[f"random_{i:02d}"] = random_matchup(rng, names)
+    return chosen
+
+
+def teams(units: Tuple[List[str], List[str]]) -> Tuple[Team, Team]:
+    return (
+        Team(name="Side A", units=create_units_from_names(units[0])),
+        Team(name="Side B", units=create_units_from_names(units[1])),
+    )
+
+
+def time_estimate(team1: Team, team2: Team, repeat: int = 5) -> float:
+    """Best seconds per ``estimate_odds`` call."""
+    number = 20
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            estimate_odds(team1, team2)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Calibrate the analytical odds estimator against simulations.")
+    parser.add_argument("--random", type=int, default=40, help="random matchups on top of the fixed scenarios")
+    parser.add_argument("--battles", type=int, default=2000, help="simulated battles per matchup")
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args(argv[1:])
+
+    simulated: Dict[str, float] = {}
+    errors: List[float] = []
+    print(f"{'matchup':>12}  {'estimate':>8}  {'simulated':>9}  {'error':>6}  {'estimate µs':>11}  {'simulate ms':>11}")
+    for name, units in matchups(args.random, args.seed).items():
+        team1, team2 = teams(units)
+        size = sum(u.count for u in team1.units + team2.units)
+        battles = args.battles if size < 100 else max(100, args.battles // 10)
+        estimated = estimate_odds(team1, team2).win_rates[0]
+        start = time.perf_counter()
+        result = simulate_many(team1, team2, n=battles, workers=1, seed=args.seed)
+        simulate_seconds = (time.perf_counter() - start) / battles
+        simulated[name] = result.win_rates[0]
+        errors.append(abs(estimated - simulated[name]))
+        print(
+            f"{name:>12}  {estimated * 100:>7.1f}%  {simulated[name] * 100:>8.1f}%  {errors[-1] * 100:>6.1f}"
+            f"  {time_estimate(team1, team2) * 1e6:>11.0f}  {simulate_seconds * 1e3:>11.3f}"
+        )
+
+    print(
+        f"\n|error| over {len(errors)} matchups: mean {statistics.mean(errors) * 100:.1f} pts, "
+        f"95th percentile {percentile(errors, 0.95) * 100:.1f} pts, max {max(errors) * 100:.1f} pts "
+        f"(ESTIMATE_ERROR_BOUND is {battle_story_ai.ESTIMATE_ERROR_BOUND * 100:.0f} pts)"
+    )
+
+    # Refit the margin spread on the same simulations
+    current = battle_story_ai.ESTIMATE_SPREAD
+    fits = []
+    try:
+        for spread in SPREADS:
+            battle_story_ai.ESTIMATE_SPREAD = spread
+            misses = [
+                abs(estimate_odds(*teams(units)).win_rates[0] - simulated[name])
+                for name, units in matchups(args.random, args.seed).items()
+            ]
+            fits.append((percentile(misses, 0.95), statistics.mean(misses), spread))
+    finally:
+        battle_story_ai.ESTIMATE_SPREAD = current
+    print("\nESTIMATE_SPREAD  mean  95th pct")
+    for p95, mean, spread in fits:
+        print(f"{spread:>15}  {mean * 100:>4.1f}  {p95 * 100:>8.1f}")
+    p95, mean, spread = min(fits)
+    print(
+        f"Best ESTIMATE_SPREAD {spread} (currently {current}): "
+        f"mean {mean * 100:.1f} pts, 95th percentile {p95 * 100:.1f} pts"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+bench_render.py
+===============
+
+Measure report-rendering throughput in every ``--format``.
+
+Each ``bench_engine`` scenario is fought once with a fixed seed and its
+``BattleLog`` kept, so only ``render_battle_log`` is inside the timed
+region: rebuilding the teams, replaying the events and formatting the
+Markdown, HTML or JSON report.  The table shows the best time per report,
+reports per second and output megabytes per second::
+
+    python benchmarks/bench_render.py
+    python benchmarks/bench_render.py --scenarios readme army_1000 --formats markdown json
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from battle_story_ai import (  # noqa: E402
+    PRESET_BATTLEFIELDS,
+    REPORT_FORMATS,
+    BattleLog,
+    Team,
+    create_units_from_names,
+    render_battle_log,
+    run_battle,
+)
+from benchmarks.bench_engine import GRID_SCENARIOS, SCENARIOS, SEED  # noqa: E402
+
+DEFAULT_SCENARIOS = ["readme", "talzin", "army_100", "army_1000", "grid_1000"]
+
+
+def record_scenario(name: str) -> BattleLog:
+    """Fight one scenario with the benchmark seed and return its log."""
+    units1, units2 = SCENARIOS[name]
+    battlefield = PRESET_BATTLEFIELDS[0]
+    if name in GRID_SCENARIOS:
+        battlefield = dict(battlefield, positioning=True)
+    team1 = Team(name="Side A", units=create_units_from_names(units1))
+    team2 = Team(name="Side B", units=create_units_from_names(units2))
+    return run_battle(team1, team2, battlefield, seed=SEED)
+
+
+def time_render(log: BattleLog, report_format: str, repeat: int, min_time: float) -> float:
+    """Best mean seconds per report over ``repeat`` samples of at least ``min_time``."""
+    render_battle_log(log, report_format)  # warm up the phrase tables
+    number = 1
+    start = time.perf_counter()
+    render_battle_log(log, report_format)
+    elapsed = time.perf_counter() - start
+    if elapsed < min_time:
+        number = max(1, int(min_time / max(elapsed, 1e-9)))
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            render_battle_log(log, report_format)
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Time report rendering from recorded battle logs.")
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=DEFAULT_SCENARIOS)
+    parser.add_argument("--formats", nargs="+", choices=REPORT_FORMATS, default=list(REPORT_FORMATS))
+    parser.add_argument("--repeat", type=int, default=5, help="samples per measurement (best is reported)")
+    parser.add_argument("--min-time", type=float, default=0.1, help="minimum seconds per sample")
+    args = parser.parse_args(argv[1:])
+
+    print(f"{'scenario':>10}  {'format':>8}  {'events':>7}  {'per report':>11}  {'reports/s':>10}  {'MB/s':>7}")
+    for name in args.scenarios:
+        log = record_scenario(name)
+        for report_format in args.formats:
+            seconds = time_render(log, report_format, args.repeat, args.min_time)
+            size = len(render_battle_log(log, report_format).encode("utf-8"))
+            print(
+                f"{name:>10}  {report_format:>8}  {len(log.events):>7}  {seconds * 1e3:>8.3f} ms"
+                f"  {1 / seconds:>10.1f}  {size / seconds / 1e6:>7.1f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+bench_startup.py
+================
+
+Measure how much an external unit roster adds to process start-up.
+
+Every ``--serve`` worker and pool process imports ``battle_story_ai`` and
+loads the rosters named in ``GALAXY_CLASH_UNITS``.  This benchmark writes a
+synthetic JSON roster of ``--units`` entries to a temporary directory and
+times, in fresh interpreters:
+
+* ``builtin``  -- importing the module with only the built-in units;
+* ``cold``     -- importing it with the roster and no compiled cache
+  (parse, validate and write the cache);
+* ``warm``     -- importing it again once the marshal cache exists.
+
+It also times ``load_unit_roster`` in-process for both paths, which
+isolates the loader from interpreter start-up::
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --units 20000 --repeat 10
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+AI_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, AI_DIR)
+
+from battle_story_ai import ROSTER_ENV, load_unit_roster, roster_cache_path  # noqa: E402
+
+
+def synthetic_roster(count: int) -> List[Dict]:
+    """``count`` distinct, valid units with varied stats."""
+    units = []
+    for i in range(count):
+        leader = i % 10 == 0
+        units.append(
+            {
+                "name": f"Synthetic Unit {i:05d}",
+                "tier": 1 + i % 3,
+                "cost": 20 + i % 120,
+                "health": 30 + i % 100,
+                "damage": 5 + i % 40,
+                "description": "Generated for the start-up benchmark",
+                "role": "Leader" if leader else "Trooper",
+                "abilities": ["furious_charge"] if i % 7 == 0 else [],
+                "synergies": {"Stormtrooper": {"morale_bonus": 0.05}} if i % 5 == 0 else {},
+                "leader_ability": "tactical_boost" if leader else None,
+            }
+        )
+    return units
+
+
+def time_import(roster: Optional[str], clear_cache: bool) -> float:
+    """Wall time of a fresh interpreter importing ``battle_story_ai``."""
+    env = dict(os.environ)
+    env.pop(ROSTER_ENV, None)
+    if roster is not None:
+        env[ROSTER_ENV] = roster
+        if clear_cache and os.path.exists(roster_cache_path(roster)):
+            os.remove(roster_cache_path(roster))
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "import battle_story_ai"], cwd=AI_DIR, env=env, check=True)
+    return time.perf_counter() - start
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Time start-up with and without an external unit roster.")
+    parser.add_argument("--units", type=int, default=5000, help="units in the synthetic roster")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per measurement (median is reported)")
+    args = parser.parse_args(argv[1:])
+
+    workdir = tempfile.mkdtemp(prefix="gc-roster-")
+    try:
+        roster = os.path.join(workdir, "units.json")
+        with open(roster, "w", encoding="utf-8") as f:
+            json.dump(synthetic_roster(args.units), f)
+
+        results: Dict[str, List[float]] = {"builtin": [], "cold": [], "warm": []}
+        # Interleave the three cases so machine noise hits them alike
+        for _ in range(args.repeat):
+            results["builtin"].append(time_import(None, False))
+            results["cold"].append(time_import(roster, True))
+            results["warm"].append(time_import(roster, False))
+        print(f"Roster of {args.units} units, median of {args.repeat} runs")
+        print(f"{'import':>8}  {'ms':>8}  {'vs builtin':>10}")
+        base = statistics.median(results["builtin"])
+        for name, samples in results.items():
+            median = statistics.median(samples)
+            print(f"{name:>8}  {median * 1e3:>8.1f}  {(median - base) * 1e3:>+9.1f}")
+
+        loads = {}
+        for name, use_cache in (("parse", False), ("cached", True)):
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                load_unit_roster(roster, use_cache)
+                samples.append(time.perf_counter() - start)
+            loads[name] = statistics.median(samples)
+        print(f"load_unit_roster: parse {loads['parse'] * 1e3:.2f} ms, cached {loads['cached'] * 1e3:.2f} ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -0,0 +1,12 @@
+"""
+Regression tests for the Galaxy Clash battle engine and its tools.
+
+Each ``test_*`` module covers one feature, e.g. ``test_squad`` the squad
+stacks and ``test_vectorized`` the numpy kernel against the scalar engine;
+``helpers`` holds the shared rosters and statistics.
+
+Every test is seeded, and statistical comparisons use a fixed bound on the
+two-sample z score, so a failure means the engines disagree rather than an
+unlucky draw.  Run them from ``Game/ai`` with ``python -m unittest`` (or
+``python -m pytest tests``).
+"""
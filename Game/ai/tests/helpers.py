@@ -0,0 +1,55 @@
+"""Shared rosters and statistics for the engine tests."""
+
+from __future__ import annotations
+
+import math
+from typing import List, Tuple
+
+from battle_story_ai import Team, create_units_from_names
+
+# The battlefield and rosters of the sample battle in battle_story_ai's docstring
+BATTLEFIELD = {"location": "ruined temple on Dathomir", "weather": "foggy night", "terrain": "dense jungle"}
+README_ROSTERS = (
+    ("Vader's Fist", ["Darth Vader", "Emperor Palpatine", "Stormtrooper", "Stormtrooper"]),
+    ("Saw's Renegades", ["Saw Gerrera", "Clone Trooper", "Clone Trooper", "Mother Talzin"]),
+)
+# Every ability trigger, two Talzins and a leader death on each side
+MIXED_ROSTERS = (
+    ("Alliance", ["Jedi", "Clone Trooper", "Clone Trooper", "Grand Admiral Thrawn", "Mother Talzin"]),
+    (
+        "Horde",
+        ["Wookiee Warrior", "Wookiee Warrior", "Darth Vader", "Mother Talzin", "Stormtrooper", "Stormtrooper"],
+    ),
+)
+# Squads next to single units, with revives into both
+SQUAD_ROSTERS = (
+    ("Legion", ["Darth Vader", "40x Stormtrooper"]),
+    ("Rebellion", ["Saw Gerrera", "Mother Talzin", "6x Wookiee Warrior", "20x Clone Trooper", "Jedi"]),
+)
+
+# Bound on |z| for two samples that should share a mean; at 4 a correct
+# engine fails about once in 16,000 comparisons
+Z_LIMIT = 4.0
+
+
+def make_teams(rosters: Tuple[Tuple[str, List[str]], ...]) -> Tuple[Team, Team]:
+    """Fresh teams for a pair of (name, unit specs) rosters."""
+    first, second = (Team(name=name, units=create_units_from_names(list(specs))) for name, specs in rosters)
+    return first, second
+
+
+def proportion_z(successes1: int, trials1: int, successes2: int, trials2: int) -> float:
+    """Two-proportion z score of two binomial samples."""
+    pooled = (successes1 + successes2) / (trials1 + trials2)
+    spread = math.sqrt(pooled * (1 - pooled) * (1 / trials1 + 1 / trials2))
+    if spread == 0:
+        return 0.0
+    return (successes1 / trials1 - successes2 / trials2) / spread
+
+
+def exact_z(successes: int, trials: int, p: float) -> float:
+    """z score of a binomial sample against a known probability ``p``."""
+    spread = math.sqrt(p * (1 - p) / trials)
+    if spread == 0:
+        return 0.0 if successes == p * trials else math.inf
+    return (successes / trials - p) / spread
@@ -0,0 +1,36 @@
+"""Abilities compiled from ABILITY_REGISTRY into per-trigger tables."""
+
+from __future__ import annotations
+
+import unittest
+
+from battle_story_ai import AttackModifier, compile_abilities, create_units_from_names
+
+
+class AbilityTest(unittest.TestCase):
+    def test_compiled_tables(self) -> None:
+        vader, trooper = create_units_from_names(["Darth Vader", "Stormtrooper"])
+        hooks = compile_abilities([vader, trooper])
+        self.assertEqual([unit for unit, _ in hooks.round_start], [vader])
+        self.assertEqual(hooks.on_attack[vader], (AttackModifier(damage_multiplier=1.25),))
+        self.assertEqual(len(hooks.on_kill[vader]), 1)
+        self.assertNotIn(trooper, hooks.on_attack)
+        self.assertEqual(hooks.on_death, {})
+
+    def test_leader_ability_and_death_trigger(self) -> None:
+        (talzin,) = create_units_from_names(["Mother Talzin"])
+        hooks = compile_abilities([talzin])
+        self.assertEqual(len(hooks.round_start), 1)
+        self.assertEqual(len(hooks.on_death[talzin]), 1)
+
+    def test_round_limited_modifier(self) -> None:
+        (wookiee,) = create_units_from_names(["Wookiee Warrior"])
+        (charge,) = compile_abilities([wookiee]).on_attack[wookiee]
+        for round_number, multiplier in ((1, 1.5), (2, 1.0), (3, 1.0)):
+            context = {}
+            charge(wookiee, context, round_number)
+            self.assertEqual(context.get("damage_multiplier", 1.0), multiplier)
+
+
+if __name__ == "__main__":
+    unittest.main()
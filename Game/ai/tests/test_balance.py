@@ -0,0 +1,52 @@
+"""Cost suggestions must allow for how much a unit's worth varies by lineup."""
+
+from __future__ import annotations
+
+import unittest
+
+from battle_balance import BalanceReport, UnitBalance, _finish_tally, _tally, add_unit, remove_unit, suggest_costs
+
+BATTLES = 400
+
+
+def wins(count: int) -> bytes:
+    return bytes([1] * count + [0] * (BATTLES - count))
+
+
+class SuggestedCostTest(unittest.TestCase):
+    def test_range_follows_spread_between_comparisons(self) -> None:
+        # Both units are worth about the same and the paired battles alone
+        # pin each comparison down, but one unit's worth depends on the lineup
+        steady, swingy = UnitBalance("Steady", 50), UnitBalance("Swingy", 50)
+        for gained in (wins(190), wins(210), wins(200), wins(200)):
+            _tally(steady, gained, wins(0))
+        for gained in (wins(400), wins(0), wins(400), wins(0)):
+            _tally(swingy, gained, wins(0))
+        for unit in (steady, swingy):
+            _finish_tally(unit)
+        self.assertAlmostEqual(steady.delta, 0.5)
+        self.assertAlmostEqual(swingy.delta, 0.5)
+        self.assertGreater(swingy.margin, 10 * steady.margin)
+        report = BalanceReport(units=[steady, swingy], baselines=4, matchups=4, battles=BATTLES, elapsed=0.0)
+        suggest_costs(report)
+        self.assertEqual(steady.suggested_cost, swingy.suggested_cost)
+        low, high = swingy.suggested_range
+        self.assertLess(low, steady.suggested_range[0])
+        self.assertGreater(high, steady.suggested_range[1])
+
+
+class VariantTest(unittest.TestCase):
+    def test_squads_grow_and_shrink_in_place(self) -> None:
+        lineup = ["Jedi", "5x Stormtrooper", "Clone Trooper"]
+        self.assertEqual(add_unit(lineup, "Stormtrooper"), ["Jedi", "6x Stormtrooper", "Clone Trooper"])
+        self.assertEqual(remove_unit(lineup, "Stormtrooper"), ["Jedi", "4x Stormtrooper", "Clone Trooper"])
+
+    def test_single_units_are_appended(self) -> None:
+        lineup = ["Jedi", "Clone Trooper"]
+        self.assertEqual(add_unit(lineup, "Clone Trooper"), ["Jedi", "Clone Trooper", "Clone Trooper"])
+        self.assertEqual(add_unit(lineup, "Darth Vader"), ["Jedi", "Clone Trooper", "Darth Vader"])
+        self.assertEqual(remove_unit(lineup, "Clone Trooper"), ["Jedi"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,27 @@
+"""The analytical odds quoted in reports."""
+
+from __future__ import annotations
+
+import unittest
+
+from battle_story_ai import UNIT_DATABASE, UNIT_RECORD_FIELDS, roster_odds
+
+
+class RosterOddsTest(unittest.TestCase):
+    def test_follows_the_unit_database(self) -> None:
+        specs = (("A", ("Jedi",)), ("B", ("Stormtrooper",)))
+        before = roster_odds(specs)
+        self.assertIs(roster_odds(specs), before)
+        original = UNIT_DATABASE["Stormtrooper"]
+        record = dict((name, getattr(original, name)) for name in UNIT_RECORD_FIELDS)
+        record.update(health=400, damage=100)
+        UNIT_DATABASE.add_records({"Stormtrooper": tuple(record[name] for name in UNIT_RECORD_FIELDS)})
+        try:
+            self.assertLess(roster_odds(specs).win_rates[0], before.win_rates[0])
+        finally:
+            UNIT_DATABASE.add_records({"Stormtrooper": original})
+        self.assertEqual(roster_odds(specs).win_rates, before.win_rates)
+
+
+if __name__ == "__main__":
+    unittest.main()
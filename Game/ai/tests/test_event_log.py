@@ -0,0 +1,23 @@
+"""Reports are rendered from a seeded event log."""
+
+from __future__ import annotations
+
+import unittest
+
+from battle_story_ai import generate_battle_report
+from tests.helpers import BATTLEFIELD, README_ROSTERS, make_teams
+
+
+class EventLogTest(unittest.TestCase):
+    def test_report_is_seeded(self) -> None:
+        for format in ("markdown", "json"):
+            reports = [
+                generate_battle_report(*make_teams(README_ROSTERS), BATTLEFIELD, seed=seed, format=format)
+                for seed in (51, 51, 52)
+            ]
+            self.assertEqual(reports[0], reports[1])
+            self.assertNotEqual(reports[0], reports[2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+"""The exact solver must agree with sampling."""
+
+from __future__ import annotations
+
+import math
+import unittest
+
+from battle_exact import StateBudgetExceeded, solve_battle
+from battle_story_ai import simulate_many
+from tests.helpers import Z_LIMIT, exact_z, make_teams
+
+BATTLES = 4000
+
+SMALL_ROSTERS = (
+    (("A", ["Clone Trooper", "Clone Trooper"]), ("B", ["Stormtrooper", "Stormtrooper"])),
+    (("A", ["3x Stormtrooper"]), ("B", ["2x Clone Trooper"])),
+    (("A", ["3x Mother Talzin"]), ("B", ["4x Stormtrooper"])),
+)
+
+
+class ExactSolverTest(unittest.TestCase):
+    def test_matches_sampling(self) -> None:
+        for seed, rosters in enumerate(SMALL_ROSTERS):
+            with self.subTest(rosters=rosters):
+                team1, team2 = make_teams(rosters)
+                solution = solve_battle(team1, team2)
+                self.assertTrue(math.isclose(sum(solution.outcomes.values()), 1.0))
+                sampled = simulate_many(team1, team2, n=BATTLES, workers=1, seed=seed)
+                z = exact_z(sampled.wins[0], sampled.battles, solution.win_rates[0])
+                self.assertLess(abs(z), Z_LIMIT)
+
+    def test_state_budget(self) -> None:
+        team1, team2 = make_teams(SMALL_ROSTERS[2])
+        with self.assertRaises(StateBudgetExceeded):
+            solve_battle(team1, team2, max_states=10)
+
+    def test_engine_falls_back_to_sampling(self) -> None:
+        team1, team2 = make_teams(SMALL_ROSTERS[2])
+        result = simulate_many(team1, team2, n=200, workers=1, seed=0, engine="exact", state_budget=10)
+        self.assertEqual((result.battles, result.states), (200, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""Speed-weighted initiative and battles fought to completion."""
+
+from __future__ import annotations
+
+import random
+import unittest
+
+from battle_story_ai import (
+    EVENT_ATTACK,
+    MAX_BATTLE_ROUNDS,
+    UNIT_DATABASE,
+    BattleLog,
+    BattleRecorder,
+    Team,
+    compute_round_events,
+    create_units_from_names,
+    generate_battle_report,
+    simulate_battle,
+)
+from tests.helpers import BATTLEFIELD, README_ROSTERS, Z_LIMIT, exact_z, make_teams
+
+
+class InitiativeTest(unittest.TestCase):
+    """A unit acts first with probability proportional to its speed."""
+
+    TRIALS = 4000
+
+    def first_to_act(self, fast: str, slow: str, seed: int) -> int:
+        team1 = Team(name="A", units=create_units_from_names([fast]))
+        team2 = Team(name="B", units=create_units_from_names([slow]))
+        rng = random.Random(seed)
+        first = 0
+        for _ in range(self.TRIALS):
+            team1.reset()
+            team2.reset()
+            log = BattleLog(seed=seed, teams=[], battlefield={})
+            compute_round_events(team1, team2, {}, 2, rng, BattleRecorder(log, team1, team2))
+            attacks = [event for event in log.events if event[0] == EVENT_ATTACK]
+            first += attacks[0][1] == 0
+        return first
+
+    def test_speed_weighted(self) -> None:
+        fast, slow = UNIT_DATABASE["Jedi"].speed, UNIT_DATABASE["Stormtrooper"].speed
+        self.assertGreater(fast, slow)
+        first = self.first_to_act("Jedi", "Stormtrooper", seed=21)
+        self.assertLess(abs(exact_z(first, self.TRIALS, fast / (fast + slow))), Z_LIMIT)
+
+    def test_equal_speeds(self) -> None:
+        first = self.first_to_act("Stormtrooper", "Stormtrooper", seed=22)
+        self.assertLess(abs(exact_z(first, self.TRIALS, 0.5)), Z_LIMIT)
+
+
+class CompletionTest(unittest.TestCase):
+    def test_ends_with_a_side_wiped_out(self) -> None:
+        team1, team2 = make_teams(README_ROSTERS)
+        rng = random.Random(31)
+        for _ in range(200):
+            outcome = simulate_battle(team1, team2, rng, to_completion=True)
+            self.assertTrue(0 in outcome.survivors or outcome.rounds == MAX_BATTLE_ROUNDS, outcome)
+            self.assertEqual(outcome.winner, 0 if outcome.survivors[0] else 1)
+
+    def test_odds_only_quoted_for_default_rules(self) -> None:
+        reports = {
+            name: generate_battle_report(*make_teams(README_ROSTERS), dict(BATTLEFIELD, **rules), seed=53)
+            for name, rules in (
+                ("default", {}),
+                ("positioning", {"positioning": True}),
+                ("completion", {"fight_to_completion": True}),
+            )
+        }
+        self.assertIn("Estimated odds", reports["default"])
+        self.assertNotIn("Estimated odds", reports["positioning"])
+        self.assertNotIn("Estimated odds", reports["completion"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,20 @@
+"""Battlefield positioning stays reproducible from the seed."""
+
+from __future__ import annotations
+
+import unittest
+
+from battle_story_ai import EVENT_MOVE, run_battle
+from tests.helpers import BATTLEFIELD, MIXED_ROSTERS, make_teams
+
+
+class PositioningTest(unittest.TestCase):
+    def test_positioning_is_seeded(self) -> None:
+        battlefield = dict(BATTLEFIELD, positioning=True)
+        logs = [run_battle(*make_teams(MIXED_ROSTERS), battlefield, seed=41).events for _ in range(2)]
+        self.assertEqual(logs[0], logs[1])
+        self.assertTrue(any(event[0] == EVENT_MOVE for event in logs[0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+"""Continuing from a snapshot with its recorded dice replays the battle exactly."""
+
+from __future__ import annotations
+
+import random
+import unittest
+
+from battle_story_ai import BattleGrid, CommonRandomStreams, iter_battle_rounds
+from tests.helpers import BATTLEFIELD, MIXED_ROSTERS, README_ROSTERS, SQUAD_ROSTERS, make_teams
+
+
+class SnapshotTest(unittest.TestCase):
+    @staticmethod
+    def final_state(snapshot):
+        return snapshot.entries, snapshot.alive, snapshot.killed, snapshot.morale, snapshot.context, snapshot.grid
+
+    def check_replay(self, rosters, positioning: bool, common_streams: bool) -> None:
+        battlefield = dict(BATTLEFIELD, positioning=positioning)
+        for seed in range(10):
+            team1, team2 = make_teams(rosters)
+            rng = CommonRandomStreams(seed, team1, team2) if common_streams else random.Random(seed)
+            snapshots = []
+            for _ in iter_battle_rounds(
+                team1, team2, rng, grid=BattleGrid.for_battlefield(battlefield), snapshots=snapshots
+            ):
+                pass
+            for start in snapshots[:-1]:
+                team1, team2 = make_teams(rosters)
+                rng = CommonRandomStreams(0, team1, team2) if common_streams else random.Random()
+                rng.setstate(start.rng_state)
+                replay = []
+                grid = BattleGrid.for_battlefield(battlefield)
+                for _ in iter_battle_rounds(team1, team2, rng, grid=grid, start=start, snapshots=replay):
+                    pass
+                self.assertEqual(self.final_state(replay[-1]), self.final_state(snapshots[-1]))
+
+    def test_replay(self) -> None:
+        for rosters in (README_ROSTERS, SQUAD_ROSTERS):
+            for positioning in (False, True):
+                for common_streams in (False, True):
+                    with self.subTest(rosters=rosters[0][0], positioning=positioning, streams=common_streams):
+                        self.check_replay(rosters, positioning, common_streams)
+
+    def test_restore_checks_roster(self) -> None:
+        team1, team2 = make_teams(README_ROSTERS)
+        snapshots = []
+        for _ in iter_battle_rounds(team1, team2, random.Random(0), snapshots=snapshots):
+            pass
+        with self.assertRaises(ValueError):
+            snapshots[1].restore(*make_teams(MIXED_ROSTERS))
+
+
+if __name__ == "__main__":
+    unittest.main()
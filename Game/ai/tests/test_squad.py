@@ -0,0 +1,71 @@
+"""Squad stacks: one hit kills at most one model, revives rejoin the stack."""
+
+from __future__ import annotations
+
+import random
+import unittest
+
+from battle_story_ai import EVENT_REVIVE, Squad, Team, create_units_from_names, report_renderer, run_battle
+from tests.helpers import BATTLEFIELD, SQUAD_ROSTERS, make_teams
+
+
+class SquadTest(unittest.TestCase):
+    def make_squad(self) -> Squad:
+        team = Team(name="A", units=create_units_from_names(["5x Stormtrooper"]))
+        return team.units[0]
+
+    def test_hit_kills_at_most_one_model(self) -> None:
+        squad = self.make_squad()
+        health = squad.template.health
+        self.assertTrue(squad.take_damage(10 * health))
+        self.assertEqual((squad.size, squad.wounds, squad.team.alive_count), (4, 0, 4))
+        self.assertFalse(squad.take_damage(health - 1))
+        self.assertTrue(squad.take_damage(1))
+        self.assertEqual((squad.size, squad.wounds), (3, 0))
+
+    def test_wiped_out_and_revived(self) -> None:
+        squad = self.make_squad()
+        team = squad.team
+        for _ in range(5):
+            squad.take_damage(1000)
+        self.assertFalse(squad.is_alive)
+        self.assertEqual((team.alive_count, team.killed_units), (0, [squad]))
+        self.assertIs(team.random_fallen(random.Random(0)), squad)
+        team.revive(squad, 5)
+        self.assertEqual((squad.size, squad.wounds, team.alive_count), (1, squad.template.health - 5, 1))
+        self.assertEqual(squad.current_health, 5)
+        self.assertEqual(team.killed_units, [])
+
+    def test_revived_model_is_the_weaker_front(self) -> None:
+        squad = self.make_squad()
+        health = squad.template.health
+        squad.take_damage(1000)
+        squad.take_damage(5)
+        squad.team.revive(squad, 10)
+        self.assertEqual((squad.size, squad.wounds), (5, health - 10))
+
+
+class SquadReplayTest(unittest.TestCase):
+    """Re-rendering a squad battle from its log reproduces the simulated state."""
+
+    def test_renderers_match_the_simulation(self) -> None:
+        revives = 0
+        for seed in range(40):
+            team1, team2 = make_teams(SQUAD_ROSTERS)
+            log = run_battle(team1, team2, BATTLEFIELD, seed=seed)
+            revives += sum(event[0] == EVENT_REVIVE for event in log.events)
+            for format in ("markdown", "json"):
+                renderer = report_renderer(log, format)
+                for _ in renderer.consume(log.events):
+                    pass
+                # Morale is left out: the log rounds its shifts
+                self.assertEqual(
+                    [team.snapshot_state()[:3] for team in renderer.teams],
+                    [team.snapshot_state()[:3] for team in (team1, team2)],
+                    f"seed {seed}, {format}",
+                )
+        self.assertGreater(revives, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,22 @@
+"""Synergies follow the unit types that are still standing."""
+
+from __future__ import annotations
+
+import unittest
+
+from battle_story_ai import Team, create_units_from_names
+
+
+class SynergyTest(unittest.TestCase):
+    def test_lapses_and_returns_with_its_type(self) -> None:
+        team = Team(name="A", units=create_units_from_names(["Clone Trooper", "Jedi"]))
+        clone, jedi = team.units
+        self.assertEqual(team.active_synergies(clone.template), (("morale_bonus", 0.1),))
+        jedi.take_damage(1000)
+        self.assertEqual(team.active_synergies(clone.template), ())
+        team.revive(jedi, 1)
+        self.assertEqual(team.active_synergies(clone.template), (("morale_bonus", 0.1),))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+"""Team's swap-remove alive and killed indexes."""
+
+from __future__ import annotations
+
+import random
+import unittest
+
+from battle_story_ai import Team, create_units_from_names, iter_battle_rounds
+from tests.helpers import MIXED_ROSTERS, SQUAD_ROSTERS, make_teams
+
+
+def assert_consistent(test: unittest.TestCase, team: Team) -> None:
+    """Check that ``team``'s indexes agree with its units."""
+    alive = team._alive
+    test.assertEqual({id(u) for u in alive}, {id(u) for u in team.units if u.is_alive})
+    test.assertEqual(len(alive) + len(team.killed_units), len(team.units))
+    for pos, unit in enumerate(alive):
+        test.assertEqual(unit._index_pos, pos)
+    for pos, unit in enumerate(team.killed_units):
+        test.assertFalse(unit.is_alive)
+        test.assertEqual(unit._index_pos, pos)
+    test.assertEqual(team.alive_count, sum(u.size for u in team.units))
+    by_type = {}
+    for unit in alive:
+        by_type[unit.template.name] = by_type.get(unit.template.name, 0) + 1
+    test.assertEqual({name: n for name, n in team._alive_by_type.items() if n}, by_type)
+
+
+class TeamIndexTest(unittest.TestCase):
+    def test_every_round(self) -> None:
+        for rosters in (MIXED_ROSTERS, SQUAD_ROSTERS):
+            team1, team2 = make_teams(rosters)
+            for seed in range(30):
+                for _ in iter_battle_rounds(team1, team2, random.Random(seed), to_completion=True):
+                    assert_consistent(self, team1)
+                    assert_consistent(self, team2)
+
+    def test_revive_moves_unit_back(self) -> None:
+        team = Team(name="A", units=create_units_from_names(["Clone Trooper", "Clone Trooper", "Jedi"]))
+        first, second, _ = team.units
+        self.assertTrue(first.take_damage(1000))
+        self.assertTrue(second.take_damage(1000))
+        self.assertEqual(team.killed_units, [first, second])
+        team.revive(first, 10)
+        self.assertEqual(team.killed_units, [second])
+        self.assertEqual((first.current_health, team.alive_count), (10, 2))
+        assert_consistent(self, team)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+"""Resumable round robins."""
+
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+
+from battle_tournament import Entrant, read_checkpoint, run_tournament, tournament_signature
+
+ENTRANTS = [
+    Entrant("Jedi", ["Jedi"]),
+    Entrant("Vader", ["Darth Vader"]),
+    Entrant("Clones", ["Clone Trooper", "Clone Trooper"]),
+    Entrant("Troopers", ["3x Stormtrooper"]),
+]
+BATTLES = 10
+
+
+class CheckpointTest(unittest.TestCase):
+    def setUp(self) -> None:
+        handle, self.path = tempfile.mkstemp(suffix=".jsonl")
+        os.close(handle)
+        os.remove(self.path)
+        self.addCleanup(lambda: os.path.exists(self.path) and os.remove(self.path))
+
+    def play(self):
+        return run_tournament(ENTRANTS, battles=BATTLES, workers=1, seed=3, checkpoint=self.path)
+
+    def test_resume_after_torn_write(self) -> None:
+        full = self.play()
+        self.assertEqual(full.resumed_pairs, 0)
+        # The run was killed halfway through writing its last record
+        with open(self.path, "rb+") as f:
+            f.truncate(os.path.getsize(self.path) - 4)
+        resumed = self.play()
+        self.assertEqual(resumed.resumed_pairs, 5)
+        self.assertEqual(resumed.matrix, full.matrix)
+        done, offset = read_checkpoint(self.path, tournament_signature(ENTRANTS, BATTLES, 3))
+        self.assertEqual((len(done), offset), (6, os.path.getsize(self.path)))
+        self.assertEqual(self.play().resumed_pairs, 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
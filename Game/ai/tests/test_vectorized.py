@@ -0,0 +1,48 @@
+"""The numpy kernel must be statistically indistinguishable from the scalar engine."""
+
+from __future__ import annotations
+
+import unittest
+
+from battle_story_ai import simulate_many
+from tests.helpers import MIXED_ROSTERS, README_ROSTERS, Z_LIMIT, make_teams, proportion_z
+
+try:
+    import numpy  # noqa: F401
+except ImportError:  # pragma: no cover - optional dependency
+    numpy = None
+
+BATTLES = 4000
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class VectorizedEquivalenceTest(unittest.TestCase):
+    # Squads are left out: the kernel resolves them model by model, which
+    # only approximates a volley (see battle_vectorized.equivalence_check)
+
+    def check_win_rates(self, rosters, seed: int) -> None:
+        team1, team2 = make_teams(rosters)
+        scalar = simulate_many(team1, team2, n=BATTLES, workers=1, seed=seed, engine="scalar")
+        vectorized = simulate_many(team1, team2, n=BATTLES, workers=1, seed=seed, engine="numpy")
+        self.assertEqual((scalar.battles, vectorized.battles), (BATTLES, BATTLES))
+        z = proportion_z(scalar.wins[0], scalar.battles, vectorized.wins[0], vectorized.battles)
+        self.assertLess(
+            abs(z), Z_LIMIT, f"win rates {scalar.win_rates[0]:.3f} (scalar) and {vectorized.win_rates[0]:.3f} (numpy)"
+        )
+
+    def test_readme_battle(self) -> None:
+        self.check_win_rates(README_ROSTERS, seed=11)
+
+    def test_every_ability(self) -> None:
+        self.check_win_rates(MIXED_ROSTERS, seed=12)
+
+    def test_equivalence_check_survivors(self) -> None:
+        from battle_vectorized import equivalence_check
+
+        team1, team2 = make_teams(README_ROSTERS)
+        result = equivalence_check(team1, team2, battles=BATTLES, seed=13, z_limit=Z_LIMIT)
+        self.assertTrue(result["passed"], result)
+
+
+if __name__ == "__main__":
+    unittest.main()
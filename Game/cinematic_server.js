@@ -1,6 +1,8 @@
 // cinematic_server.js
 const express = require('express');
 const path = require('path');
+const os = require('os');
+const readline = require('readline');
 const { spawn } = require('child_process');
 
 const app = express();
@@ -11,23 +13,132 @@ function pyCmd() {
   return process.platform === 'win32' ? 'python' : 'python3';
 }
 
-app.post('/cinematic', (req, res) => {
-  try {
-    const scriptPath = path.join(__dirname, 'Game', 'ai', 'battle_story_ai.py');
-    const p = spawn(pyCmd(), [scriptPath, '-'], { stdio: ['pipe', 'pipe', 'pipe'] });
-
-    let out = '', err = '';
-    p.stdout.on('data', d => (out += d.toString()));
-    p.stderr.on('data', d => (err += d.toString()));
-    p.on('close', code => {
-      if (code === 0) res.type('text/plain').send(out);
-      else res.status(500).send(err || 'AI failed');
+const scriptPath = path.join(__dirname, 'ai', 'battle_story_ai.py');
+
+// Small pool of long-lived `battle_story_ai.py --serve` workers.  A worker
+// handles a single request at a time and extra requests wait in a FIFO queue
+// until one becomes idle.  Streamed requests receive `{"chunk"}` lines before
+// the final `{"ok"}` line that frees the worker.
+//
+// A worker that dies is restarted after an exponentially growing delay.  The
+// delay resets once a worker answers a request; after MAX_RESTARTS deaths in
+// a row without an answer the pool gives up, so a worker that cannot start
+// (bad script path, broken roster) does not turn into a fork loop, and every
+// waiting and later request fails with a 500.
+const RESTART_DELAY_MS = 500;
+const MAX_RESTART_DELAY_MS = 30000;
+const MAX_RESTARTS = 5;
+
+class WorkerPool {
+  constructor(size) {
+    this.size = size;
+    this.workers = [];
+    this.queue = [];
+    this.nextId = 1;
+    this.restarts = 0;
+    this.failure = null;
+    for (let i = 0; i < size; i++) this.workers.push(this.spawnWorker());
+  }
+
+  spawnWorker() {
+    const proc = spawn(pyCmd(), [scriptPath, '--serve'], { stdio: ['pipe', 'pipe', 'pipe'] });
+    const worker = { proc, job: null, alive: true };
+
+    readline.createInterface({ input: proc.stdout }).on('line', line => {
+      const job = worker.job;
+      this.restarts = 0;
+      let msg;
+      try {
+        msg = JSON.parse(line);
+      } catch (e) {
+        msg = { ok: false, error: 'Malformed worker response' };
+      }
+      if (job && msg.chunk !== undefined) {
+        if (job.onChunk) job.onChunk(msg.chunk);
+        return;
+      }
+      worker.job = null;
+      if (job) job.resolve(msg);
+      this.dispatch();
+    });
+    proc.stderr.on('data', d => process.stderr.write(d));
+    proc.stdin.on('error', () => {}); // reported through 'exit' below
+    const died = err => {
+      if (!worker.alive) return;
+      worker.alive = false;
+      if (err) process.stderr.write(`AI worker failed: ${err.message}\n`);
+      if (worker.job) worker.job.reject(new Error('AI worker exited'));
+      worker.job = null;
+      this.replace(worker);
+    };
+    proc.on('error', died);
+    proc.on('exit', () => died());
+    return worker;
+  }
+
+  replace(worker) {
+    if (this.failure) return;
+    if (this.restarts >= MAX_RESTARTS) {
+      this.failure = new Error(`AI workers keep exiting; gave up after ${MAX_RESTARTS} restarts`);
+      process.stderr.write(`${this.failure.message}\n`);
+      for (const job of this.queue.splice(0)) job.reject(this.failure);
+      return;
+    }
+    // Replace the dead worker after a backoff so the pool keeps its size
+    const delay = Math.min(MAX_RESTART_DELAY_MS, RESTART_DELAY_MS * 2 ** this.restarts);
+    this.restarts++;
+    setTimeout(() => {
+      const idx = this.workers.indexOf(worker);
+      if (idx !== -1) this.workers[idx] = this.spawnWorker();
+      this.dispatch();
+    }, delay);
+  }
+
+  run(config, onChunk) {
+    return new Promise((resolve, reject) => {
+      if (this.failure) return reject(this.failure);
+      const payload = { ...config, id: this.nextId++, stream: Boolean(onChunk) };
+      this.queue.push({ payload, onChunk, resolve, reject });
+      this.dispatch();
     });
+  }
 
-    p.stdin.write(JSON.stringify(req.body));
-    p.stdin.end();
+  dispatch() {
+    for (const worker of this.workers) {
+      if (!this.queue.length) return;
+      if (!worker.alive || worker.job) continue;
+      worker.job = this.queue.shift();
+      worker.proc.stdin.write(JSON.stringify(worker.job.payload) + '\n');
+    }
+  }
+}
+
+const POOL_SIZE = Number(process.env.AI_WORKERS) || Math.max(1, Math.min(4, os.cpus().length));
+const pool = new WorkerPool(POOL_SIZE);
+
+// Response type per report `format` (see REPORT_FORMATS in battle_story_ai.py)
+const CONTENT_TYPES = { markdown: 'text/plain', html: 'text/html', json: 'application/json' };
+
+app.post('/cinematic', async (req, res) => {
+  const contentType = CONTENT_TYPES[req.body.format] || 'text/plain';
+  // Pipe each report section to the browser as soon as the worker has it
+  const onChunk = chunk => {
+    if (!res.headersSent) res.type(contentType);
+    res.write(chunk);
+  };
+  // Once a section has been sent the status can no longer become a 500, so
+  // a failure drops the connection: the client sees an aborted transfer
+  // instead of a truncated report that looks complete.
+  try {
+    const result = await pool.run(req.body, onChunk);
+    if (result.ok) {
+      if (res.headersSent) res.end();
+      else res.type(contentType).end();
+    } else if (res.headersSent) res.destroy(new Error(result.error || 'AI failed'));
+    else res.status(500).send(result.error || 'AI failed');
   } catch (e) {
-    res.status(500).send(String(e));
+    if (res.headersSent) res.destroy(e);
+    else res.status(500).send(String(e));
   }
 });
 